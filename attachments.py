@@ -0,0 +1,207 @@
+# 作者：谢建波
+# 文件目的：物品的图片附件和缩略图缓存。
+# 图片按内容的 SHA-256 保存在数据目录的 attachments/ 下（文件名为“哈希.扩展名”，按哈希前两位分子目录），
+# 同一张图片无论上传多少次都只保存一份；物品记录的 images 字段保存附件名列表。
+# 缩略图由后台线程池生成（需要 Pillow；未安装时仍可保存附件，但不生成缩略图），
+# 保存为 attachments/thumbs/哈希_尺寸.png，并在内存中按最近最少使用缓存 PNG 数据。
+# 发布物品时预先生成缩略图；界面只为可见的行请求缩略图，读文件和解码原图都在后台线程中进行。
+
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 支持的图片格式（.jpeg 保存为 .jpg）
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp")
+
+# 附件名：64 位十六进制哈希 + 扩展名
+NAME_RE = re.compile(r"[0-9a-f]{64}\.[a-z]{3,4}")
+
+# 计算哈希时每次读入的字节数
+HASH_CHUNK = 1024 * 1024
+
+
+def thumbnails_available():
+    """是否能生成缩略图（已安装 Pillow）"""
+    return Image is not None
+
+
+def is_attachment_name(name):
+    return isinstance(name, str) and NAME_RE.fullmatch(name) is not None
+
+
+def attachment_path(name, root=None):
+    """附件文件的路径"""
+    return os.path.join(root or config.ATTACHMENT_DIR, name[:2], name)
+
+
+def normalized_extension(filename):
+    """检查文件扩展名，返回保存用的扩展名；不支持的格式抛出 ValueError"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        raise ValueError(f"不支持的图片格式: {ext or '无扩展名'}（支持 {' '.join(IMAGE_EXTENSIONS)}）")
+    return ".jpg" if ext == ".jpeg" else ext
+
+
+def _save(name, chunks, root):
+    """把内容写入附件文件（已存在时不重复保存），先写临时文件再原子替换"""
+    path = attachment_path(name, root)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def store_file(file_path, root=None):
+    """保存本地图片文件，返回附件名；格式不支持或超过大小上限时抛出 ValueError"""
+    ext = normalized_extension(file_path)
+    if os.path.getsize(file_path) > config.ATTACHMENT_MAX_MB * 1024 * 1024:
+        raise ValueError(f"图片不能超过 {config.ATTACHMENT_MAX_MB:g} MB")
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    name = digest.hexdigest() + ext
+    if not os.path.exists(attachment_path(name, root)):
+        with open(file_path, "rb") as f:
+            _save(name, iter(lambda: f.read(HASH_CHUNK), b""), root)
+    return name
+
+
+def store_bytes(data, filename, root=None):
+    """保存图片内容（如 HTTP 上传的数据），filename 只用于判断格式，返回附件名"""
+    ext = normalized_extension(filename)
+    if len(data) > config.ATTACHMENT_MAX_MB * 1024 * 1024:
+        raise ValueError(f"图片不能超过 {config.ATTACHMENT_MAX_MB:g} MB")
+    name = hashlib.sha256(data).hexdigest() + ext
+    _save(name, (data,), root)
+    return name
+
+
+def make_thumbnail(source_path, size):
+    """把原图缩小到不超过 size x size（保持比例），返回 PNG 数据"""
+    with Image.open(source_path) as image:
+        image.draft("RGB", (size, size))  # JPEG 直接按缩小的尺寸解码
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        output = io.BytesIO()
+        image.save(output, "PNG")
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """缩略图：内存 LRU -> 磁盘缓存 -> 后台生成（线程安全；request 返回 Future）"""
+
+    def __init__(self, root=None, workers=None, max_items=None):
+        self.root = root or config.ATTACHMENT_DIR
+        self.max_items = config.THUMBNAIL_CACHE_ITEMS if max_items is None else max_items
+        self.memory = OrderedDict()  # (附件名, 尺寸) -> PNG 数据，按最近使用的先后排列
+        self.pending = {}            # (附件名, 尺寸) -> 生成中的 Future
+        self.executor = ThreadPoolExecutor(max_workers=workers or config.THUMBNAIL_WORKERS,
+                                           thread_name_prefix="thumbnail")
+        self.hits = 0
+        self.disk_hits = 0
+        self.generated = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def thumb_path(self, name, size):
+        return os.path.join(self.root, "thumbs", f"{os.path.splitext(name)[0]}_{size}.png")
+
+    def get(self, name, size):
+        """内存中已有的缩略图（PNG 数据），没有时返回 None；不读磁盘，可在界面线程中调用"""
+        key = (name, size)
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def request(self, name, size):
+        """在后台读取或生成缩略图，返回 Future（结果为 PNG 数据，失败时为 None）；同一缩略图不会重复生成"""
+        key = (name, size)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = self.executor.submit(self._load, name, size)
+            return future
+
+    def prefetch(self, names, sizes):
+        """预先生成缩略图（发布物品时调用），不等待结果"""
+        if thumbnails_available():
+            for name in names:
+                for size in sizes:
+                    self.request(name, size)
+
+    def _load(self, name, size):
+        key = (name, size)
+        try:
+            data = self._read_or_make(name, size)
+        except Exception:
+            # 原图缺失、损坏或格式无法解码：不显示缩略图
+            data = None
+        with self.lock:
+            self.pending.pop(key, None)
+            if data is None:
+                self.failures += 1
+            else:
+                self.memory[key] = data
+                self.memory.move_to_end(key)
+                while len(self.memory) > self.max_items:
+                    self.memory.popitem(last=False)
+        return data
+
+    def _read_or_make(self, name, size):
+        path = self.thumb_path(name, size)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            with self.lock:
+                self.disk_hits += 1
+            return data
+        except FileNotFoundError:
+            pass
+        if not thumbnails_available():
+            return None
+        data = make_thumbnail(attachment_path(name, self.root), size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.generated += 1
+        return data
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_items": len(self.memory),
+                "memory_bytes": sum(len(data) for data in self.memory.values()),
+                "pending": len(self.pending),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "generated": self.generated,
+                "failures": self.failures
+            }
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
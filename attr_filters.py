@@ -0,0 +1,214 @@
+# 作者：谢建波
+# 文件目的：类型属性的类型定义与按属性筛选。物品类型可以在 attribute_types 中为属性指定类型：
+#   {"数量": {"type": "int"}, "保质期": {"type": "date"}, "成色": {"type": "enum", "options": ["全新", "九成新"]}}
+# 未指定的属性为文本（string）。搜索栏中可以写“属性名 运算符 值”形式的条件，如 数量>=3、保质期<2026-12-01、
+# 成色=全新，运算符为 = == != > >= < <=，多个条件与关键字之间用空格分隔，同时满足时才显示。
+# 每个 (类型ID, 属性) 有一个有序索引（sorted_index.SortedIndex），第一次按该属性筛选时建立，之后随物品增删维护，
+# 条件通过二分查找得到结果，代价为 O(log N + k)，不扫描全部物品。值无法按属性类型解析的物品不参与筛选。
+
+import re
+from datetime import date, datetime
+
+from sorted_index import SortedIndex
+from text_normalize import normalize
+from type_schema import is_stale, item_version, stored_name
+
+# 属性类型
+STRING = "string"
+INT = "int"
+DATE = "date"
+ENUM = "enum"
+
+# 界面上显示的属性类型名称
+KIND_LABELS = {STRING: "文本", INT: "整数", DATE: "日期", ENUM: "枚举"}
+
+# 搜索关键字中的筛选条件（关键字已经过规范化，全角运算符已转为半角）
+FILTER_RE = re.compile(r"(\S+?)\s*(>=|<=|!=|==|=|>|<)\s*(\S+)")
+
+STRING_SPEC = {"type": STRING}
+
+
+def attribute_spec(type_info, attr):
+    """类型中某个属性的定义，未指定时为文本"""
+    return type_info.get("attribute_types", {}).get(attr, STRING_SPEC)
+
+
+def parse_value(spec, text):
+    """按属性定义把文本解析为可比较的值（文本和枚举不区分大小写、全半角）；格式不符时抛出 ValueError"""
+    kind = spec["type"]
+    text = str(text).strip()
+    if kind == INT:
+        return int(text)
+    if kind == DATE:
+        try:
+            # 保存的值都是 YYYY-MM-DD，先用较快的 fromisoformat
+            return date.fromisoformat(text)
+        except ValueError:
+            return datetime.strptime(text.replace("/", "-"), "%Y-%m-%d").date()
+    if kind == ENUM:
+        # 枚举按选项的先后顺序比较大小
+        folded = normalize(text)
+        for i, option in enumerate(spec["options"]):
+            if normalize(option) == folded:
+                return i
+        raise ValueError(f"不是可选值: {text}")
+    return normalize(text)
+
+
+def canonical_text(spec, text):
+    """校验属性值并统一写法（整数去掉前导零，日期为 YYYY-MM-DD，枚举为定义中的选项），返回保存用的文本"""
+    value = parse_value(spec, text)
+    kind = spec["type"]
+    if kind == INT:
+        return str(value)
+    if kind == DATE:
+        return value.isoformat()
+    if kind == ENUM:
+        return spec["options"][value]
+    return str(text).strip()
+
+
+def describe_format(attr, spec):
+    """属性值格式不符时的提示"""
+    kind = spec["type"]
+    if kind == INT:
+        return f"{attr}必须是整数"
+    if kind == DATE:
+        return f"{attr}必须是日期，格式如 2026-12-01"
+    return f"{attr}必须是以下之一：{'、'.join(spec['options'])}"
+
+
+def check_attribute_types(attributes, attribute_types):
+    """校验类型的属性定义，返回只包含现有属性、非文本类型的定义；不合法时抛出 ValueError"""
+    result = {}
+    for attr, spec in attribute_types.items():
+        if attr not in attributes:
+            continue
+        if not isinstance(spec, dict) or spec.get("type") not in KIND_LABELS:
+            raise ValueError(f"属性“{attr}”的类型不正确")
+        kind = spec["type"]
+        if kind == STRING:
+            continue
+        if kind == ENUM:
+            options = [str(option).strip() for option in spec.get("options") or []]
+            options = [option for option in dict.fromkeys(options) if option]
+            if not options:
+                raise ValueError(f"枚举属性“{attr}”至少需要一个可选值")
+            result[attr] = {"type": ENUM, "options": options}
+        else:
+            result[attr] = {"type": kind}
+    return result
+
+
+class AttributeIndex:
+    """按类型属性筛选物品的二级索引（由 SearchIndex 持有，在其锁内使用）"""
+
+    def __init__(self):
+        self.types = {}     # 类型ID -> 类型
+        self.names = {}     # 规范化的属性名 -> [(类型ID, 属性名)]
+        self.columns = {}   # 类型ID -> {属性名: SortedIndex}，只包含已经建立的列
+
+    def update_type(self, type_info):
+        """类型新增或修改后调用：该类型已建立的列全部作废，下次查询时重建"""
+        self.types[type_info["type_id"]] = type_info
+        self.columns.pop(type_info["type_id"], None)
+        self._update_names()
+
+    def remove_type(self, type_id):
+        self.types.pop(type_id, None)
+        self.columns.pop(type_id, None)
+        self._update_names()
+
+    def _update_names(self):
+        self.names = {}
+        for type_id, type_info in self.types.items():
+            for attr in type_info["attributes"]:
+                self.names.setdefault(normalize(attr), []).append((type_id, attr))
+
+    def _item_value(self, type_info, attr, item):
+        """物品某个属性的可比较值，缺少或无法解析时为 None（旧版本的物品按类型的 history 换算属性名）"""
+        attrs = item.get("type_attrs")
+        key = stored_name(type_info, attr, item_version(item)) if is_stale(type_info, item) else attr
+        if not isinstance(attrs, dict) or key not in attrs:
+            return None
+        try:
+            return parse_value(attribute_spec(type_info, attr), attrs[key])
+        except (ValueError, TypeError):
+            return None
+
+    def add(self, item):
+        """新增物品（物品修改时先 remove 旧内容再 add）"""
+        columns = self.columns.get(item["type_id"])
+        if not columns:
+            return
+        type_info = self.types[item["type_id"]]
+        for attr, column in columns.items():
+            value = self._item_value(type_info, attr, item)
+            if value is not None:
+                column.add(value, item["id"])
+
+    def remove(self, item):
+        columns = self.columns.get(item["type_id"])
+        if not columns:
+            return
+        type_info = self.types[item["type_id"]]
+        for attr, column in columns.items():
+            value = self._item_value(type_info, attr, item)
+            if value is not None:
+                column.remove(value, item["id"])
+
+    def _column(self, type_id, attr, items):
+        """取出 (类型ID, 属性) 的列，尚未建立时扫描一次全部物品建立"""
+        columns = self.columns.setdefault(type_id, {})
+        column = columns.get(attr)
+        if column is None:
+            type_info = self.types[type_id]
+            entries = []
+            for item in items:
+                if item["type_id"] == type_id:
+                    value = self._item_value(type_info, attr, item)
+                    if value is not None:
+                        entries.append((value, item["id"]))
+            column = columns[attr] = SortedIndex(entries)
+        return column
+
+    def parse_query(self, keyword):
+        """把（已规范化的）关键字拆成文本关键字和筛选条件列表 [(规范化属性名, 运算符, 值文本)]
+
+        只有属性名是某个类型的属性时才算作条件，其余部分仍按文本搜索。
+        """
+        filters = []
+        parts = []
+        position = 0
+        for match in FILTER_RE.finditer(keyword):
+            if match.group(1) in self.names:
+                parts.append(keyword[position:match.start()])
+                filters.append(match.groups())
+                position = match.end()
+        if not filters:
+            return keyword, filters
+        parts.append(keyword[position:])
+        return " ".join(" ".join(parts).split()), filters
+
+    def match(self, filters, type_name, items):
+        """返回满足全部条件的物品ID集合；type_name 不为 None 时只查该类型
+
+        items 为全部物品，只在第一次按某个属性筛选、需要建立该列时使用。
+        同名属性出现在多个类型中时，各类型分别按自己的属性类型比较；值无法解析的条件不匹配任何物品。
+        """
+        result = None
+        for name, op, text in filters:
+            ids = set()
+            for type_id, attr in self.names.get(name, ()):
+                type_info = self.types[type_id]
+                if type_name is not None and type_info["name"] != type_name:
+                    continue
+                try:
+                    value = parse_value(attribute_spec(type_info, attr), text)
+                except ValueError:
+                    continue
+                ids.update(self._column(type_id, attr, items).select(op, value))
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
@@ -0,0 +1,74 @@
+# 作者：谢建波
+# 文件目的：比较物品在内存中保存为 dict（原来的方式）与 ItemRecord（紧凑表示）时的内存占用。
+# 生成一批接近真实情况的物品（大量重复的日期、地址、用户ID和类型），序列化为 JSON 后
+# 按程序加载数据的方式解析，用 tracemalloc 统计每件物品平均占用的字节数。
+# 用法：python benchmarks/bench_memory.py [物品数量，默认 100000]
+
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from item_record import ItemRecord
+
+TYPES = [
+    (1, "食品", ["保质期", "数量"]),
+    (2, "书籍", ["作者", "出版社", "ISBN"]),
+    (3, "工具", ["品牌", "使用时长"])
+]
+ADDRESSES = [f"{building}号楼{room}室" for building in range(1, 21) for room in range(101, 111)]
+USER_IDS = [f"user-{i:04d}" for i in range(500)]
+DATES = [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+
+
+def make_items(count, seed=1):
+    """生成 count 件物品的 JSON 文本"""
+    rng = random.Random(seed)
+    items = []
+    for item_id in range(1, count + 1):
+        type_id, type_name, attributes = rng.choice(TYPES)
+        items.append({
+            "id": item_id,
+            "name": f"闲置物品{item_id}",
+            "description": f"九成新，自提优先，编号{rng.randint(1000, 9999)}",
+            "address": rng.choice(ADDRESSES),
+            "contact_phone": f"13{rng.randint(100000000, 999999999)}",
+            "contact_email": f"user{item_id}@example.com",
+            "type_id": type_id,
+            "type_name": type_name,
+            "type_attrs": {attr: str(rng.randint(1, 20)) for attr in attributes},
+            "date": rng.choice(DATES),
+            "user_id": rng.choice(USER_IDS)
+        })
+    return json.dumps(items, ensure_ascii=False)
+
+
+def measure(text, convert):
+    """解析 JSON 并转换，返回 (占用字节数, 记录列表)"""
+    tracemalloc.start()
+    records = [convert(record) for record in json.loads(text)]
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used, records
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    text = make_items(count)
+
+    dict_bytes, records = measure(text, lambda record: record)
+    del records
+    compact_bytes, records = measure(text, ItemRecord)
+    del records
+
+    print(f"物品数量: {count}")
+    print(f"dict:       {dict_bytes / 1024 / 1024:8.1f} MB，每件 {dict_bytes / count:6.0f} 字节")
+    print(f"ItemRecord: {compact_bytes / 1024 / 1024:8.1f} MB，每件 {compact_bytes / count:6.0f} 字节")
+    print(f"节省:       {(1 - compact_bytes / dict_bytes) * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
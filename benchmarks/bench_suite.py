@@ -0,0 +1,381 @@
+# 作者：谢建波
+# 文件目的：物品、用户、类型常用操作的性能测试套件，不启动图形界面，直接调用 service.py 中的业务逻辑。
+# 对每个规模（默认 1千 / 1万 / 10万 件物品，可加 100万）在临时目录中生成一份含中文名称和描述的模拟数据，
+# 在独立的子进程中测量：加载数据、搜索物品、刷新列表（一页）、登录、认证会话、发布物品、删除物品、整体保存，
+# 搜索和刷新列表在关闭搜索结果缓存时测量，另测一遍开启缓存的耗时（search_items_cached / query_page_cached），
+# 输出各操作的延迟分位数（p50 / p95 / p99）、吞吐量、峰值内存（RSS）和数据文件大小（JSON）。
+# 指定 --baseline 时与保存的基准结果比较，变慢或内存增加超过 --tolerance 的指标列为退化。
+# 用法：
+#   python benchmarks/bench_suite.py --sizes 1000,10000,100000 --output results.json
+#   python benchmarks/bench_suite.py --save-baseline baseline.json          # 保存基准
+#   python benchmarks/bench_suite.py --baseline baseline.json --fail-on-regression
+#   python benchmarks/bench_suite.py --backend sqlite --sizes 1000000
+# 有图形环境时加 --gui，用隐藏的 Tk 窗口测量物品列表（KeyedTreeview）实际刷新一页的耗时。
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import percentile
+
+# 模拟数据使用的词表（名称 = 成色 + 物品，描述由若干短语组成）
+ITEM_WORDS = {
+    "食品": ["进口巧克力", "坚果礼盒", "速溶咖啡", "蜂蜜柚子茶", "牛肉干", "燕麦片", "抹茶饼干", "红枣"],
+    "书籍": ["高等数学教材", "线性代数习题集", "大学英语四级真题", "数据结构与算法", "考研政治笔记",
+             "三体全集", "Python编程入门", "概率论与数理统计"],
+    "工具": ["山地自行车", "台灯", "电吹风", "螺丝刀套装", "机械键盘", "蓝牙音箱", "电热水壶", "iPad保护壳"]
+}
+CONDITIONS = ["全新", "九成新", "八成新", "七成新", "闲置", "毕业甩卖"]
+PHRASES = ["自提优先", "可小刀", "宿舍楼下交易", "支持验货", "包邮", "原价购入", "几乎没用过",
+           "有轻微使用痕迹", "配件齐全", "急出", "价格可议", "周末可面交"]
+PUBLISHERS = ["高等教育出版社", "人民邮电出版社", "清华大学出版社", "机械工业出版社"]
+BRANDS = ["得力", "小米", "飞利浦", "美的", "捷安特", "罗技"]
+ADDRESSES = [f"{building}号楼{room}室" for building in range(1, 21) for room in range(101, 111)]
+DATES = [f"2025-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+
+# 搜索测试的查询 (关键字, 类型)：普通关键字、仅类型、关键字 + 类型、属性条件、英文、无结果
+QUERIES = [
+    ("自行车", None), ("", "书籍"), ("九成新", "工具"), ("数学", "书籍"),
+    ("数量>=10", "食品"), ("python", None), ("包邮 全新", None), ("不存在的物品", None)
+]
+
+# 刷新列表测试的排序方式
+SORTS = [("id", False), ("date", True), ("name", False), ("type", False)]
+
+# 测缓存命中耗时（*_cached）时使用的搜索结果缓存大小（MB）
+CACHED_SEARCH_MB = 32
+
+# 模拟用户数：每 100 件物品一个用户，至少 50 个
+USERS_PER_ITEMS = 100
+PASSWORD = "bench-password"
+
+# 与基准比较的指标：各操作的 p50 / p95 延迟、加载耗时、峰值内存
+COMPARED_STATS = ("p50_ms", "p95_ms")
+
+
+# ---------- 模拟数据 ----------
+
+def type_attrs(rng, type_name):
+    """按默认类型（见 ItemService.init_default_item_types）的属性生成属性值"""
+    if type_name == "食品":
+        return {"保质期": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "数量": str(rng.randint(1, 20))}
+    if type_name == "书籍":
+        return {"作者": rng.choice(["张三", "李四", "王五", "刘慈欣", "同济大学数学系"]),
+                "出版社": rng.choice(PUBLISHERS), "ISBN": f"978-7-{rng.randint(10000, 99999)}-{rng.randint(100, 999)}"}
+    return {"品牌": rng.choice(BRANDS), "使用时长": f"{rng.randint(1, 36)}个月"}
+
+
+def make_items(count, types, user_ids, seed):
+    """逐件产出模拟物品（生成器，规模很大时也不占用内存）"""
+    rng = random.Random(seed)
+    for item_id in range(1, count + 1):
+        type_info = rng.choice(types)
+        type_name = type_info["name"]
+        yield {
+            "id": item_id,
+            "name": f"{rng.choice(CONDITIONS)}{rng.choice(ITEM_WORDS[type_name])}",
+            "description": "，".join(rng.sample(PHRASES, 3)) + f"，编号{rng.randint(1000, 9999)}",
+            "address": rng.choice(ADDRESSES),
+            "contact_phone": f"13{rng.randint(100000000, 999999999)}",
+            "contact_email": f"user{item_id}@example.com",
+            "type_id": type_info["type_id"],
+            "schema_version": type_info.get("version", 1),
+            "type_attrs": type_attrs(rng, type_name),
+            "date": rng.choice(DATES),
+            "user_id": rng.choice(user_ids)
+        }
+
+
+def generate(count, seed):
+    """在当前目录生成默认类型、模拟用户和 count 件物品，返回生成耗时（秒）"""
+    from security import hash_password
+    from service import ItemService
+
+    start = time.perf_counter()
+    service = ItemService()  # 空目录：创建默认管理员和默认类型
+    try:
+        # 所有模拟用户使用同一个密码哈希，避免生成时逐个计算
+        password = hash_password(PASSWORD)
+        users = [{"user_id": f"bench-user-{i}", "username": f"用户{i}", "password": password,
+                  "address": ADDRESSES[i % len(ADDRESSES)], "phone": f"139{i:08d}", "email": f"u{i}@example.com",
+                  "role": "user", "status": "approved"}
+                 for i in range(max(50, count // USERS_PER_ITEMS))]
+        service.storage.insert_many("users", iter(users))
+        user_ids = [user["user_id"] for user in users]
+        service.storage.insert_many("items", make_items(count, service.item_types, user_ids, seed))
+    finally:
+        service.close()
+    return time.perf_counter() - start
+
+
+# ---------- 测量 ----------
+
+def summarize(seconds):
+    """各次耗时（秒）-> 统计结果（毫秒）"""
+    values = sorted(seconds)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "mean_ms": round(total / len(values) * 1000, 4),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 4),
+        "min_ms": round(values[0] * 1000, 4),
+        "max_ms": round(values[-1] * 1000, 4),
+        "ops_per_second": round(len(values) / total, 2) if total else None
+    }
+
+
+def timed(repeat, operation):
+    """执行 repeat 次 operation(i)，返回统计结果"""
+    seconds = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        operation(i)
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+def file_sizes():
+    """当前目录下各数据文件的大小（字节）"""
+    return {name: os.path.getsize(name) for name in sorted(os.listdir(".")) if os.path.isfile(name)
+            and not name.endswith(".lock")}
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure_gui(service, repeat):
+    """用隐藏的 Tk 窗口测量 KeyedTreeview 刷新一页（按不同排序方式轮换）的耗时；没有图形环境时返回 None"""
+    import tkinter as tk
+    from tkinter import ttk
+
+    import config
+    from list_view import KeyedTreeview
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    try:
+        tree = ttk.Treeview(root, columns=("id", "name", "type", "description", "contact", "date"), show="headings")
+        view = KeyedTreeview(tree, lambda item: (item["id"], item["name"], service.type_name(item),
+                                                 item["description"], item["contact_phone"], item["date"]))
+
+        def refresh(i):
+            sort, descending = SORTS[i % len(SORTS)]
+            items, _ = service.page_items(None, sort, descending, config.PAGE_SIZE or None)
+            view.set_rows(items)
+            root.update_idletasks()
+
+        return timed(repeat, refresh)
+    finally:
+        root.destroy()
+
+
+def run_size(count, args):
+    """在当前目录（临时数据目录）中生成数据并测量全部操作，返回结果 dict"""
+    import config
+    from result_cache import ResultCache
+    from service import ItemService
+
+    result = {"items": count, "generate_seconds": round(generate(count, args.seed), 3)}
+    sizes_before = file_sizes()
+
+    # 加载数据（与界面启动时相同的完整加载和索引构建）
+    start = time.perf_counter()
+    service = ItemService()
+    load_seconds = time.perf_counter() - start
+    result["load"] = {"seconds": round(load_seconds, 4), "items_per_second": round(count / load_seconds, 1)}
+    operations = result["operations"] = {}
+    rng = random.Random(args.seed)
+    try:
+        admin = service.index.user_by_id["admin"]
+
+        # 搜索物品：返回完整的结果列表（search_items）和只取一页（query_items，界面和接口使用）。
+        # 子进程关闭了搜索结果缓存（ITEM_RESULT_CACHE_MB=0），测的是实际查询；
+        # 之后再开启缓存测一遍（*_cached），查询词轮流重复，反映缓存命中时的耗时
+        def search(i):
+            return service.search_items(*QUERIES[i % len(QUERIES)])
+
+        def query_page(i):
+            return service.query_items(*QUERIES[i % len(QUERIES)], sort=SORTS[i % len(SORTS)][0],
+                                       descending=SORTS[i % len(SORTS)][1], limit=config.PAGE_SIZE or None)
+        operations["search_items"] = timed(args.repeat, search)
+        operations["query_page"] = timed(args.repeat, query_page)
+        service.search_index.cache = ResultCache(int(CACHED_SEARCH_MB * 1024 * 1024))
+        operations["search_items_cached"] = timed(args.repeat, search)
+        operations["query_page_cached"] = timed(args.repeat, query_page)
+        service.search_index.cache = None
+
+        # 刷新列表：全部物品按不同排序方式取第一页并生成各行的显示内容（与 refresh_item_list 相同的数据路径）
+        def refresh(i):
+            sort, descending = SORTS[i % len(SORTS)]
+            items, _ = service.page_items(None, sort, descending, config.PAGE_SIZE or None)
+            for item in items:
+                (item["id"], item["name"], service.type_name(item), item["description"],
+                 f"{item['contact_phone']}\n{item['contact_email']}", item["date"])
+        operations["refresh_item_list"] = timed(args.repeat, refresh)
+        if args.gui:
+            gui = measure_gui(service, args.repeat)
+            if gui is None:
+                result["gui_skipped"] = "没有图形环境"
+            else:
+                operations["refresh_item_list_gui"] = gui
+
+        # 登录（计算密码哈希）和凭会话 token 认证（查缓存）
+        usernames = [user["username"] for user in service.users if user["role"] == "user"]
+        operations["login"] = timed(args.login_repeat, lambda i: service.login(usernames[i % len(usernames)], PASSWORD))
+        token = service.create_session(service.index.user_by_name[usernames[0]])
+        operations["session_user"] = timed(args.repeat, lambda i: service.session_user(token))
+
+        # 写入：发布物品、删除物品（每次都写入存储），整体保存
+        added = []
+
+        def add(i):
+            type_info = service.item_types[i % len(service.item_types)]
+            item = service.add_item(admin, type_info["name"], f"测试物品{i}", "性能测试", "1号楼101室",
+                                    "13800000000", "bench@example.com", type_attrs(rng, type_info["name"]))
+            added.append(item["id"])
+        operations["add_item"] = timed(args.write_repeat, add)
+
+        victims = rng.sample(sorted(service.index.item_by_id), min(args.write_repeat, count))
+        operations["delete_item"] = timed(len(victims), lambda i: service.delete_item(admin, victims[i]))
+        operations["save_data"] = timed(args.save_repeat, lambda i: service.save_data("items", service.items))
+    finally:
+        service.close()
+
+    result["file_sizes"] = {"generated": sizes_before, "after_writes": file_sizes()}
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_child(count, args):
+    """在子进程中测量一个规模（每个规模单独的临时目录，峰值内存互不影响），返回结果 dict"""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{count}-")
+    try:
+        env = dict(os.environ, ITEM_STORAGE=args.backend, ITEM_SNAPSHOT_FORMAT=args.snapshot_format,
+                   ITEM_RESULT_CACHE_MB="0")
+        command = [sys.executable, os.path.abspath(__file__), "--child", str(count),
+                   "--seed", str(args.seed), "--repeat", str(args.repeat), "--login-repeat", str(args.login_repeat),
+                   "--write-repeat", str(args.write_repeat), "--save-repeat", str(args.save_repeat)]
+        if args.gui:
+            command.append("--gui")
+        completed = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.PIPE, check=True)
+        return json.loads(completed.stdout)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------- 与基准比较 ----------
+
+def compare(results, baseline, tolerance):
+    """返回退化的指标列表：[(规模, 指标, 基准值, 当前值, 比值)]"""
+    regressions = []
+    baseline_runs = {str(run["items"]): run for run in baseline.get("runs", [])}
+    for run in results["runs"]:
+        old = baseline_runs.get(str(run["items"]))
+        if old is None:
+            continue
+        metrics = [("load.seconds", old["load"]["seconds"], run["load"]["seconds"]),
+                   ("peak_rss_mb", old["peak_rss_mb"], run["peak_rss_mb"])]
+        for name, stats in run["operations"].items():
+            old_stats = old["operations"].get(name)
+            if old_stats is not None:
+                metrics.extend((f"{name}.{stat}", old_stats[stat], stats[stat]) for stat in COMPARED_STATS)
+        for metric, old_value, new_value in metrics:
+            if old_value and new_value / old_value > 1 + tolerance:
+                regressions.append((run["items"], metric, old_value, new_value, round(new_value / old_value, 2)))
+    return regressions
+
+
+def print_summary(results):
+    """在标准错误输出上打印简要结果（标准输出留给 JSON）"""
+    for run in results["runs"]:
+        print(f"== {run['items']} 件物品：加载 {run['load']['seconds']:.3f} 秒，峰值内存 {run['peak_rss_mb']} MB",
+              file=sys.stderr)
+        for name, stats in run["operations"].items():
+            print(f"   {name:<22} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  "
+                  f"p99 {stats['p99_ms']:>10.3f} ms  {stats['ops_per_second'] or 0:>10.1f} 次/秒", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="物品复活系统性能测试套件")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="物品数量，逗号分隔（如 1000,10000,100000,1000000）")
+    parser.add_argument("--backend", default="json", choices=["json", "journal", "sqlite"], help="存储后端")
+    parser.add_argument("--snapshot-format", default="json", choices=["json", "binary"], help="json / journal 的快照格式")
+    parser.add_argument("--seed", type=int, default=1, help="模拟数据的随机种子（相同种子生成相同数据）")
+    parser.add_argument("--repeat", type=int, default=200, help="读操作的重复次数")
+    parser.add_argument("--login-repeat", type=int, default=10, help="登录的重复次数（每次计算一次密码哈希）")
+    parser.add_argument("--write-repeat", type=int, default=10, help="发布、删除物品的重复次数")
+    parser.add_argument("--save-repeat", type=int, default=2, help="整体保存的重复次数")
+    parser.add_argument("--gui", action="store_true", help="用隐藏的 Tk 窗口测量物品列表的实际刷新")
+    parser.add_argument("--output", help="结果 JSON 的保存路径（默认输出到标准输出）")
+    parser.add_argument("--baseline", help="与该基准结果文件比较")
+    parser.add_argument("--save-baseline", help="把本次结果另存为基准")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的变慢比例（默认 0.25，即 25%%）")
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退化的指标时以状态码 1 退出")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        json.dump(run_size(args.child, args), sys.stdout, ensure_ascii=False)
+        return
+
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "snapshot_format": args.snapshot_format,
+        "seed": args.seed,
+        "runs": []
+    }
+    for count in (int(size) for size in args.sizes.split(",")):
+        print(f"正在测试 {count} 件物品……", file=sys.stderr)
+        results["runs"].append(run_child(count, args))
+    print_summary(results)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        results["baseline"] = args.baseline
+        results["regressions"] = [dict(zip(("items", "metric", "baseline", "current", "ratio"), r)) for r in regressions]
+        for count, metric, old_value, new_value, ratio in regressions:
+            print(f"退化：{count} 件物品 {metric} {old_value} -> {new_value}（{ratio} 倍）", file=sys.stderr)
+        if not regressions:
+            print(f"与基准 {args.baseline} 相比没有超过 {args.tolerance:.0%} 的退化", file=sys.stderr)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
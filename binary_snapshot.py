@@ -0,0 +1,289 @@
+# 作者：谢建波
+# 文件目的：物品、用户、物品类型的二进制快照格式。文件可以直接 mmap，打开时只解析固定长度的文件头，
+# 按行号或主键读取单条记录时只解码这一行，按列扫描时只解码这一列，不需要反序列化整个文件。
+# 程序启动时整体加载（搜索索引需要全部物品的文本）仍会逐条解码全部记录，此时的好处是比解析 JSON 快，
+# 且逐行直接从映射的文件中解码，不先把整个文件读入内存。
+#
+# 文件布局（小端序）：
+#   文件头    固定 80 字节，见 HEADER
+#   行        每条记录一行，定长：整数列 8 字节，字符串列和 JSON 列为 4 字节的字符串编号，
+#             最后是 4 字节的“其他字段”编号（不在列定义中的字段，以 JSON 对象保存）
+#   主键索引  按主键排序的行号数组（每项 4 字节），用于二分查找
+#   字符串表  偏移数组（每项 8 字节，共 字符串数+1 项）+ UTF-8 文本；相同的字符串只保存一次
+# 列定义（列名和类型）以 JSON 保存在字符串表中，读取时不依赖 SCHEMAS。
+
+import array
+import json
+import mmap
+import struct
+import sys
+
+MAGIC = b"IRSNAP\x00\x01"
+VERSION = 1
+
+# 魔数、版本、列定义的字符串编号、行数、行宽、主键索引行数、行/主键索引/字符串偏移/字符串文本的起始位置、字符串数
+HEADER = struct.Struct("<8sIIQIIQQQQQ")
+HEADER_SIZE = 80
+
+# 缺失值：字符串编号和整数
+NO_STRING = 0xFFFFFFFF
+NO_INT = -2 ** 63
+
+# 列类型
+INT = "int"
+STR = "str"
+JSON = "json"
+
+# 各类数据的列定义（列名, 类型），第一列为主键
+SCHEMAS = {
+    "items": [
+        ("id", INT), ("name", STR), ("description", STR), ("address", STR),
+        ("contact_phone", STR), ("contact_email", STR), ("type_id", INT), ("type_name", STR),
+        ("schema_version", INT), ("type_attrs", JSON), ("date", STR), ("user_id", STR)
+    ],
+    "users": [
+        ("user_id", STR), ("username", STR), ("password", STR), ("address", STR),
+        ("phone", STR), ("email", STR), ("role", STR), ("status", STR)
+    ],
+    "item_types": [
+        ("type_id", INT), ("name", STR), ("attributes", JSON)
+    ]
+}
+
+# 记录中不存在的字段
+MISSING = object()
+
+
+def row_struct(schema):
+    """一行的二进制格式：每列一个值，最后是“其他字段”的字符串编号"""
+    return struct.Struct("<" + "".join("q" if kind == INT else "I" for _, kind in schema) + "I")
+
+
+def fits(kind, value):
+    """值能否直接保存在该类型的列中"""
+    if kind == INT:
+        return type(value) is int and NO_INT < value < 2 ** 63
+    if kind == STR:
+        return type(value) is str
+    return True
+
+
+class StringTable:
+    """写入时使用的字符串表，相同的字符串只保存一次"""
+
+    def __init__(self):
+        self.refs = {}
+        self.blob = bytearray()
+        self.offsets = [0]
+
+    def ref(self, text):
+        ref = self.refs.get(text)
+        if ref is None:
+            ref = self.refs[text] = len(self.offsets) - 1
+            self.blob += text.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return ref
+
+
+def write_snapshot(f, data_type, records):
+    """把记录写成二进制快照（f 为以二进制方式打开的文件）"""
+    schema = SCHEMAS[data_type]
+    names = {name for name, _ in schema}
+    row_format = row_struct(schema)
+    strings = StringTable()
+    schema_ref = strings.ref(json.dumps(schema))
+
+    rows = bytearray()
+    keys = []
+    for record in records:
+        values = []
+        extra = {}
+        for name, kind in schema:
+            value = record.get(name, MISSING)
+            if value is MISSING or not fits(kind, value):
+                # 缺失的字段记为空；类型不符的值放入“其他字段”，保证原样还原
+                values.append(NO_INT if kind == INT else NO_STRING)
+                if value is not MISSING:
+                    extra[name] = value
+            elif kind == INT:
+                values.append(value)
+            elif kind == STR:
+                values.append(strings.ref(value))
+            else:
+                values.append(strings.ref(json.dumps(value, ensure_ascii=False)))
+        for key in record.keys():
+            if key not in names:
+                extra[key] = record[key]
+        values.append(strings.ref(json.dumps(extra, ensure_ascii=False)) if extra else NO_STRING)
+        rows += row_format.pack(*values)
+        keys.append(record.get(schema[0][0], MISSING))
+
+    # 主键索引：只收录主键类型与列定义一致的行
+    key_kind = schema[0][1]
+    indexed = sorted((i for i, key in enumerate(keys) if key is not MISSING and fits(key_kind, key)),
+                     key=keys.__getitem__)
+    index = struct.pack(f"<{len(indexed)}I", *indexed)
+
+    rows_offset = HEADER_SIZE
+    index_offset = rows_offset + len(rows)
+    string_offsets_offset = index_offset + len(index)
+    string_count = len(strings.offsets) - 1
+    blob_offset = string_offsets_offset + 8 * len(strings.offsets)
+
+    header = HEADER.pack(MAGIC, VERSION, schema_ref, len(keys), row_format.size, len(indexed),
+                         rows_offset, index_offset, string_offsets_offset, blob_offset, string_count)
+    f.write(header.ljust(HEADER_SIZE, b"\0"))
+    f.write(rows)
+    f.write(index)
+    f.write(struct.pack(f"<{len(strings.offsets)}Q", *strings.offsets))
+    f.write(strings.blob)
+
+
+class BinarySnapshot:
+    """以 mmap 方式打开的二进制快照，按需解码记录，可用于 with 语句"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, version, schema_ref, self.count, self.row_size, self.index_count, self.rows_offset,
+             self.index_offset, self.string_offsets_offset, self.blob_offset,
+             self.string_count) = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不是二进制快照文件: {path}")
+            self.schema = [tuple(column) for column in json.loads(self.string(schema_ref))]
+            self.row_format = row_struct(self.schema)
+            if self.row_format.size != self.row_size:
+                raise ValueError(f"二进制快照文件已损坏: {path}")
+            self.columns = {name: i for i, (name, _) in enumerate(self.schema)}
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def string(self, ref):
+        """按编号读取字符串表中的字符串"""
+        if ref >= self.string_count:
+            raise ValueError("二进制快照文件已损坏：字符串编号越界")
+        start, end = struct.unpack_from("<QQ", self.map, self.string_offsets_offset + 8 * ref)
+        return self.map[self.blob_offset + start:self.blob_offset + end].decode("utf-8")
+
+    def _decode(self, kind, raw):
+        if kind == INT:
+            return MISSING if raw == NO_INT else raw
+        if raw == NO_STRING:
+            return MISSING
+        text = self.string(raw)
+        return text if kind == STR else json.loads(text)
+
+    def _row(self, row):
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return self.row_format.unpack_from(self.map, self.rows_offset + row * self.row_size)
+
+    def record(self, row):
+        """解码第 row 行的完整记录"""
+        raw = self._row(row)
+        record = {}
+        for (name, kind), value in zip(self.schema, raw):
+            value = self._decode(kind, value)
+            if value is not MISSING:
+                record[name] = value
+        if raw[-1] != NO_STRING:
+            record.update(json.loads(self.string(raw[-1])))
+        return record
+
+    def __iter__(self):
+        """顺序产出全部记录；重复出现的字符串（日期、地址等）只解码一次
+
+        行和字符串都通过 memoryview 直接从映射的文件中解码，不复制整段数据，
+        页面随着逐行读取才载入内存。迭代未结束时不能关闭快照（仍有指向映射的 memoryview）。
+        """
+        with memoryview(self.map) as view:
+            with view[self.string_offsets_offset:self.blob_offset] as offsets_view, \
+                    view[self.rows_offset:self.rows_offset + self.count * self.row_size] as rows:
+                if sys.byteorder == "little":
+                    offsets = offsets_view.cast("Q")
+                else:
+                    offsets = array.array("Q", offsets_view)
+                    offsets.byteswap()
+                try:
+                    yield from self._iter_rows(view, offsets, rows)
+                finally:
+                    if isinstance(offsets, memoryview):
+                        offsets.release()
+
+    def _iter_rows(self, view, offsets, rows):
+        cache = {}
+        blob_offset = self.blob_offset
+
+        def string(ref):
+            text = cache.get(ref)
+            if text is None:
+                if ref >= self.string_count:
+                    raise ValueError("二进制快照文件已损坏：字符串编号越界")
+                text = cache[ref] = str(view[blob_offset + offsets[ref]:blob_offset + offsets[ref + 1]], "utf-8")
+            return text
+
+        columns = list(enumerate(self.schema))
+        for raw in self.row_format.iter_unpack(rows):
+            record = {}
+            for i, (name, kind) in columns:
+                value = raw[i]
+                if kind == INT:
+                    if value != NO_INT:
+                        record[name] = value
+                elif value != NO_STRING:
+                    record[name] = string(value) if kind == STR else json.loads(string(value))
+            if raw[-1] != NO_STRING:
+                record.update(json.loads(string(raw[-1])))
+            yield record
+
+    def value(self, row, name, default=None):
+        """只解码第 row 行的一个字段"""
+        column = self.columns.get(name)
+        raw = self._row(row)
+        if column is not None:
+            value = self._decode(self.schema[column][1], raw[column])
+            if value is not MISSING:
+                return value
+        if raw[-1] != NO_STRING:
+            return json.loads(self.string(raw[-1])).get(name, default)
+        return default
+
+    def column(self, name):
+        """按行顺序逐个产出某一列的值（只解码这一列）"""
+        for row in range(self.count):
+            yield self.value(row, name)
+
+    def find(self, key):
+        """按主键二分查找，返回记录；不存在时返回 None"""
+        key_name, key_kind = self.schema[0]
+        if not fits(key_kind, key):
+            return None
+        low, high = 0, self.index_count
+        while low < high:
+            mid = (low + high) // 2
+            row = struct.unpack_from("<I", self.map, self.index_offset + 4 * mid)[0]
+            current = self.value(row, key_name)
+            if current == key:
+                return self.record(row)
+            if current < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
@@ -0,0 +1,238 @@
+# 作者：谢建波
+# 文件目的：物品的批量导入导出命令行工具。导入时逐行读取 CSV 或 JSONL 文件，按批校验
+# （规则与“添加物品”对话框相同，见 ItemService.validate_item），按批预留连续的ID，
+# 再由存储后端分块提交；导出时逐条读取物品并按关键字、类型筛选后写出。
+# 全程不把全部物品放入内存（二进制快照格式和追加日志后端除外，它们需要完整数据）。
+#
+# 用法：
+#   python bulk_io.py import 物品.csv [--user 用户名] [--batch-size 5000]
+#   python bulk_io.py export 导出.jsonl [--keyword 关键字] [--type 类型名称]
+# 文件格式按扩展名判断（.csv / .jsonl），也可用 --format 指定。
+# CSV 的列：type_name（或 type_id）、name、description、address、contact_phone、contact_email，
+# 可选 date（YYYY-MM-DD）、user_id；类型属性可以各占一列（列名为属性名；与公共列同名的属性列名前加“属性:”，
+# 如“属性:name”），也可以放在 type_attrs 列中（JSON 对象）。
+# JSONL 每行一个物品对象，字段与 items.json 相同。导入时忽略文件中的 id，总是分配新ID。
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from service import ItemService, ServiceError
+from text_normalize import normalize_keyword, searchable_text
+
+# 导出 CSV 时的公共列
+CSV_FIELDS = ["id", "name", "description", "address", "contact_phone", "contact_email",
+              "type_id", "type_name", "date", "user_id"]
+
+# 与公共列同名的类型属性，CSV 列名加上这个前缀
+ATTR_PREFIX = "属性:"
+
+# 最多显示多少条错误
+MAX_SHOWN_ERRORS = 20
+
+
+def attr_column(attr):
+    """类型属性在 CSV 中的列名"""
+    return ATTR_PREFIX + attr if attr in CSV_FIELDS or attr == "type_attrs" else attr
+
+
+def detect_format(path, fmt):
+    """按 --format 或扩展名确定文件格式"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in ("csv", "jsonl"):
+        raise SystemExit(f"无法识别的文件格式: {fmt or path}（请使用 --format csv 或 --format jsonl）")
+    return fmt
+
+
+def read_rows(f, fmt):
+    """逐行产出 (行号, 物品 dict 或 None, 错误信息)"""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_num, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"JSON 格式错误: {e}"
+            continue
+        if isinstance(row, dict):
+            yield line_num, row, None
+        else:
+            yield line_num, None, "每行必须是一个 JSON 对象"
+
+
+class ItemImporter:
+    """把读入的行校验、分配ID后交给存储后端"""
+
+    def __init__(self, service, user, batch_size):
+        self.service = service
+        self.user = user
+        self.batch_size = batch_size
+        self.today = datetime.now().strftime("%Y-%m-%d")
+        self.read = 0
+        self.imported = 0
+        self.errors = 0
+
+    def error(self, line_num, message):
+        self.errors += 1
+        if self.errors <= MAX_SHOWN_ERRORS:
+            print(f"第 {line_num} 行: {message}", file=sys.stderr)
+
+    def find_type(self, row):
+        type_id = row.get("type_id")
+        if type_id not in (None, ""):
+            try:
+                return self.service.index.type_by_id.get(int(type_id))
+            except (TypeError, ValueError):
+                return None
+        return self.service.index.type_by_name.get(str(row.get("type_name", "")).strip())
+
+    def type_attrs(self, row, type_info):
+        """类型属性：优先取 type_attrs 字段（dict 或 JSON 文本），否则按属性名取各列"""
+        attrs = row.get("type_attrs")
+        if isinstance(attrs, str) and attrs.strip():
+            attrs = json.loads(attrs)
+        if isinstance(attrs, dict):
+            return attrs
+        return {attr: row.get(attr_column(attr)) or "" for attr in type_info["attributes"]}
+
+    def validate(self, line_num, row):
+        """校验一行，返回新物品的 dict（尚无ID）；不合法时记录错误并返回 None"""
+        type_info = self.find_type(row)
+        if type_info is None:
+            self.error(line_num, "物品类型不存在")
+            return None
+        user = self.user
+        user_id = row.get("user_id")
+        if user_id:
+            user = self.service.index.user_by_id.get(str(user_id))
+            if user is None:
+                self.error(line_num, f"用户不存在: {user_id}")
+                return None
+        try:
+            return self.service.validate_item(
+                type_info, user, str(row.get("name") or ""), str(row.get("description") or ""),
+                str(row.get("address") or ""), str(row.get("contact_phone") or ""),
+                str(row.get("contact_email") or ""), self.type_attrs(row, type_info),
+                str(row.get("date") or "").strip() or self.today)
+        except ServiceError as e:
+            self.error(line_num, e.message)
+        except ValueError:
+            self.error(line_num, "type_attrs 不是合法的 JSON")
+        return None
+
+    def records(self, rows):
+        """逐批校验并分配ID，产出可以写入存储的物品"""
+        batch = []
+        for line_num, row, message in rows:
+            self.read += 1
+            if message is not None:
+                self.error(line_num, message)
+                continue
+            item = self.validate(line_num, row)
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield from self.assign_ids(batch)
+                batch = []
+        yield from self.assign_ids(batch)
+
+    def assign_ids(self, batch):
+        if not batch:
+            return
+        ids = self.service.id_sequence.reserve("items", len(batch))
+        for item_id, item in zip(ids, batch):
+            item["id"] = item_id
+        self.imported += len(batch)
+        yield from batch
+
+
+def import_items(args):
+    fmt = detect_format(args.file, args.format)
+    # 只加载用户和类型；物品不载入内存
+    service = ItemService(stream_items=True)
+    try:
+        user = service.index.user_by_name.get(args.user) if args.user else service.index.user_by_id.get("admin")
+        if user is None:
+            raise SystemExit(f"用户不存在: {args.user or 'admin'}")
+
+        # 没有持久化的ID序列时（旧数据），以现有物品的最大ID为起点
+        max_id = max((item["id"] for item in service.storage.iter_load("items")
+                      if isinstance(item, dict) and isinstance(item.get("id"), int)), default=0)
+        service.id_sequence.advance("items", max_id)
+
+        importer = ItemImporter(service, user, args.batch_size)
+        started = time.perf_counter()
+        with open(args.file, "r", encoding="utf-8-sig", newline="") as f:
+            service.storage.insert_many("items", importer.records(read_rows(f, fmt)), args.batch_size)
+        seconds = max(time.perf_counter() - started, 1e-6)
+    finally:
+        service.close()
+
+    print(f"读取 {importer.read} 行，导入 {importer.imported} 件物品，{importer.errors} 行有错误"
+          f"（{importer.read / seconds:.0f} 行/秒）")
+    if importer.errors > MAX_SHOWN_ERRORS:
+        print(f"（只显示了前 {MAX_SHOWN_ERRORS} 条错误）")
+
+
+def export_items(args):
+    fmt = detect_format(args.file, args.format)
+    keyword = normalize_keyword(args.keyword or "")
+    service = ItemService(stream_items=True)
+    try:
+        # CSV 中每个类型属性占一列
+        attr_columns = list(dict.fromkeys(attr_column(attr) for t in service.item_types for attr in t["attributes"]))
+        count = 0
+        with open(args.file, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, CSV_FIELDS + attr_columns, extrasaction="ignore")
+                writer.writeheader()
+            for item in service.storage.iter_load("items"):
+                if not service.valid_record("items", item, ()):
+                    continue
+                # 类型名称取自类型表，旧版本的属性换算为类型的当前版本
+                item = service.item_view(item)
+                if args.type and item["type_name"] != args.type:
+                    continue
+                if keyword and keyword not in searchable_text(item):
+                    continue
+                if fmt == "csv":
+                    row = {field: item.get(field, "") for field in CSV_FIELDS}
+                    row.update((attr_column(attr), value) for attr, value in (item.get("type_attrs") or {}).items())
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        service.close()
+    print(f"已导出 {count} 件物品到 {args.file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="物品批量导入导出")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="从 CSV / JSONL 文件导入物品")
+    import_parser.add_argument("file", help="导入文件")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"], help="文件格式（默认按扩展名判断）")
+    import_parser.add_argument("--user", help="物品的发布用户（行中没有 user_id 时使用，默认管理员）")
+    import_parser.add_argument("--batch-size", type=int, default=5000, help="每批校验和提交的行数")
+    import_parser.set_defaults(handler=import_items)
+
+    export_parser = subparsers.add_parser("export", help="把物品导出为 CSV / JSONL 文件")
+    export_parser.add_argument("file", help="导出文件")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], help="文件格式（默认按扩展名判断）")
+    export_parser.add_argument("--keyword", help="只导出名称、描述或类型属性包含关键字的物品")
+    export_parser.add_argument("--type", help="只导出该类型的物品")
+    export_parser.set_defaults(handler=export_items)
+
+    args = parser.parse_args()
+    args.handler(args)
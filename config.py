@@ -0,0 +1,91 @@
+# 作者：谢建波
+# 文件目的：集中管理物品复活系统的运行配置。所有配置项都可以通过同名环境变量覆盖，
+# 便于在不同部署环境（单机桌面、服务器）之间切换而无需修改代码。
+
+import os
+
+# 数据文件路径
+DATA_FILES = {
+    "items": "items.json",
+    "item_types": "item_types.json",
+    "users": "users.json"
+}
+
+# 元数据文件（ID 序列等），与数据文件放在一起
+META_FILE = "meta.json"
+
+# json / journal 后端的快照格式：json（可读的 JSON 文件）或 binary（可 mmap 的二进制快照，见 binary_snapshot.py）
+SNAPSHOT_FORMAT = os.environ.get("ITEM_SNAPSHOT_FORMAT", "json")
+
+# 二进制快照文件路径
+BINARY_FILES = {
+    "items": "items.bin",
+    "item_types": "item_types.bin",
+    "users": "users.bin"
+}
+
+# 存储后端：json（整文件原子写入）、journal（JSON 快照 + 追加日志）或 sqlite（单条记录读写）
+STORAGE_BACKEND = os.environ.get("ITEM_STORAGE", "json")
+
+# SQLite 数据库文件路径
+SQLITE_PATH = os.environ.get("ITEM_SQLITE_PATH", "item_resurrection.db")
+
+# 追加日志的后台合并：间隔秒数，以及日志累计多少条操作时提前合并
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get("ITEM_JOURNAL_COMPACT_INTERVAL", "30"))
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("ITEM_JOURNAL_COMPACT_THRESHOLD", "1000"))
+
+# 物品图片附件：保存目录（与数据文件放在一起）、单张图片的大小上限（MB）和每件物品最多的图片数
+ATTACHMENT_DIR = os.environ.get("ITEM_ATTACHMENT_DIR", "attachments")
+ATTACHMENT_MAX_MB = float(os.environ.get("ITEM_ATTACHMENT_MAX_MB", "10"))
+MAX_ITEM_IMAGES = int(os.environ.get("ITEM_MAX_ITEM_IMAGES", "9"))
+
+# 缩略图（需要 Pillow）：生成缩略图的后台线程数、内存中缓存的缩略图数，
+# 物品列表中的缩略图尺寸和选中物品时预览图的尺寸（像素）
+THUMBNAIL_WORKERS = int(os.environ.get("ITEM_THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_CACHE_ITEMS = int(os.environ.get("ITEM_THUMBNAIL_CACHE_ITEMS", "500"))
+LIST_THUMBNAIL_SIZE = int(os.environ.get("ITEM_LIST_THUMBNAIL_SIZE", "40"))
+PREVIEW_THUMBNAIL_SIZE = int(os.environ.get("ITEM_PREVIEW_THUMBNAIL_SIZE", "200"))
+
+# 物品列表虚拟化：开启后 Treeview 只渲染可见窗口内的行，适合物品数量很大的部署
+VIRTUAL_LIST = os.environ.get("ITEM_VIRTUAL_LIST", "0") == "1"
+
+# 物品列表每页显示的物品数，0 表示不分页（一次显示全部结果，建议同时开启 VIRTUAL_LIST）
+PAGE_SIZE = int(os.environ.get("ITEM_PAGE_SIZE", "100"))
+
+# 按关键字搜索时默认按相关度排序（界面中可以切换），以及相关度的时间衰减：
+# 发布日期每过多少天衰减系数减半，衰减在得分中所占的比重（0 表示不考虑发布日期）
+RANKED_SEARCH = os.environ.get("ITEM_RANKED_SEARCH", "1") == "1"
+RANK_RECENCY_HALF_LIFE_DAYS = float(os.environ.get("ITEM_RANK_RECENCY_HALF_LIFE_DAYS", "180"))
+RANK_RECENCY_WEIGHT = float(os.environ.get("ITEM_RANK_RECENCY_WEIGHT", "0.3"))
+
+# 边输入边搜索，以及输入停顿多少毫秒后才开始查询
+SEARCH_AS_YOU_TYPE = os.environ.get("ITEM_SEARCH_AS_YOU_TYPE", "1") == "1"
+SEARCH_DEBOUNCE_MS = int(os.environ.get("ITEM_SEARCH_DEBOUNCE_MS", "250"))
+
+# 界面启动时在后台流式加载物品，每解析多少条记录交给界面显示一次
+LOAD_BATCH_SIZE = int(os.environ.get("ITEM_LOAD_BATCH_SIZE", "2000"))
+
+# 类型的属性改名、删除后，后台迁移每批升级的物品数和批次间隔毫秒数
+MIGRATION_BATCH_SIZE = int(os.environ.get("ITEM_MIGRATION_BATCH_SIZE", "5000"))
+MIGRATION_INTERVAL_MS = int(os.environ.get("ITEM_MIGRATION_INTERVAL_MS", "1000"))
+
+# 搜索结果缓存的内存限额（MB），0 表示不缓存；物品或类型修改后缓存的结果自动失效
+RESULT_CACHE_MB = float(os.environ.get("ITEM_RESULT_CACHE_MB", "32"))
+
+# 密码哈希（PBKDF2-SHA256）的迭代次数，调整后已有用户在下一次登录时按新次数重新哈希
+PASSWORD_ITERATIONS = int(os.environ.get("ITEM_PASSWORD_ITERATIONS", "200000"))
+
+# 登录会话的有效期（秒，每次使用后顺延）和最多保留的会话数（超出时淘汰最久未使用的）
+SESSION_TTL = float(os.environ.get("ITEM_SESSION_TTL", "3600"))
+SESSION_CACHE_SIZE = int(os.environ.get("ITEM_SESSION_CACHE_SIZE", "10000"))
+
+# 热点路径的耗时统计（见 metrics.py）：是否开启、每项保留最近多少次、导出文件的默认路径
+METRICS_ENABLED = os.environ.get("ITEM_METRICS", "0") == "1"
+METRICS_WINDOW = int(os.environ.get("ITEM_METRICS_WINDOW", "1000"))
+METRICS_FILE = os.environ.get("ITEM_METRICS_FILE", "metrics.json")
+
+# 多进程共用数据目录：界面轮询其他进程写入的间隔毫秒数，
+# 写入时版本冲突的最大重试次数（之后改为全程持锁写入），SQLite 变更记录保留的条数
+SYNC_INTERVAL_MS = int(os.environ.get("ITEM_SYNC_INTERVAL_MS", "2000"))
+WRITE_RETRIES = int(os.environ.get("ITEM_WRITE_RETRIES", "5"))
+CHANGE_LOG_KEEP = int(os.environ.get("ITEM_CHANGE_LOG_KEEP", "100000"))
@@ -0,0 +1,84 @@
+# 作者：谢建波
+# 文件目的：为物品、用户、物品类型维护哈希索引（物品ID、用户名、用户ID、类型ID、类型名称、
+# 类型下的物品集合、按状态分组的用户），让删除物品、登录、注册查重、删除类型、选择类型、
+# 列出待审核用户等操作不再逐条扫描列表。
+# 所有修改数据的地方都要同步调用这里的方法，保持索引与列表一致。
+
+
+class DataIndex:
+    """物品、用户、物品类型的哈希索引"""
+
+    def __init__(self, items=(), users=(), item_types=()):
+        self.item_by_id = {}         # 物品ID -> 物品
+        self.user_by_name = {}       # 用户名 -> 用户
+        self.user_by_id = {}         # 用户ID -> 用户
+        self.users_by_status = {}    # 用户状态 -> {用户ID: 用户}（按加入索引的先后排列）
+        self.type_by_id = {}         # 类型ID -> 类型
+        self.type_by_name = {}       # 类型名称 -> 类型
+        self.item_ids_by_type = {}   # 类型ID -> 该类型下的物品ID集合
+
+        for item in items:
+            self.add_item(item)
+        for user in users:
+            self.add_user(user)
+        for type_info in item_types:
+            self.add_type(type_info)
+
+    def add_item(self, item):
+        self.item_by_id[item["id"]] = item
+        self.item_ids_by_type.setdefault(item["type_id"], set()).add(item["id"])
+
+    def remove_item(self, item):
+        self.item_by_id.pop(item["id"], None)
+        item_ids = self.item_ids_by_type.get(item["type_id"])
+        if item_ids is not None:
+            item_ids.discard(item["id"])
+            if not item_ids:
+                del self.item_ids_by_type[item["type_id"]]
+
+    def has_items_of_type(self, type_id):
+        """该类型下是否还有物品"""
+        return bool(self.item_ids_by_type.get(type_id))
+
+    def add_user(self, user):
+        # 用户名重复时保留先出现的记录，与原来按顺序查找的结果一致
+        self.user_by_name.setdefault(user["username"], user)
+        self.user_by_id[user["user_id"]] = user
+        self.users_by_status.setdefault(user["status"], {})[user["user_id"]] = user
+
+    def remove_user(self, user):
+        if self.user_by_name.get(user["username"]) is user:
+            del self.user_by_name[user["username"]]
+        self.user_by_id.pop(user["user_id"], None)
+        users = self.users_by_status.get(user["status"])
+        if users is not None and users.get(user["user_id"]) is user:
+            del users[user["user_id"]]
+
+    def set_user_status(self, user, status):
+        """修改用户状态（同时移到新状态的分组中）"""
+        self.remove_user(user)
+        user["status"] = status
+        self.add_user(user)
+
+    def add_type(self, type_info):
+        self.type_by_id[type_info["type_id"]] = type_info
+        self.type_by_name.setdefault(type_info["name"], type_info)
+
+    def remove_type(self, type_info):
+        self.type_by_id.pop(type_info["type_id"], None)
+        self._release_name(type_info, type_info["name"])
+
+    def rename_type(self, type_info, old_name):
+        """类型改名后调用（type_info 中已是新名称）"""
+        self._release_name(type_info, old_name)
+        self.type_by_name.setdefault(type_info["name"], type_info)
+
+    def _release_name(self, type_info, name):
+        """名称不再指向 type_info；若有同名的其他类型（如多个“新类型”），改为指向它"""
+        if self.type_by_name.get(name) is not type_info:
+            return
+        del self.type_by_name[name]
+        for other in self.type_by_id.values():
+            if other is not type_info and other["name"] == name:
+                self.type_by_name[name] = other
+                break
@@ -0,0 +1,62 @@
+# 作者：谢建波
+# 文件目的：跨进程的文件锁。多个 main.py / http_api.py 进程共用同一个数据目录时，
+# 用它把“检查版本 + 替换文件”“追加日志”“分配ID”等步骤串行化。
+# Windows 使用 msvcrt.locking，其他系统使用 fcntl.flock；同一进程内的线程由 threading.Lock 串行。
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """以 <path>.lock 为锁文件的互斥锁，可用于 with 语句"""
+
+    def __init__(self, path):
+        self.lock_path = path + ".lock"
+        self.thread_lock = threading.Lock()
+        self.fd = None
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        try:
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            else:
+                # LK_LOCK 最多重试 10 秒，超时抛出 OSError，此时继续等待
+                while True:
+                    try:
+                        msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            self.thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            os.close(self.fd)
+        finally:
+            self.fd = None
+            self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
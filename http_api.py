@@ -0,0 +1,384 @@
+# 作者：谢建波
+# 文件目的：基于 asyncio 的 HTTP/JSON 接口，直接调用 service.py 中的业务逻辑，
+# 一个进程即可同时服务大量客户端，可以部署在负载均衡之后，代替每个操作员各开一个桌面程序。
+# 多个接口进程可以共用同一个数据目录，每次请求前都会同步其他进程写入的变更。
+# 登录、注册时的密码哈希计算较慢，放到线程池中进行，期间事件循环照常处理其他客户端的请求。
+# 只使用标准库，实现 HTTP/1.1 的最小子集（Content-Length 请求体、keep-alive）。
+#
+# 接口一览（除登录、注册外都需要请求头 Authorization: Bearer <token>）：
+#   POST   /api/login                    {"username", "password"} -> {"token", "user"}
+#   POST   /api/register                 {"username", "password", "address", "phone", "email"}
+#   GET    /api/items?keyword=&type=&sort=&order=&cursor=&offset=&limit=
+#                                        keyword 中可以包含属性条件，如 数量>=3；sort 为 id（默认）/ date / name / type，
+#                                        或 relevance（按与关键字的相关度从高到低）；order 为 asc（默认）/ desc；翻页时把上一页返回的 next_cursor 作为 cursor 传回，
+#                                        -> {"total", "items", "next_cursor"}（没有下一页时 next_cursor 为 null）
+#   POST   /api/items                    {"type_name", "name", "description", "address",
+#                                         "contact_phone", "contact_email", "type_attrs", "images"（可选）}
+#   DELETE /api/items/<id>
+#   POST   /api/attachments              {"filename", "data"（base64）} 上传图片 -> {"name"}，
+#                                        发布物品时在 "images" 中列出附件名
+#   GET    /api/types
+#   POST   /api/types                    （管理员）新建类型
+#   PUT    /api/types/<id>               （管理员）{"name", "attributes", "attribute_types"（可选），
+#                                         "renames"（可选，属性改名 {旧名: 新名}）}
+#   DELETE /api/types/<id>               （管理员）
+#   GET    /api/users/pending?offset=&limit=   （管理员）-> {"total", "users"}
+#   POST   /api/users/<user_id>/approve  （管理员）
+#   POST   /api/users/approve            （管理员）{"user_ids": [...]} 批量批准，一次写入
+#   POST   /api/users/reject             （管理员）{"user_ids": [...]} 批量拒绝（删除待审核用户）
+#   GET    /api/stats                    （管理员）内存中的数据量、搜索结果缓存和缩略图缓存的统计
+
+import argparse
+import asyncio
+import base64
+import binascii
+import inspect
+import json
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+import config
+from security import hash_password, verify_password
+from service import ItemService, ServiceError
+from storage import json_default
+
+# 业务错误类别对应的 HTTP 状态码
+STATUS_BY_KIND = {
+    "invalid": 400,
+    "pending": 403,
+    "forbidden": 403,
+    "not_found": 404,
+    "storage": 500,
+    "loading": 503
+}
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+# 请求体大小上限（字节）；上传图片的请求按图片大小上限另算（base64 编码后约为原来的 4/3）
+MAX_BODY = 1024 * 1024
+MAX_UPLOAD_BODY = int(config.ATTACHMENT_MAX_MB * 1024 * 1024 * 4 / 3) + MAX_BODY
+
+
+def encode_cursor(cursor):
+    """翻页游标 (排序值, 物品ID) 或偏移量（按相关度排序时）编码为 URL 安全的字符串，客户端原样传回即可"""
+    text = json.dumps(cursor if isinstance(cursor, int) else list(cursor), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(text):
+    try:
+        raw = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+        return json.loads(raw.decode("utf-8"))
+    except (binascii.Error, ValueError):
+        raise HttpError(400, "翻页游标无效")
+
+
+class HttpError(Exception):
+    """直接返回给客户端的 HTTP 错误"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def public_user(user):
+    """返回给客户端的用户信息（不含密码）"""
+    return {key: value for key, value in user.items() if key != "password"}
+
+
+def text_field(data, key):
+    """请求体中的文本字段（缺少时为空字符串）"""
+    value = data.get(key, "")
+    if not isinstance(value, str):
+        raise HttpError(400, f"{key} 必须是字符串")
+    return value
+
+
+def user_id_list(data):
+    """请求体中的 user_ids（字符串列表）"""
+    user_ids = data.get("user_ids")
+    if not isinstance(user_ids, list) or not all(isinstance(user_id, str) for user_id in user_ids):
+        raise HttpError(400, "user_ids 必须是字符串列表")
+    return user_ids
+
+
+class ApiServer:
+    """HTTP 接口服务"""
+
+    def __init__(self, service):
+        self.service = service
+        self.routes = [
+            ("POST", ("api", "login"), self.login, False),
+            ("POST", ("api", "register"), self.register, False),
+            ("GET", ("api", "items"), self.list_items, True),
+            ("POST", ("api", "items"), self.add_item, True),
+            ("DELETE", ("api", "items", None), self.delete_item, True),
+            ("POST", ("api", "attachments"), self.upload_attachment, True),
+            ("GET", ("api", "types"), self.list_types, True),
+            ("POST", ("api", "types"), self.create_type, True),
+            ("PUT", ("api", "types", None), self.update_type, True),
+            ("DELETE", ("api", "types", None), self.delete_type, True),
+            ("GET", ("api", "users", "pending"), self.pending_users, True),
+            ("POST", ("api", "users", None, "approve"), self.approve_user, True),
+            ("POST", ("api", "users", "approve"), self.approve_users, True),
+            ("POST", ("api", "users", "reject"), self.reject_users, True),
+            ("GET", ("api", "stats"), self.stats, True)
+        ]
+
+    # ---------- HTTP 处理 ----------
+
+    async def handle_connection(self, reader, writer):
+        """处理一个连接上的若干请求（keep-alive）"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get("content-length", "0") or "0"
+                max_body = MAX_UPLOAD_BODY if urlsplit(target).path.rstrip("/") == "/api/attachments" else MAX_BODY
+                if not (length.isascii() and length.isdigit()):
+                    # 长度不是非负整数时无法确定请求体的边界，回复后关闭连接
+                    status, payload = 400, {"error": "Content-Length 无效"}
+                    keep_alive = False
+                elif int(length) > max_body:
+                    status, payload = 413, {"error": "请求体过大"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(int(length))
+                    status, payload = await self.dispatch(method, target, headers, body)
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version == "HTTP/1.1")
+
+                data = json.dumps(payload, ensure_ascii=False, default=json_default).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, headers, body):
+        """路由请求，返回 (状态码, JSON 对象)；处理函数可以是协程（登录、注册在线程池中计算密码哈希）"""
+        url = urlsplit(target)
+        parts = tuple(p for p in url.path.split("/") if p)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        path_matched = False
+        for route_method, pattern, handler, need_auth in self.routes:
+            if len(pattern) != len(parts):
+                continue
+            if any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+            args = [part for p, part in zip(pattern, parts) if p is None]
+            try:
+                # 先载入其他进程（桌面程序或其他接口实例）写入的变更
+                self.service.sync()
+                user = self.authenticate(headers) if need_auth else None
+                data = json.loads(body.decode("utf-8")) if body else {}
+                if not isinstance(data, dict):
+                    raise HttpError(400, "请求体必须是 JSON 对象")
+                result = handler(user, query, data, *args)
+                return await result if inspect.isawaitable(result) else result
+            except HttpError as e:
+                return e.status, {"error": e.message}
+            except ServiceError as e:
+                return STATUS_BY_KIND.get(e.kind, 400), {"error": e.title, "message": e.message}
+            except ValueError:
+                return 400, {"error": "请求格式错误"}
+            except Exception:
+                # 未预料的错误：记录下来并返回 500，不让异常中断连接（客户端会收不到任何响应）
+                traceback.print_exc()
+                return 500, {"error": "服务器内部错误"}
+
+        if path_matched:
+            return 405, {"error": "不支持的请求方法"}
+        return 404, {"error": "接口不存在"}
+
+    def authenticate(self, headers):
+        """根据 Bearer token 找到当前用户"""
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            raise HttpError(401, "请先登录")
+        user = self.service.session_user(auth[len("Bearer "):].strip())
+        if user is None:
+            raise HttpError(401, "登录已失效，请重新登录")
+        return user
+
+    # ---------- 接口 ----------
+
+    async def login(self, user, query, data):
+        user, password = self.service.login_user(text_field(data, "username"), text_field(data, "password"))
+        stored = user["password"] if user is not None else None
+        ok, needs_rehash = (await asyncio.to_thread(verify_password, password, stored)
+                            if user is not None else (False, False))
+        new_hash = await asyncio.to_thread(hash_password, password) if ok and needs_rehash else None
+        user = self.service.finish_login(user, stored, ok, new_hash)
+        token = self.service.create_session(user)
+        return 200, {"token": token, "user": public_user(user)}
+
+    async def register(self, user, query, data):
+        password = text_field(data, "password").strip()
+        password_hash = await asyncio.to_thread(hash_password, password) if password else None
+        new_user = self.service.register(text_field(data, "username"), password,
+                                         text_field(data, "address"), text_field(data, "phone"),
+                                         text_field(data, "email"), password_hash)
+        return 201, {"user": public_user(new_user)}
+
+    def list_items(self, user, query, data):
+        offset = max(0, int(query.get("offset", 0)))
+        limit = max(0, min(int(query.get("limit", 100)), 1000))
+        order = query.get("order", "asc")
+        if order not in ("asc", "desc"):
+            raise HttpError(400, "order 必须是 asc 或 desc")
+        cursor = decode_cursor(query["cursor"]) if query.get("cursor") else None
+        items, next_cursor, total = self.service.query_items(
+            query.get("keyword", ""), query.get("type") or None, query.get("sort", "id"),
+            order == "desc", limit, cursor, offset)
+        return 200, {"total": total, "items": [self.service.item_view(item) for item in items],
+                     "next_cursor": None if next_cursor is None else encode_cursor(next_cursor)}
+
+    def add_item(self, user, query, data):
+        type_attrs = data.get("type_attrs") or {}
+        if not isinstance(type_attrs, dict):
+            raise HttpError(400, "type_attrs 必须是对象")
+        images = data.get("images") or []
+        if not isinstance(images, list) or not all(isinstance(name, str) for name in images):
+            raise HttpError(400, "images 必须是字符串列表")
+        item = self.service.add_item(user, text_field(data, "type_name"), text_field(data, "name"),
+                                     text_field(data, "description"), text_field(data, "address"),
+                                     text_field(data, "contact_phone"), text_field(data, "contact_email"),
+                                     type_attrs, images)
+        return 201, {"item": self.service.item_view(item)}
+
+    def upload_attachment(self, user, query, data):
+        try:
+            content = base64.b64decode(data.get("data", ""), validate=True)
+        except (binascii.Error, TypeError):
+            raise HttpError(400, "图片数据不是有效的 base64")
+        return 201, {"name": self.service.store_image_data(content, text_field(data, "filename"))}
+
+    def delete_item(self, user, query, data, item_id):
+        self.service.delete_item(user, int(item_id))
+        return 200, {"deleted": int(item_id)}
+
+    def list_types(self, user, query, data):
+        return 200, {"types": self.service.item_types}
+
+    def create_type(self, user, query, data):
+        self.service.require_admin(user)
+        return 201, {"type": self.service.create_type()}
+
+    def update_type(self, user, query, data, type_id):
+        self.service.require_admin(user)
+        attributes = data.get("attributes", [])
+        if not isinstance(attributes, list):
+            raise HttpError(400, "attributes 必须是列表")
+        attribute_types = data.get("attribute_types")
+        if attribute_types is not None and not isinstance(attribute_types, dict):
+            raise HttpError(400, "attribute_types 必须是对象")
+        renames = data.get("renames")
+        if renames is not None and not isinstance(renames, dict):
+            raise HttpError(400, "renames 必须是对象")
+        type_info = self.service.update_type(int(type_id), text_field(data, "name"), attributes, attribute_types, renames)
+        return 200, {"type": type_info}
+
+    def delete_type(self, user, query, data, type_id):
+        self.service.require_admin(user)
+        self.service.delete_type(int(type_id))
+        return 200, {"deleted": int(type_id)}
+
+    def pending_users(self, user, query, data):
+        self.service.require_admin(user)
+        offset = max(0, int(query.get("offset", 0)))
+        limit = max(0, min(int(query.get("limit", 100)), 1000))
+        users = self.service.pending_users(offset, limit)
+        return 200, {"total": self.service.pending_count(), "users": [public_user(u) for u in users]}
+
+    def approve_user(self, user, query, data, user_id):
+        self.service.require_admin(user)
+        return 200, {"user": public_user(self.service.approve_user(user_id))}
+
+    def approve_users(self, user, query, data):
+        self.service.require_admin(user)
+        users = self.service.approve_users(user_id_list(data))
+        return 200, {"approved": [u["user_id"] for u in users]}
+
+    def reject_users(self, user, query, data):
+        self.service.require_admin(user)
+        users = self.service.reject_users(user_id_list(data))
+        return 200, {"rejected": [u["user_id"] for u in users]}
+
+    def stats(self, user, query, data):
+        self.service.require_admin(user)
+        return 200, {"collections": self.service.collection_sizes(), "search_cache": self.service.cache_stats(),
+                     "thumbnails": self.service.thumbnail_stats()}
+
+
+async def migrate_items(service):
+    """分批升级旧版本属性的物品（见 type_schema.py），批次之间让出事件循环处理请求"""
+    while True:
+        try:
+            service.sync()
+            migrated = service.migrate_items()
+        except ServiceError:
+            migrated = 0  # 保存失败时下一轮再试
+        await asyncio.sleep(0 if migrated else config.MIGRATION_INTERVAL_MS / 1000)
+
+
+async def serve(host, port):
+    service = ItemService()
+    api = ApiServer(service)
+    server = await asyncio.start_server(api.handle_connection, host, port)
+    migration = asyncio.create_task(migrate_items(service))
+    print(f"物品复活系统 HTTP 接口已启动: http://{host}:{port}/api/")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        migration.cancel()
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="物品复活系统 HTTP 接口")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,45 @@
+# 作者：谢建波
+# 文件目的：为物品、物品类型分配单调递增的ID。序列值随数据一起持久化（存储后端的元数据），
+# 启动时与现有数据的最大ID取较大者进行恢复；分配新ID不再需要对全部数据求 max，
+# 删除最大ID的记录后该ID也不会被重新使用。批量导入时可以一次预留一段连续的ID。
+# 多个进程共用数据目录时，分配通过存储后端的 update_meta 原子完成，各进程不会拿到相同的ID。
+
+import threading
+
+
+class IdSequence:
+    """按数据类型维护的ID序列"""
+
+    META_KEY = "sequences"
+
+    def __init__(self, storage, current_max):
+        """current_max：各数据类型现有记录的最大ID，如 {"items": 12, "item_types": 3}"""
+        self.storage = storage
+        self.lock = threading.Lock()
+        self.values = dict(storage.load_meta(self.META_KEY) or {})
+        for name, max_id in current_max.items():
+            self.values[name] = max(self.values.get(name, 0), max_id)
+
+    def advance(self, name, max_id):
+        """其他进程写入的记录ID已知后调用，保证之后分配的ID比它大"""
+        with self.lock:
+            self.values[name] = max(self.values.get(name, 0), max_id)
+
+    def next_id(self, name):
+        """分配一个新ID"""
+        return self.reserve(name, 1).start
+
+    def reserve(self, name, count):
+        """一次预留 count 个连续ID，返回 range；只持久化一次序列值"""
+        with self.lock:
+            def allocate(stored):
+                # 以存储中（可能已被其他进程推进）的值和本进程已知的值中较大者为起点
+                values = dict(stored or {})
+                for key, value in self.values.items():
+                    values[key] = max(values.get(key, 0), value)
+                values[name] = values.get(name, 0) + count
+                return values
+
+            self.values = self.storage.update_meta(self.META_KEY, allocate)
+            end = self.values[name]
+        return range(end - count + 1, end + 1)
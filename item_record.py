@@ -0,0 +1,145 @@
+# 作者：谢建波
+# 文件目的：物品的紧凑内存表示。每件物品由一个 __slots__ 对象保存，而不是带 11 个字符串键的 dict：
+# 类型名称、用户ID、日期、地址和属性值使用驻留字符串（相同内容在内存中只保存一份），
+# 类型属性拆成同类物品共享的属性名元组和各自的属性值元组。
+# ItemRecord 支持 item["name"]、get、keys、items 等 dict 用法，写入文件时用 to_dict 还原为 dict。
+
+import sys
+
+# 记录中不存在的字段
+MISSING = object()
+
+# 直接保存为属性的字段（与 JSON 中的键同名）
+FIELDS = ("id", "name", "description", "address", "contact_phone", "contact_email",
+          "type_id", "type_name", "schema_version", "date", "user_id")
+
+# 大量物品共享相同取值、需要驻留的字段
+INTERNED_FIELDS = frozenset(("address", "type_name", "date", "user_id"))
+
+# 转换为 dict 时的键顺序（与发布物品时创建的 dict 一致）
+KEY_ORDER = ("id", "name", "description", "address", "contact_phone", "contact_email",
+             "type_id", "type_name", "schema_version", "type_attrs", "date", "user_id")
+
+KNOWN_KEYS = frozenset(KEY_ORDER)
+FIELD_SET = frozenset(FIELDS)
+
+# 属性名元组 -> 共享的同一个元组对象
+_attr_keys = {}
+
+
+def intern_value(value):
+    """字符串驻留，其他类型原样返回"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class ItemRecord:
+    """一件物品，可以像只读的 dict 一样按键取值"""
+
+    __slots__ = FIELDS + ("attr_keys", "attr_values", "extra")
+
+    def __init__(self, record):
+        self.assign(record)
+
+    def assign(self, record):
+        """用一条完整的物品记录（dict 或 ItemRecord）覆盖全部字段"""
+        get = record.get
+        self.id = get("id", MISSING)
+        self.name = get("name", MISSING)
+        self.description = get("description", MISSING)
+        self.address = intern_value(get("address", MISSING))
+        self.contact_phone = get("contact_phone", MISSING)
+        self.contact_email = get("contact_email", MISSING)
+        self.type_id = get("type_id", MISSING)
+        self.type_name = intern_value(get("type_name", MISSING))
+        self.schema_version = get("schema_version", MISSING)
+        self.date = intern_value(get("date", MISSING))
+        self.user_id = intern_value(get("user_id", MISSING))
+        self._set_attrs(get("type_attrs", MISSING))
+        if KNOWN_KEYS.issuperset(record.keys()):
+            self.extra = None
+        else:
+            self.extra = {key: value for key, value in record.items() if key not in KNOWN_KEYS}
+
+    def _set_attrs(self, type_attrs):
+        if isinstance(type_attrs, dict):
+            keys = tuple(type_attrs)
+            self.attr_keys = _attr_keys.setdefault(keys, keys)
+            try:
+                self.attr_values = tuple(map(sys.intern, type_attrs.values()))
+            except TypeError:
+                # 属性值中有非字符串
+                self.attr_values = tuple(map(intern_value, type_attrs.values()))
+        else:
+            # 缺少或格式异常的 type_attrs 原样保留
+            self.attr_keys = type_attrs
+            self.attr_values = None
+
+    def _get(self, key):
+        if key in FIELD_SET:
+            return getattr(self, key)
+        if key == "type_attrs":
+            if self.attr_values is None:
+                return self.attr_keys
+            return dict(zip(self.attr_keys, self.attr_values))
+        if self.extra is not None:
+            return self.extra.get(key, MISSING)
+        return MISSING
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in FIELD_SET:
+            setattr(self, key, intern_value(value) if key in INTERNED_FIELDS else value)
+        elif key == "type_attrs":
+            self._set_attrs(value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def get(self, key, default=None):
+        value = self._get(key)
+        return default if value is MISSING else value
+
+    def __contains__(self, key):
+        return self._get(key) is not MISSING
+
+    def keys(self):
+        keys = [key for key in KEY_ORDER if self._get(key) is not MISSING]
+        if self.extra is not None:
+            keys.extend(self.extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self._get(key)) for key in self.keys()]
+
+    def values(self):
+        return [self._get(key) for key in self.keys()]
+
+    def to_dict(self):
+        """还原为普通 dict（type_attrs 为新建的 dict）"""
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, ItemRecord):
+            other = other.to_dict()
+        if not isinstance(other, dict):
+            return NotImplemented
+        if self.id != other.get("id", MISSING):
+            return False
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ItemRecord({self.to_dict()!r})"
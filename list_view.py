@@ -0,0 +1,315 @@
+# 作者：谢建波
+# 文件目的：物品列表（ttk.Treeview）的两种刷新方式。
+# KeyedTreeview 以物品 ID 作为 iid，与上一次显示的结果做差异比较，只插入、移动、删除变化的行；
+# VirtualTreeview 只保留可见窗口加上下缓冲区的若干行，滚动时复用这些行并只更新内容，
+# 滚动条按结果总数计算位置，刷新和滚动的开销只与窗口大小有关，而与物品总数无关。
+# 两种方式都提供 visible_rows()（当前可见的行），RowThumbnails 据此只为可见的行加载缩略图。
+
+from bisect import bisect_left
+from collections import OrderedDict
+import math
+import tkinter as tk
+from tkinter import ttk
+
+
+def longest_increasing_subsequence(keys, position):
+    """返回 keys 中按 position 递增的最长子序列（集合形式）"""
+    tails = []      # tails[k]：长度为 k+1 的递增子序列的末尾下标
+    tail_pos = []   # 与 tails 对应的 position 值
+    prev = [-1] * len(keys)
+    for i, key in enumerate(keys):
+        pos = position[key]
+        k = bisect_left(tail_pos, pos)
+        if k > 0:
+            prev[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_pos.append(pos)
+        else:
+            tails[k] = i
+            tail_pos[k] = pos
+
+    result = set()
+    i = tails[-1] if tails else -1
+    while i >= 0:
+        result.add(keys[i])
+        i = prev[i]
+    return result
+
+
+class KeyedTreeview:
+    """以物品 ID 为 iid 的增量刷新：Tk 上的操作次数只与变化的行数有关"""
+
+    def __init__(self, tree, row_values):
+        self.tree = tree
+        self.row_values = row_values  # 物品 -> Treeview 行的 values
+        self.order = []               # 当前显示的 iid 顺序
+        self.rows = []                # 与 order 对应的物品
+        self.values = {}              # iid -> 当前显示的 values
+
+    def set_rows(self, rows):
+        """把 Treeview 同步为 rows 的内容和顺序"""
+        new_keys = [str(row["id"]) for row in rows]
+        position = {key: i for i, key in enumerate(new_keys)}
+
+        # 删除不再显示的行
+        removed = [key for key in self.order if key not in position]
+        if removed:
+            self.tree.delete(*removed)
+            for key in removed:
+                del self.values[key]
+
+        # 保留的行中，处于最长递增子序列上的不动，其余先摘下再按新位置挂回
+        kept = [key for key in self.order if key in position]
+        stable = longest_increasing_subsequence(kept, position)
+        moved = [key for key in kept if key not in stable]
+        if moved:
+            self.tree.detach(*moved)
+
+        # 按新顺序处理：此时 Treeview 中已处理的行恰好占据前 i 个位置，其后是尚未处理的不动行
+        for i, row in enumerate(rows):
+            key = new_keys[i]
+            values = self.row_values(row)
+            old_values = self.values.get(key)
+            if old_values is None:
+                self.tree.insert("", i, iid=key, values=values)
+            else:
+                if key not in stable:
+                    self.tree.move(key, "", i)
+                if old_values != values:
+                    self.tree.item(key, values=values)
+            self.values[key] = values
+        self.order = new_keys
+        self.rows = rows
+
+    def visible_rows(self):
+        """当前可见的 (iid, 物品) 列表"""
+        if not self.order:
+            return []
+        top, bottom = self.tree.yview()
+        count = len(self.order)
+        first = int(top * count)
+        last = min(count, math.ceil(bottom * count))
+        return [(self.order[i], self.rows[i]) for i in range(first, last)]
+
+
+class VirtualTreeview:
+    """虚拟列表：rows 保存完整结果，Treeview 只渲染其中一个窗口"""
+
+    def __init__(self, tree, scrollbar, row_values, overscan=10):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.row_values = row_values  # 物品 -> Treeview 行的 values
+        self.overscan = overscan      # 可见区上下各多渲染的行数
+        self.rows = []                # 完整结果
+        self.offset = 0               # 可见区第一行在 rows 中的下标
+        self.window_start = 0         # 已渲染窗口第一行在 rows 中的下标
+        self.slot_count = 0           # 已渲染的行数（iid 为 "0" ~ "n-1"）
+        self.visible_count = 1        # 可见的行数
+        self.selected_keys = set()    # 选中物品的 ID（跨窗口保持）
+        self.rendering = False
+
+        # 滚动条由本类按结果总数驱动，不再跟随 Treeview 自身的视图
+        self.scrollbar.configure(command=self.yview)
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_rows(-self.visible_count))
+        self.tree.bind("<Next>", lambda e: self.scroll_rows(self.visible_count))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+
+    def set_rows(self, rows):
+        """替换显示的结果，保持滚动位置（超出范围时回到末尾）"""
+        self.rows = rows
+        live_keys = {row["id"] for row in rows} if self.selected_keys else set()
+        self.selected_keys &= live_keys
+        self.offset = min(self.offset, max(0, len(rows) - self.visible_count))
+        self.render(force=True)
+
+    def visible_rows(self):
+        """当前可见的 (iid, 物品) 列表"""
+        end = min(len(self.rows), self.offset + self.visible_count, self.window_start + self.slot_count)
+        return [(str(i - self.window_start), self.rows[i]) for i in range(self.offset, end)]
+
+    def on_configure(self, event):
+        rowheight = int(ttk.Style().lookup(self.tree.cget("style") or "Treeview", "rowheight") or 20)
+        # 减去一行作为表头高度
+        visible = max(1, event.height // rowheight - 1)
+        if visible != self.visible_count:
+            self.visible_count = visible
+            self.render(force=True)
+
+    def on_mousewheel(self, event):
+        self.scroll_rows(-1 * (event.delta // 120 or (1 if event.delta > 0 else -1)) * 3)
+        return "break"
+
+    def yview(self, *args):
+        """滚动条回调：moveto 按比例定位，scroll 按行或页滚动"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible_count
+            self.scroll_rows(step)
+
+    def scroll_rows(self, step):
+        self.scroll_to(self.offset + step)
+        return "break"
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.visible_count))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def move_selection(self, step):
+        """键盘上下移动选中行，必要时滚动窗口"""
+        index = self.focus_index()
+        if index is None:
+            index = self.offset - step
+        index = max(0, min(index + step, len(self.rows) - 1))
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.visible_count:
+            self.scroll_to(index - self.visible_count + 1)
+        if self.rows:
+            self.selected_keys = {self.rows[index]["id"]}
+            self.render(force=True)
+            self.tree.focus(str(index - self.window_start))
+            self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"
+
+    def focus_index(self):
+        focus = self.tree.focus()
+        if focus == "":
+            return None
+        return self.window_start + int(focus)
+
+    def on_select(self, event):
+        if self.rendering:
+            return
+        # 只替换当前窗口内的选择状态，窗口外的选中物品保持不变
+        window_keys = {row["id"] for row in self.rows[self.window_start:self.window_start + self.slot_count]}
+        self.selected_keys -= window_keys
+        for iid in self.tree.selection():
+            self.selected_keys.add(self.rows[self.window_start + int(iid)]["id"])
+
+    def render(self, force=False):
+        """按当前偏移渲染窗口；偏移仍在已渲染窗口内时只移动 Treeview 的视图"""
+        total = len(self.rows)
+        end = min(total, self.offset + self.visible_count)
+        if force or self.offset < self.window_start or end > self.window_start + self.slot_count:
+            self.window_start = max(0, self.offset - self.overscan)
+            window_end = min(total, end + self.overscan)
+            self.fill_slots(window_end - self.window_start)
+
+        if self.slot_count:
+            self.tree.yview_moveto((self.offset - self.window_start) / self.slot_count)
+        if total:
+            self.scrollbar.set(self.offset / total, end / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def fill_slots(self, count):
+        """复用已有的行，只在窗口大小变化时增删行"""
+        self.rendering = True
+        try:
+            if count < self.slot_count:
+                self.tree.delete(*[str(i) for i in range(count, self.slot_count)])
+            selected = []
+            for i in range(count):
+                row = self.rows[self.window_start + i]
+                values = self.row_values(row)
+                iid = str(i)
+                if i < self.slot_count:
+                    self.tree.item(iid, values=values)
+                else:
+                    self.tree.insert("", tk.END, iid=iid, values=values)
+                if row["id"] in self.selected_keys:
+                    selected.append(iid)
+            self.slot_count = count
+            self.tree.selection_set(selected)
+        finally:
+            self.rendering = False
+
+
+class RowThumbnails:
+    """在物品列表的 #0 列显示缩略图：只为可见的行请求，后台读取或生成完成后再设置到行上，界面线程只解码小的 PNG"""
+
+    def __init__(self, tree, view, thumbnails, images_of, size, max_photos=300, delay=50):
+        self.tree = tree
+        self.view = view              # KeyedTreeview 或 VirtualTreeview
+        self.thumbnails = thumbnails  # attachments.ThumbnailCache
+        self.images_of = images_of    # 物品 -> 附件名列表
+        self.size = size
+        self.max_photos = max_photos
+        self.delay = delay            # 合并连续滚动的等待时间和轮询后台结果的间隔（毫秒）
+        self.photos = OrderedDict()   # 附件名 -> tk.PhotoImage（需要保持引用，按最近使用的先后排列）
+        self.shown = {}               # 可见的 iid -> 已设置的 PhotoImage（None 表示无图）
+        self.waiting = {}             # 附件名 -> 后台读取或生成中的 Future
+        self.failed = set()           # 无法生成缩略图的附件
+        self.after_id = None
+        self.poll_id = None
+
+    def schedule(self):
+        """列表内容或滚动位置变化后调用：稍后检查可见的行"""
+        if self.after_id is None:
+            self.after_id = self.tree.after(self.delay, self.load_visible)
+
+    def load_visible(self):
+        self.after_id = None
+        if not self.tree.winfo_exists():
+            return
+        shown = {}
+        for iid, row in self.view.visible_rows():
+            images = self.images_of(row)
+            name = images[0] if images and images[0] not in self.failed else None
+            photo = None if name is None else self.photo(name)
+            if photo is None and name is not None:
+                # 还没有缩略图：交给后台，完成后再检查一次
+                if name not in self.waiting:
+                    self.waiting[name] = self.thumbnails.request(name, self.size)
+            if self.shown.get(iid, False) is not photo:
+                self.tree.item(iid, image=photo or "")
+            shown[iid] = photo
+        self.shown = shown
+        if self.waiting and self.poll_id is None:
+            self.poll_id = self.tree.after(self.delay, self.poll)
+
+    def photo(self, name):
+        """内存中已有缩略图时返回 PhotoImage，否则返回 None"""
+        photo = self.photos.get(name)
+        if photo is not None:
+            self.photos.move_to_end(name)
+            return photo
+        data = self.thumbnails.get(name, self.size)
+        if data is None:
+            return None
+        try:
+            photo = tk.PhotoImage(data=data)
+        except tk.TclError:
+            self.failed.add(name)
+            return None
+        self.photos[name] = photo
+        while len(self.photos) > self.max_photos:
+            self.photos.popitem(last=False)
+        return photo
+
+    def poll(self):
+        """检查后台的结果，有完成的就重新设置可见的行"""
+        self.poll_id = None
+        if not self.tree.winfo_exists():
+            return
+        done = [name for name, future in self.waiting.items() if future.done()]
+        for name in done:
+            if self.waiting.pop(name).result() is None:
+                self.failed.add(name)
+        if done:
+            self.load_visible()
+        elif self.waiting:
+            self.poll_id = self.tree.after(self.delay, self.poll)
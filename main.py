@@ -1,12 +1,32 @@
 # 作者：谢建波
 # 文件目的：实现物品复活系统（大学生闲置物品交易平台）的核心功能，包括用户管理（注册、登录、审核）、物品分类管理（创建、修改类型及属性）、物品管理（添加、删除、搜索）等，满足管理员和普通用户的不同操作需求。
+# 本文件为 Tkinter 图形界面，业务逻辑见 service.py。
+# 物品可以附带图片：列表最左侧显示第一张图片的缩略图（只为可见的行加载），选中物品时在右侧显示预览。
+# 开启耗时统计（ITEM_METRICS=1）时，刷新列表、搜索和各对话框的构建耗时记入 metrics.py，管理员可在性能面板中查看和导出。
 
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import json
-import os
-from datetime import datetime
-import uuid
+from tkinter import ttk, filedialog, messagebox, simpledialog
+
+import attachments
+import config
+import metrics
+from list_view import KeyedTreeview, RowThumbnails, VirtualTreeview
+from search_worker import SearchWorker
+from attr_filters import DATE, ENUM, INT, KIND_LABELS, STRING, attribute_spec
+from service import ItemService, ServiceError
+from text_normalize import normalize_keyword
+
+# 审核用户对话框每页显示的待审核用户数
+PENDING_PAGE_SIZE = 200
+
+# 可以点击标题排序的列 -> 排序方式（见 search_index.SORT_KEYS），以及这些列的标题
+SORT_COLUMNS = {"id": "id", "name": "name", "type": "type", "date": "date"}
+SORT_HEADINGS = {"id": "ID", "name": "物品名称", "type": "物品类型", "date": "发布日期"}
+
+# 性能面板的自动刷新间隔（毫秒），以及内存中各类数据的显示名称（见 ItemService.collection_sizes）
+METRICS_REFRESH_MS = 1000
+COLLECTION_LABELS = {"items": "物品", "item_types": "类型", "users": "用户", "pending_users": "待审核用户",
+                     "sessions": "会话", "migration_queue": "待迁移物品", "thumbnails": "缓存的缩略图"}
 
 
 class ItemResurrectionApp:
@@ -20,71 +40,51 @@ class ItemResurrectionApp:
         self.style = ttk.Style()
         self.style.configure("Treeview.Heading", font=("SimHei", 10, "bold"))
         self.style.configure("Treeview", font=("SimHei", 10), rowheight=25)
+        # 显示缩略图的物品列表加高行距
+        self.style.configure("Items.Treeview", rowheight=max(25, config.LIST_THUMBNAIL_SIZE + 6))
 
-        # 数据文件路径
-        self.data_files = {
-            "items": "items.json",
-            "item_types": "item_types.json",
-            "users": "users.json"
-        }
-
-        # 初始化数据
-        self.items = self.load_data("items")
-        self.item_types = self.load_data("item_types")
-        self.users = self.load_data("users")
+        # 业务逻辑层（加载用户和类型、构建索引；物品在显示登录界面后于后台加载）
+        self.service = ItemService(stream_items=True)
         self.current_user = None  # 当前登录用户
 
-        # 初始化默认物品类型（如果为空）
-        if not self.item_types:
-            self.init_default_item_types()
+        # 物品列表的排序方式和翻页位置：page_cursors 为已翻过的各页的起始游标，最后一项是当前页
+        self.sort_key = "id"
+        self.sort_descending = False
+        self.page_cursors = [None]
+        self.next_cursor = None
+        self.current_ids = None       # 当前显示的物品ID集合（搜索结果），None 表示全部物品
+        self.shown_query = ("", None)  # 当前显示的 (关键字, 类型)
+
+        # 后台搜索线程
+        self.search_worker = SearchWorker(self.root, self.service.search_index, self.show_search_results,
+                                          config.SEARCH_DEBOUNCE_MS)
+
+        # 定期载入其他进程写入的变更
+        self.root.after(config.SYNC_INTERVAL_MS, self.poll_changes)
+
+        # 类型的属性改名、删除后，分批升级旧物品
+        self.root.after(config.MIGRATION_INTERVAL_MS, self.run_migrations)
 
         # 显示登录界面
         self.show_login_screen()
 
-    def load_data(self, data_type):
-        """加载指定类型的数据"""
-        file_path = self.data_files[data_type]
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-
-    def save_data(self, data_type, data):
-        """保存数据到指定文件"""
-        try:
-            with open(self.data_files[data_type], "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            messagebox.showerror("保存失败", f"无法保存数据: {str(e)}")
-            return False
-
-    def init_default_item_types(self):
-        """初始化默认物品类型"""
-        self.item_types = [
-            {
-                "type_id": 1,
-                "name": "食品",
-                "attributes": ["保质期", "数量"]
-            },
-            {
-                "type_id": 2,
-                "name": "书籍",
-                "attributes": ["作者", "出版社", "ISBN"]
-            },
-            {
-                "type_id": 3,
-                "name": "工具",
-                "attributes": ["品牌", "使用时长"]
-            }
-        ]
-        self.save_data("item_types", self.item_types)
+        # 后台流式加载物品，解析出的记录分批并入列表
+        self.service.start_loading_items(config.LOAD_BATCH_SIZE)
+        self.root.after(50, self.poll_loaded_items)
+
+    def show_error(self, error):
+        """按错误类别弹出提示框"""
+        if error.kind == "storage":
+            messagebox.showerror(error.title, error.message)
+        elif error.kind in ("pending", "loading"):
+            messagebox.showinfo(error.title, error.message)
+        else:
+            messagebox.showwarning(error.title, error.message)
 
     def show_login_screen(self):
         """显示登录界面"""
+        self.search_worker.cancel()
+
         # 清空现有界面
         for widget in self.root.winfo_children():
             widget.destroy()
@@ -113,26 +113,16 @@ class ItemResurrectionApp:
 
     def login(self):
         """用户登录"""
-        username = self.username_var.get().strip()
-        password = self.password_var.get().strip()
-
-        if not username or not password:
-            messagebox.showwarning("输入错误", "用户名和密码不能为空")
+        try:
+            user = self.service.login(self.username_var.get(), self.password_var.get())
+        except ServiceError as e:
+            self.show_error(e)
             return
 
-        # 查找用户
-        for user in self.users:
-            if user["username"] == username and user["password"] == password:
-                if user["status"] == "approved" or user["role"] == "admin":
-                    self.current_user = user
-                    self.create_main_widgets()
-                    return
-                else:
-                    messagebox.showinfo("登录失败", "您的账号正在审核中，请等待管理员批准")
-                    return
-
-        messagebox.showwarning("登录失败", "用户名或密码错误")
+        self.current_user = user
+        self.create_main_widgets()
 
+    @metrics.timed("dialog.register")
     def register(self):
         """用户注册"""
         dialog = tk.Toplevel(self.root)
@@ -179,42 +169,20 @@ class ItemResurrectionApp:
         btn_frame.grid(row=5, column=0, columnspan=2, pady=15)
 
         def save_registration():
-            username = reg_user_var.get().strip()
-            password = reg_pwd_var.get().strip()
-            address = reg_addr_var.get().strip()
-            phone = reg_phone_var.get().strip()
-            email = reg_email_var.get().strip()
-
-            # 验证
-            if not all([username, password, address, phone, email]):
-                messagebox.showwarning("输入错误", "所有字段不能为空")
-                return
-
-            # 检查用户名是否已存在
-            if any(u["username"] == username for u in self.users):
-                messagebox.showwarning("注册失败", "用户名已存在")
+            try:
+                self.service.register(reg_user_var.get(), reg_pwd_var.get(), reg_addr_var.get(),
+                                      reg_phone_var.get(), reg_email_var.get())
+            except ServiceError as e:
+                self.show_error(e)
                 return
 
-            # 创建新用户
-            new_user = {
-                "user_id": str(uuid.uuid4()),
-                "username": username,
-                "password": password,
-                "address": address,
-                "phone": phone,
-                "email": email,
-                "role": "user",
-                "status": "pending"  # 待审核
-            }
-
-            self.users.append(new_user)
-            if self.save_data("users", self.users):
-                messagebox.showinfo("注册成功", "注册已提交，请等待管理员批准")
-                dialog.destroy()
+            messagebox.showinfo("注册成功", "注册已提交，请等待管理员批准")
+            dialog.destroy()
 
         ttk.Button(btn_frame, text="注册", command=save_registration).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=10)
 
+    @metrics.timed("create_main_widgets")
     def create_main_widgets(self):
         """创建主界面"""
         # 清空现有界面
@@ -237,9 +205,10 @@ class ItemResurrectionApp:
         ttk.Label(top_frame, text="物品类型:", font=("SimHei", 10)).pack(side=tk.LEFT, padx=(0, 5))
         self.type_var = tk.StringVar()
         type_combobox = ttk.Combobox(top_frame, textvariable=self.type_var, state="readonly", width=15)
-        type_combobox['values'] = ["全部"] + [t["name"] for t in self.item_types]
+        type_combobox['values'] = ["全部"] + [t["name"] for t in self.service.item_types]
         type_combobox.current(0)
         type_combobox.pack(side=tk.LEFT, padx=(0, 10))
+        self.type_combobox = type_combobox
 
         ttk.Label(top_frame, text="搜索:", font=("SimHei", 10)).pack(side=tk.LEFT, padx=(0, 5))
         self.search_var = tk.StringVar()
@@ -247,6 +216,17 @@ class ItemResurrectionApp:
         search_entry.pack(side=tk.LEFT, padx=(0, 10))
         search_btn = ttk.Button(top_frame, text="搜索", command=self.search_items)
         search_btn.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(top_frame, text="可按属性筛选，如 数量>=3", font=("SimHei", 9)).pack(side=tk.LEFT, padx=(0, 10))
+
+        # 有关键字时按相关度排序（点击列标题改为按该列排序）
+        self.ranked_var = tk.BooleanVar(value=config.RANKED_SEARCH)
+        ttk.Checkbutton(top_frame, text="按相关度", variable=self.ranked_var,
+                        command=self.toggle_ranked).pack(side=tk.LEFT, padx=(0, 10))
+
+        # 边输入边搜索
+        if config.SEARCH_AS_YOU_TYPE:
+            self.search_var.trace_add("write", lambda *args: self.schedule_search())
+            type_combobox.bind("<<ComboboxSelected>>", lambda e: self.schedule_search())
 
         # 操作按钮
         logout_btn = ttk.Button(top_frame, text="退出登录", command=self.show_login_screen)
@@ -269,21 +249,29 @@ class ItemResurrectionApp:
             approve_btn = ttk.Button(top_frame, text="审核用户", command=self.approve_users)
             approve_btn.pack(side=tk.RIGHT, padx=(5, 0))
 
+            metrics_btn = ttk.Button(top_frame, text="性能面板", command=self.show_performance_panel)
+            metrics_btn.pack(side=tk.RIGHT, padx=(5, 0))
+
         # 物品列表
         list_frame = ttk.Frame(main_frame)
         list_frame.pack(fill=tk.BOTH, expand=True)
 
-        # 创建表格
+        # 创建表格（可以生成缩略图时，最左侧的 #0 列显示物品第一张图片的缩略图）
         columns = ("id", "name", "type", "description", "contact", "date")
-        self.item_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
-
-        # 设置列标题
-        self.item_tree.heading("id", text="ID")
-        self.item_tree.heading("name", text="物品名称")
-        self.item_tree.heading("type", text="物品类型")
+        show_thumbnails = attachments.thumbnails_available()
+        if show_thumbnails:
+            self.item_tree = ttk.Treeview(list_frame, columns=columns, show="tree headings", style="Items.Treeview")
+            self.item_tree.heading("#0", text="图片")
+            self.item_tree.column("#0", width=config.LIST_THUMBNAIL_SIZE + 24, stretch=False, anchor=tk.CENTER)
+        else:
+            self.item_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+
+        # 设置列标题（点击 ID、名称、类型、日期列的标题按该列排序，再次点击切换升序/降序）
         self.item_tree.heading("description", text="物品描述")
         self.item_tree.heading("contact", text="联系人")
-        self.item_tree.heading("date", text="发布日期")
+        for column in SORT_COLUMNS:
+            self.item_tree.heading(column, command=lambda c=column: self.sort_by(SORT_COLUMNS[c]))
+        self.update_sort_headings()
 
         # 设置列宽
         self.item_tree.column("id", width=60, anchor=tk.CENTER)
@@ -293,9 +281,37 @@ class ItemResurrectionApp:
         self.item_tree.column("contact", width=150, anchor=tk.W)
         self.item_tree.column("date", width=120, anchor=tk.CENTER)
 
-        # 添加滚动条
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.item_tree.yview)
-        self.item_tree.configure(yscroll=scrollbar.set)
+        # 添加滚动条（虚拟列表模式下由 VirtualTreeview 驱动）
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        if config.VIRTUAL_LIST:
+            self.item_view = VirtualTreeview(self.item_tree, scrollbar, self.item_row_values)
+        else:
+            self.item_view = KeyedTreeview(self.item_tree, self.item_row_values)
+            scrollbar.configure(command=self.item_tree.yview)
+            self.item_tree.configure(yscroll=scrollbar.set)
+
+        # 缩略图：列表内容变化或滚动后，只为可见的行加载；右侧显示选中物品的预览图
+        self.row_thumbnails = None
+        self.preview_item = None
+        self.preview_photo = None
+        if show_thumbnails:
+            self.row_thumbnails = RowThumbnails(self.item_tree, self.item_view, self.service.thumbnails,
+                                                self.service.item_images, config.LIST_THUMBNAIL_SIZE)
+            scroll_set = None if config.VIRTUAL_LIST else scrollbar.set
+
+            def on_scroll(first, last):
+                if scroll_set is not None:
+                    scroll_set(first, last)
+                self.row_thumbnails.schedule()
+            self.item_tree.configure(yscroll=on_scroll)
+            self.item_tree.bind("<<TreeviewSelect>>", lambda e: self.show_preview(), add="+")
+
+            preview_frame = ttk.Frame(list_frame, width=config.PREVIEW_THUMBNAIL_SIZE + 20)
+            preview_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(10, 0))
+            preview_frame.pack_propagate(False)
+            self.preview_label = ttk.Label(preview_frame, text="选中物品后显示图片", font=("SimHei", 9),
+                                           anchor=tk.CENTER, compound=tk.TOP)
+            self.preview_label.pack(fill=tk.X, pady=10)
 
         # 布局表格和滚动条
         self.item_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -308,14 +324,23 @@ class ItemResurrectionApp:
         self.status_var = tk.StringVar(value="就绪 - 共有 0 件物品")
         ttk.Label(status_frame, textvariable=self.status_var, font=("SimHei", 9)).pack(side=tk.LEFT)
 
+        # 翻页
+        self.next_page_btn = ttk.Button(status_frame, text="下一页", command=self.next_page)
+        self.next_page_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        self.page_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.page_var, font=("SimHei", 9)).pack(side=tk.RIGHT, padx=(5, 0))
+        self.prev_page_btn = ttk.Button(status_frame, text="上一页", command=self.prev_page)
+        self.prev_page_btn.pack(side=tk.RIGHT, padx=(5, 0))
+
         # 刷新列表
         self.refresh_item_list()
 
+    @metrics.timed("dialog.manage_item_types")
     def manage_item_types(self):
         """管理物品类型（管理员功能）"""
         dialog = tk.Toplevel(self.root)
         dialog.title("管理物品类型")
-        dialog.geometry("600x400")
+        dialog.geometry("760x440")
         dialog.transient(self.root)
         dialog.grab_set()
 
@@ -342,7 +367,7 @@ class ItemResurrectionApp:
         ttk.Label(right_frame, text="类型名称:").pack(anchor=tk.W, pady=(10, 0))
         ttk.Entry(right_frame, textvariable=self.type_name_var).pack(fill=tk.X, pady=5)
 
-        ttk.Label(right_frame, text="属性列表:").pack(anchor=tk.W, pady=(10, 0))
+        ttk.Label(right_frame, text="属性列表（类型为枚举时，可选值用逗号分隔）:").pack(anchor=tk.W, pady=(10, 0))
         self.attr_frame = ttk.Frame(right_frame)
         self.attr_frame.pack(fill=tk.BOTH, expand=True, pady=5)
 
@@ -373,7 +398,7 @@ class ItemResurrectionApp:
         for item in self.type_tree.get_children():
             self.type_tree.delete(item)
 
-        for type_info in self.item_types:
+        for type_info in self.service.item_types:
             self.type_tree.insert("", tk.END, values=(type_info["type_id"], type_info["name"]),
                                   iid=str(type_info["type_id"]))
 
@@ -384,23 +409,36 @@ class ItemResurrectionApp:
             return
 
         type_id = int(selected[0])
-        type_info = next(t for t in self.item_types if t["type_id"] == type_id)
+        type_info = self.service.get_type(type_id)
+
+        # 编辑中的属性列表，每项为 (属性名, 类型变量, 可选值变量)；type_attr_renames 为 {原属性名: 新属性名}
+        self.current_type_attrs = []
+        self.type_attr_renames = {}
+        for attr in type_info["attributes"]:
+            spec = attribute_spec(type_info, attr)
+            self.current_type_attrs.append((attr, tk.StringVar(value=KIND_LABELS[spec["type"]]),
+                                            tk.StringVar(value="，".join(spec.get("options", [])))))
+        self.type_name_var.set(type_info["name"])
+        self.current_editing_type_id = type_id
+        self.show_type_attributes()
 
+    def show_type_attributes(self):
+        """显示编辑中的属性列表"""
         # 清空现有属性
         for widget in self.attr_frame.winfo_children():
             widget.destroy()
 
-        # 显示属性
-        self.current_type_attrs = type_info["attributes"].copy()
-        self.type_name_var.set(type_info["name"])
-        self.current_editing_type_id = type_id
-
-        for i, attr in enumerate(self.current_type_attrs):
+        for i, (attr, kind_var, options_var) in enumerate(self.current_type_attrs):
             frame = ttk.Frame(self.attr_frame)
             frame.pack(fill=tk.X, pady=2)
 
-            ttk.Label(frame, text=attr, width=15).pack(side=tk.LEFT)
+            ttk.Label(frame, text=attr, width=12).pack(side=tk.LEFT)
+            kind_combobox = ttk.Combobox(frame, textvariable=kind_var, state="readonly", width=6,
+                                         values=list(KIND_LABELS.values()))
+            kind_combobox.pack(side=tk.LEFT, padx=5)
+            ttk.Entry(frame, textvariable=options_var, width=18).pack(side=tk.LEFT, padx=5)
             ttk.Button(frame, text="删除", command=lambda idx=i: self.remove_type_attribute(idx)).pack(side=tk.RIGHT)
+            ttk.Button(frame, text="改名", command=lambda idx=i: self.rename_type_attribute(idx)).pack(side=tk.RIGHT)
 
     def add_type_attribute(self):
         """添加类型属性"""
@@ -411,31 +449,64 @@ class ItemResurrectionApp:
         if not hasattr(self, "current_type_attrs"):
             self.current_type_attrs = []
 
-        self.current_type_attrs.append(attr_name)
+        self.current_type_attrs.append((attr_name, tk.StringVar(value=KIND_LABELS[STRING]), tk.StringVar()))
         self.new_attr_var.set("")
-        self.on_type_select(None)  # 刷新显示
+        self.show_type_attributes()  # 刷新显示
 
     def remove_type_attribute(self, index):
         """删除类型属性"""
         if 0 <= index < len(self.current_type_attrs):
+            attr = self.current_type_attrs[index][0]
             del self.current_type_attrs[index]
-            self.on_type_select(None)  # 刷新显示
+            self.type_attr_renames = {old: new for old, new in getattr(self, "type_attr_renames", {}).items()
+                                      if new != attr}
+            self.show_type_attributes()  # 刷新显示
+
+    def rename_type_attribute(self, index):
+        """属性改名：已有物品的属性值保留在新名称下（保存后由后台迁移升级，见 type_schema.py）"""
+        attr, kind_var, options_var = self.current_type_attrs[index]
+        new_name = simpledialog.askstring("属性改名", f"把属性“{attr}”改名为:", initialvalue=attr)
+        new_name = (new_name or "").strip()
+        if not new_name or new_name == attr:
+            return
+        if any(other == new_name for other, _, _ in self.current_type_attrs):
+            messagebox.showwarning("改名失败", f"已有名为“{new_name}”的属性")
+            return
+
+        self.current_type_attrs[index] = (new_name, kind_var, options_var)
+        renames = self.type_attr_renames = getattr(self, "type_attr_renames", {})
+        for old, new in renames.items():
+            if new == attr:
+                renames[old] = new_name
+                break
+        else:
+            # 类型原有的属性才需要记录改名，本次新加的属性直接改名即可
+            type_info = self.service.index.type_by_id.get(getattr(self, "current_editing_type_id", None))
+            if type_info is not None and attr in type_info["attributes"]:
+                renames[attr] = new_name
+        self.show_type_attributes()
+
+    def edited_attribute_types(self):
+        """编辑区中各属性的类型定义"""
+        kinds = {label: kind for kind, label in KIND_LABELS.items()}
+        attribute_types = {}
+        for attr, kind_var, options_var in self.current_type_attrs:
+            spec = {"type": kinds[kind_var.get()]}
+            if spec["type"] == ENUM:
+                spec["options"] = options_var.get().replace("，", ",").split(",")
+            attribute_types[attr] = spec
+        return attribute_types
 
     def create_new_type(self):
         """创建新类型"""
-        new_id = 1
-        if self.item_types:
-            new_id = max(t["type_id"] for t in self.item_types) + 1
-
-        self.item_types.append({
-            "type_id": new_id,
-            "name": "新类型",
-            "attributes": []
-        })
+        try:
+            new_type = self.service.create_type()
+        except ServiceError as e:
+            self.show_error(e)
+            return
 
-        self.save_data("item_types", self.item_types)
         self.refresh_type_list()
-        self.type_tree.selection_set(str(new_id))
+        self.type_tree.selection_set(str(new_type["type_id"]))
         self.on_type_select(None)
 
     def save_type_changes(self):
@@ -443,19 +514,19 @@ class ItemResurrectionApp:
         if not hasattr(self, "current_editing_type_id"):
             return
 
-        type_name = self.type_name_var.get().strip()
-        if not type_name:
-            messagebox.showwarning("输入错误", "类型名称不能为空")
+        try:
+            self.service.update_type(self.current_editing_type_id, self.type_name_var.get(),
+                                     [attr for attr, _, _ in self.current_type_attrs],
+                                     self.edited_attribute_types(), self.type_attr_renames)
+        except ServiceError as e:
+            self.show_error(e)
             return
 
-        for i, t in enumerate(self.item_types):
-            if t["type_id"] == self.current_editing_type_id:
-                self.item_types[i]["name"] = type_name
-                self.item_types[i]["attributes"] = self.current_type_attrs
-                break
-
-        self.save_data("item_types", self.item_types)
+        self.type_attr_renames = {}
         self.refresh_type_list()
+        # 类型名称按类型表显示：刷新物品列表和搜索栏的类型选项
+        self.search_worker.invalidate()
+        self.refresh_current_view({"item_types"})
         messagebox.showinfo("成功", "类型修改已保存")
 
     def delete_item_type(self):
@@ -464,14 +535,18 @@ class ItemResurrectionApp:
             return
 
         # 检查是否有关联物品
-        has_items = any(item["type_id"] == self.current_editing_type_id for item in self.items)
-        if has_items:
-            messagebox.showwarning("删除失败", "该类型下有关联物品，无法删除")
+        try:
+            self.service.check_type_deletable(self.current_editing_type_id)
+        except ServiceError as e:
+            self.show_error(e)
             return
 
         if messagebox.askyesno("确认删除", "确定要删除该类型吗？"):
-            self.item_types = [t for t in self.item_types if t["type_id"] != self.current_editing_type_id]
-            self.save_data("item_types", self.item_types)
+            try:
+                self.service.delete_type(self.current_editing_type_id)
+            except ServiceError as e:
+                self.show_error(e)
+                return
             self.refresh_type_list()
 
             # 清空编辑区
@@ -480,19 +555,28 @@ class ItemResurrectionApp:
             self.type_name_var.set("")
             self.current_editing_type_id = None
 
+    @metrics.timed("dialog.approve_users")
     def approve_users(self):
         """审核用户（管理员功能）"""
         dialog = tk.Toplevel(self.root)
         dialog.title("审核用户")
-        dialog.geometry("600x400")
+        dialog.geometry("650x480")
         dialog.transient(self.root)
         dialog.grab_set()
 
         ttk.Label(dialog, text="待审核用户列表", font=("SimHei", 12)).pack(pady=10)
 
-        # 创建表格
+        # 按钮和翻页（先放在底部，表格占据其余空间）
+        page_frame = ttk.Frame(dialog)
+        page_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(0, 10), padx=10)
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5, padx=10)
+        list_frame = ttk.Frame(dialog)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 创建表格（可以按住 Ctrl / Shift 多选）
         columns = ("username", "address", "phone", "email")
-        user_tree = ttk.Treeview(dialog, columns=columns, show="headings")
+        user_tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="extended")
 
         user_tree.heading("username", text="用户名")
         user_tree.heading("address", text="住址")
@@ -505,56 +589,157 @@ class ItemResurrectionApp:
         user_tree.column("email", width=200, anchor=tk.W)
 
         # 滚动条
-        scrollbar = ttk.Scrollbar(dialog, orient=tk.VERTICAL, command=user_tree.yview)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=user_tree.yview)
         user_tree.configure(yscroll=scrollbar.set)
 
         user_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0), pady=10)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
 
-        # 加载待审核用户
-        pending_users = [u for u in self.users if u["status"] == "pending"]
-        for user in pending_users:
-            user_tree.insert("", tk.END, values=(
-                user["username"],
-                user["address"],
-                user["phone"],
-                user["email"]
-            ), iid=user["user_id"])
-
-        # 按钮
-        btn_frame = ttk.Frame(dialog)
-        btn_frame.pack(fill=tk.X, pady=10, padx=10)
-
-        def approve_selected():
-            selected = user_tree.selection()
-            if not selected:
-                messagebox.showwarning("选择错误", "请先选择用户")
-                return
-
-            user_id = selected[0]
-            for user in self.users:
-                if user["user_id"] == user_id:
-                    user["status"] = "approved"
-                    break
-
-            self.save_data("users", self.users)
-            messagebox.showinfo("成功", "用户已批准")
-            # 刷新列表
-            for item in user_tree.get_children():
-                user_tree.delete(item)
-            for user in [u for u in self.users if u["status"] == "pending"]:
+        # 待审核用户分页显示（每页 PENDING_PAGE_SIZE 人），可以多选后批量批准或拒绝
+        page = {"offset": 0}
+        page_var = tk.StringVar()
+        result_var = tk.StringVar()
+
+        def show_pending_page():
+            total = self.service.pending_count()
+            # 本页用户全部处理完后，若已超出末尾则退回上一页
+            while page["offset"] and page["offset"] >= total:
+                page["offset"] = max(0, page["offset"] - PENDING_PAGE_SIZE)
+            user_tree.delete(*user_tree.get_children())
+            for user in self.service.pending_users(page["offset"], PENDING_PAGE_SIZE):
                 user_tree.insert("", tk.END, values=(
                     user["username"],
                     user["address"],
                     user["phone"],
                     user["email"]
                 ), iid=user["user_id"])
+            pages = max(1, -(-total // PENDING_PAGE_SIZE))
+            page_var.set(f"第 {page['offset'] // PENDING_PAGE_SIZE + 1} / {pages} 页，共 {total} 位待审核用户")
+            prev_btn.configure(state=tk.NORMAL if page["offset"] else tk.DISABLED)
+            next_btn.configure(state=tk.NORMAL if page["offset"] + PENDING_PAGE_SIZE < total else tk.DISABLED)
+
+        def turn_page(step):
+            page["offset"] = max(0, page["offset"] + step * PENDING_PAGE_SIZE)
+            show_pending_page()
+
+        def review_selected(action):
+            selected = user_tree.selection()
+            if not selected:
+                messagebox.showwarning("选择错误", "请先选择用户", parent=dialog)
+                return
+            if action == "reject" and not messagebox.askyesno(
+                    "确认拒绝", f"确定要拒绝选中的 {len(selected)} 位用户吗?", parent=dialog):
+                return
 
-        ttk.Button(btn_frame, text="批准选中用户", command=approve_selected).pack(side=tk.LEFT, padx=10)
+            try:
+                if action == "approve":
+                    users = self.service.approve_users(selected)
+                    result_var.set(f"已批准 {len(users)} 位用户")
+                else:
+                    users = self.service.reject_users(selected)
+                    result_var.set(f"已拒绝 {len(users)} 位用户")
+            except ServiceError as e:
+                self.show_error(e)
+                return
+            show_pending_page()
+
+        ttk.Button(btn_frame, text="批准选中用户", command=lambda: review_selected("approve")).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="拒绝选中用户", command=lambda: review_selected("reject")).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="全选本页",
+                   command=lambda: user_tree.selection_set(user_tree.get_children())).pack(side=tk.LEFT, padx=10)
+        ttk.Label(btn_frame, textvariable=result_var).pack(side=tk.LEFT, padx=10)
+
+        next_btn = ttk.Button(page_frame, text="下一页", command=lambda: turn_page(1))
+        next_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Label(page_frame, textvariable=page_var).pack(side=tk.RIGHT, padx=(5, 0))
+        prev_btn = ttk.Button(page_frame, text="上一页", command=lambda: turn_page(-1))
+        prev_btn.pack(side=tk.RIGHT, padx=(5, 0))
+
+        show_pending_page()
+
+    def show_performance_panel(self):
+        """性能面板（管理员功能）：各操作最近的耗时分位数、每次保存写入的字节数、内存中的数据量，可导出为文件"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("性能面板")
+        dialog.geometry("760x480")
+        dialog.transient(self.root)
+
+        if not metrics.ENABLED:
+            ttk.Label(dialog, text="未开启耗时统计：设置环境变量 ITEM_METRICS=1 后重新启动程序",
+                      font=("SimHei", 10), foreground="red").pack(pady=(10, 0))
+        ttk.Label(dialog, text=f"各操作最近 {metrics.registry.window} 次的统计", font=("SimHei", 12)).pack(pady=10)
+
+        # 按钮和数据量（先放在底部，表格占据其余空间）
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=10, padx=10)
+        sizes_var = tk.StringVar()
+        ttk.Label(dialog, textvariable=sizes_var, font=("SimHei", 9)).pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+        list_frame = ttk.Frame(dialog)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 创建表格：耗时以毫秒为单位，bytes_written.* 为每次写入的字节数
+        columns = ("name", "count", "p50", "p95", "p99", "max")
+        stats_tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+        for column, text in zip(columns, ("操作", "次数", "p50", "p95", "p99", "最大")):
+            stats_tree.heading(column, text=text)
+            stats_tree.column(column, width=90, anchor=tk.E)
+        stats_tree.column("name", width=260, anchor=tk.W)
+
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=stats_tree.yview)
+        stats_tree.configure(yscroll=scrollbar.set)
+        stats_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(10, 0))
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        def show_stats():
+            if not dialog.winfo_exists():
+                return  # 面板已关闭，停止刷新
+            stats_tree.delete(*stats_tree.get_children())
+            snapshot = metrics.snapshot()
+            for name, stats in snapshot["stats"].items():
+                unit = "字节" if name.startswith("bytes_written.") else "毫秒"
+                stats_tree.insert("", tk.END, values=(
+                    f"{name}（{unit}）", stats["count"],
+                    *(f"{stats[key]:,.3f}".rstrip("0").rstrip(".") for key in ("p50", "p95", "p99", "max"))))
+            # 计数器只有累计次数
+            for name, count in sorted(snapshot["counters"].items()):
+                stats_tree.insert("", tk.END, values=(f"{name}（计数）", count, "", "", "", ""))
+            sizes = self.service.collection_sizes()
+            text = "内存中：" + "，".join(f"{COLLECTION_LABELS[key]} {count}" for key, count in sizes.items())
+            cache = self.service.cache_stats()
+            if cache is not None:
+                hit_rate = "-" if cache["hit_rate"] is None else f"{cache['hit_rate']:.1%}"
+                text += (f"\n搜索结果缓存：{cache['entries']} 项，{cache['bytes'] / 1024:.0f} KB，"
+                         f"命中 {cache['hits']} 次，未命中 {cache['misses']} 次（其中过期 {cache['stale']} 次），命中率 {hit_rate}")
+            thumbs = self.service.thumbnail_stats()
+            text += (f"\n缩略图缓存：{thumbs['memory_items']} 张，{thumbs['memory_bytes'] / 1024:.0f} KB，"
+                     f"内存命中 {thumbs['hits']} 次，磁盘命中 {thumbs['disk_hits']} 次，"
+                     f"生成 {thumbs['generated']} 张，失败 {thumbs['failures']} 张，生成中 {thumbs['pending']} 张")
+            sizes_var.set(text)
+            self.root.after(METRICS_REFRESH_MS, show_stats)
+
+        def export_metrics():
+            path = filedialog.asksaveasfilename(parent=dialog, title="导出性能统计", initialfile=config.METRICS_FILE,
+                                                defaultextension=".json", filetypes=[("JSON 文件", "*.json")])
+            if not path:
+                return
+            try:
+                metrics.export(path, collections=self.service.collection_sizes(), search_cache=self.service.cache_stats(),
+                               thumbnails=self.service.thumbnail_stats(), storage=config.STORAGE_BACKEND)
+            except OSError as e:
+                messagebox.showerror("导出失败", f"无法写入文件: {e}", parent=dialog)
+                return
+            messagebox.showinfo("导出成功", f"性能统计已导出到 {path}", parent=dialog)
+
+        ttk.Button(btn_frame, text="导出", command=export_metrics).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="清空统计", command=lambda: metrics.registry.reset()).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="关闭", command=dialog.destroy).pack(side=tk.RIGHT, padx=10)
+
+        show_stats()
+
+    @metrics.timed("dialog.add_item")
     def add_item(self):
         """添加新物品"""
-        if not self.item_types:
+        if not self.service.item_types:
             messagebox.showwarning("错误", "没有可用的物品类型，请联系管理员添加")
             return
 
@@ -587,8 +772,8 @@ class ItemResurrectionApp:
         ttk.Label(frame, text="物品类型:", font=("SimHei", 10)).grid(row=0, column=0, sticky=tk.W, pady=5)
         type_var = tk.StringVar()
         type_combobox = ttk.Combobox(frame, textvariable=type_var, state="readonly", width=25)
-        type_combobox['values'] = [t["name"] for t in self.item_types]
-        if self.item_types:
+        type_combobox['values'] = [t["name"] for t in self.service.item_types]
+        if self.service.item_types:
             type_combobox.current(0)
         type_combobox.grid(row=0, column=1, pady=5)
 
@@ -622,6 +807,28 @@ class ItemResurrectionApp:
         ttk.Entry(frame, textvariable=email_var, width=30).grid(row=row, column=1, pady=5)
         row += 1
 
+        # 图片（可选）：发布时按内容保存为附件，相同的图片只保存一份
+        ttk.Label(frame, text="物品图片:", font=("SimHei", 10)).grid(row=row, column=0, sticky=tk.W, pady=5)
+        image_paths = []
+        image_var = tk.StringVar(value="未选择图片")
+        image_frame = ttk.Frame(frame)
+        image_frame.grid(row=row, column=1, sticky=tk.W, pady=5)
+        row += 1
+
+        def choose_images():
+            patterns = " ".join("*" + ext for ext in attachments.IMAGE_EXTENSIONS)
+            paths = filedialog.askopenfilenames(parent=dialog, title="选择图片", filetypes=[("图片", patterns)])
+            image_paths.extend(path for path in paths if path not in image_paths)
+            image_var.set(f"已选择 {len(image_paths)} 张图片" if image_paths else "未选择图片")
+
+        def clear_images():
+            image_paths.clear()
+            image_var.set("未选择图片")
+
+        ttk.Button(image_frame, text="选择图片", command=choose_images).pack(side=tk.LEFT)
+        ttk.Button(image_frame, text="清除", command=clear_images).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(image_frame, textvariable=image_var, font=("SimHei", 9)).pack(side=tk.LEFT, padx=(5, 0))
+
         # 动态属性框架
         self.dynamic_attr_frame = ttk.Frame(frame)
         self.dynamic_attr_frame.grid(row=row, column=0, columnspan=2, sticky=tk.W, pady=5)
@@ -635,16 +842,22 @@ class ItemResurrectionApp:
 
             # 获取选中的类型
             type_name = type_var.get()
-            type_info = next(t for t in self.item_types if t["name"] == type_name)
+            type_info = self.service.index.type_by_name[type_name]
 
-            # 添加类型特有属性
+            # 添加类型特有属性（枚举属性用下拉框选择，整数和日期属性在名称后注明格式）
             self.attr_vars.clear()
             for i, attr in enumerate(type_info["attributes"]):
-                ttk.Label(self.dynamic_attr_frame, text=f"{attr}:", font=("SimHei", 10)).grid(
+                spec = attribute_spec(type_info, attr)
+                hint = {INT: "（整数）", DATE: "（YYYY-MM-DD）"}.get(spec["type"], "")
+                ttk.Label(self.dynamic_attr_frame, text=f"{attr}{hint}:", font=("SimHei", 10)).grid(
                     row=i, column=0, sticky=tk.W, pady=5)
                 attr_var = tk.StringVar()
-                ttk.Entry(self.dynamic_attr_frame, textvariable=attr_var, width=30).grid(
-                    row=i, column=1, pady=5)
+                if spec["type"] == ENUM:
+                    ttk.Combobox(self.dynamic_attr_frame, textvariable=attr_var, state="readonly", width=28,
+                                 values=spec["options"]).grid(row=i, column=1, pady=5)
+                else:
+                    ttk.Entry(self.dynamic_attr_frame, textvariable=attr_var, width=30).grid(
+                        row=i, column=1, pady=5)
                 self.attr_vars[attr] = attr_var
 
         # 绑定类型选择事件
@@ -658,58 +871,22 @@ class ItemResurrectionApp:
         row += 1
 
         def save_new_item():
-            type_name = type_var.get()
-            type_info = next(t for t in self.item_types if t["name"] == type_name)
-
-            name = name_var.get().strip()
-            description = desc_var.get().strip()
-            address = addr_var.get().strip()
-            phone = phone_var.get().strip()
-            email = email_var.get().strip()
-
-            # 验证公共信息
-            if not all([name, description, address, phone, email]):
-                messagebox.showwarning("输入错误", "公共信息不能为空")
+            type_attrs = {attr: var.get() for attr, var in self.attr_vars.items()}
+            try:
+                if len(image_paths) > config.MAX_ITEM_IMAGES:
+                    raise ServiceError("图片错误", f"每件物品最多 {config.MAX_ITEM_IMAGES} 张图片")
+                images = [self.service.store_image(path) for path in image_paths]
+                self.service.add_item(self.current_user, type_var.get(), name_var.get(), desc_var.get(),
+                                      addr_var.get(), phone_var.get(), email_var.get(), type_attrs, images)
+            except ServiceError as e:
+                self.show_error(e)
                 return
+            finally:
+                self.search_worker.invalidate()
 
-            # 验证类型属性
-            type_attrs = {}
-            for attr, var in self.attr_vars.items():
-                val = var.get().strip()
-                if not val:
-                    messagebox.showwarning("输入错误", f"{attr}不能为空")
-                    return
-                type_attrs[attr] = val
-
-            # 生成ID
-            new_id = 1
-            if self.items:
-                new_id = max(item["id"] for item in self.items) + 1
-
-            # 当前日期
-            current_date = datetime.now().strftime("%Y-%m-%d")
-
-            # 创建新物品
-            new_item = {
-                "id": new_id,
-                "name": name,
-                "description": description,
-                "address": address,
-                "contact_phone": phone,
-                "contact_email": email,
-                "type_id": type_info["type_id"],
-                "type_name": type_info["name"],
-                "type_attrs": type_attrs,
-                "date": current_date,
-                "user_id": self.current_user["user_id"]
-            }
-
-            # 保存
-            self.items.append(new_item)
-            if self.save_data("items", self.items):
-                messagebox.showinfo("成功", "物品添加成功!")
-                dialog.destroy()
-                self.refresh_item_list()
+            messagebox.showinfo("成功", "物品添加成功!")
+            dialog.destroy()
+            self.refresh_item_list()
 
         ttk.Button(btn_frame, text="保存", command=save_new_item).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=10)
@@ -723,89 +900,262 @@ class ItemResurrectionApp:
 
         # 获取选中物品的ID
         item_id = int(self.item_tree.item(selected_items[0])["values"][0])
-        item = next(i for i in self.items if i["id"] == item_id)
 
         # 权限检查
-        if self.current_user["role"] != "admin" and item["user_id"] != self.current_user["user_id"]:
-            messagebox.showwarning("权限不足", "您只能删除自己发布的物品")
+        try:
+            self.service.check_delete_permission(self.current_user, self.service.get_item(item_id))
+        except ServiceError as e:
+            self.show_error(e)
             return
 
         # 确认删除
         if messagebox.askyesno("确认删除", "确定要删除这件物品吗?"):
-            self.items = [item for item in self.items if item["id"] != item_id]
-            if self.save_data("items", self.items):
-                messagebox.showinfo("成功", "物品已删除!")
-                self.refresh_item_list()
-
-    def refresh_item_list(self):
-        """刷新物品列表"""
-        for item in self.item_tree.get_children():
-            self.item_tree.delete(item)
-
-        # 添加所有物品
-        for item in self.items:
-            self.item_tree.insert("", tk.END, values=(
-                item["id"],
-                item["name"],
-                item["type_name"],
-                item["description"],
-                f"{item['contact_phone']}\n{item['contact_email']}",
-                item["date"]
-            ))
+            try:
+                self.service.delete_item(self.current_user, item_id)
+            except ServiceError as e:
+                self.show_error(e)
+                return
+            finally:
+                self.search_worker.invalidate()
+
+            messagebox.showinfo("成功", "物品已删除!")
+            self.refresh_item_list(reset_page=False)
+
+    def item_row_values(self, item):
+        """物品在列表中显示的各列内容"""
+        return (
+            item["id"],
+            item["name"],
+            self.service.type_name(item),
+            item["description"],
+            f"{item['contact_phone']}\n{item['contact_email']}",
+            item["date"]
+        )
+
+    @metrics.timed("show_items")
+    def show_items(self, items):
+        """在物品列表中显示指定的物品（只更新与当前显示不同的行）"""
+        self.item_view.set_rows(items)
+        if self.row_thumbnails is not None:
+            self.row_thumbnails.schedule()
+
+    def show_preview(self):
+        """在右侧显示选中物品的第一张图片（预览图在后台读取或生成）"""
+        selected = self.item_tree.selection()
+        item = None
+        if selected:
+            item = self.service.index.item_by_id.get(int(self.item_tree.item(selected[0])["values"][0]))
+        images = [] if item is None else self.service.item_images(item)
+        self.preview_item = None if item is None else item["id"]
+        self.preview_photo = None
+        if not images:
+            self.preview_label.configure(image="", text="该物品没有图片" if item is not None else "选中物品后显示图片")
+            return
+        data = self.service.thumbnails.get(images[0], config.PREVIEW_THUMBNAIL_SIZE)
+        if data is not None:
+            self.set_preview(data, len(images))
+            return
+        self.preview_label.configure(image="", text="正在加载图片……")
+        future = self.service.thumbnails.request(images[0], config.PREVIEW_THUMBNAIL_SIZE)
+        self.root.after(50, self.poll_preview, future, item["id"], len(images))
+
+    def poll_preview(self, future, item_id, count):
+        """等待后台的预览图；期间选中了其他物品或离开主界面时放弃"""
+        if self.preview_item != item_id or not self.preview_label.winfo_exists():
+            return
+        if not future.done():
+            self.root.after(50, self.poll_preview, future, item_id, count)
+            return
+        self.set_preview(future.result(), count)
+
+    def set_preview(self, data, count):
+        if data is None:
+            self.preview_label.configure(image="", text="无法显示图片")
+            return
+        try:
+            self.preview_photo = tk.PhotoImage(data=data)
+        except tk.TclError:
+            self.preview_label.configure(image="", text="无法显示图片")
+            return
+        self.preview_label.configure(image=self.preview_photo, text=f"共 {count} 张图片")
+
+    @metrics.timed("show_page")
+    def show_page(self):
+        """按当前的排序方式和翻页位置显示 current_ids 中的物品"""
+        limit = config.PAGE_SIZE or None
+        ranked = self.ranking_active()
+        self.update_sort_headings()
+        while True:
+            try:
+                if ranked:
+                    # 按相关度排序时游标为偏移量
+                    items, self.next_cursor = self.service.rank_items(
+                        self.current_ids, self.shown_query[0], limit, self.page_cursors[-1] or 0)
+                else:
+                    items, self.next_cursor = self.service.page_items(
+                        self.current_ids, self.sort_key, self.sort_descending, limit, self.page_cursors[-1])
+            except ServiceError as e:
+                self.show_error(e)
+                return
+            # 当前页的物品已全部被删除时退回上一页
+            if items or len(self.page_cursors) == 1:
+                break
+            self.page_cursors.pop()
+        self.show_items(items)
+
+        if limit is None:
+            self.page_var.set("")
+        else:
+            self.page_var.set(f"第 {len(self.page_cursors)} 页")
+        self.prev_page_btn.configure(state=tk.NORMAL if len(self.page_cursors) > 1 else tk.DISABLED)
+        self.next_page_btn.configure(state=tk.NORMAL if self.next_cursor is not None else tk.DISABLED)
+
+    def next_page(self):
+        if self.next_cursor is not None:
+            self.page_cursors.append(self.next_cursor)
+            self.show_page()
+
+    def prev_page(self):
+        if len(self.page_cursors) > 1:
+            self.page_cursors.pop()
+            self.show_page()
+
+    def sort_by(self, sort_key):
+        """点击列标题：按该列排序，再次点击同一列切换升序/降序，回到第一页"""
+        if self.ranking_active():
+            # 从按相关度排序改为按该列升序
+            self.ranked_var.set(False)
+            self.sort_key = sort_key
+            self.sort_descending = False
+        elif sort_key == self.sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_key = sort_key
+            self.sort_descending = False
+        self.page_cursors = [None]
+        self.show_page()
+
+    def ranking_active(self):
+        """当前是否按相关度排序（勾选了“按相关度”且显示的是关键字搜索的结果）"""
+        return self.ranked_var.get() and bool(self.shown_query[0])
+
+    def toggle_ranked(self):
+        """切换“按相关度”，回到第一页"""
+        self.page_cursors = [None]
+        self.show_page()
+
+    def update_sort_headings(self):
+        """在排序列的标题后显示 ▲ / ▼（按相关度排序时不显示）"""
+        ranked = self.ranking_active()
+        for column, sort_key in SORT_COLUMNS.items():
+            text = SORT_HEADINGS[column]
+            if sort_key == self.sort_key and not ranked:
+                text += " ▼" if self.sort_descending else " ▲"
+            self.item_tree.heading(column, text=text)
+
+    @metrics.timed("refresh_item_list")
+    def refresh_item_list(self, reset_page=True):
+        """刷新物品列表（显示全部物品）；reset_page 为 False 时保持当前页"""
+        if reset_page or self.shown_query != ("", None):
+            self.page_cursors = [None]
+        self.current_ids = None
+        self.shown_query = ("", None)
+        self.show_page()
 
         # 更新状态栏
-        self.status_var.set(f"就绪 - 共有 {len(self.items)} 件物品")
+        if self.service.loading_items:
+            self.status_var.set(f"正在加载 - 已载入 {len(self.service.items)} 件物品")
+            return
+        status = f"就绪 - 共有 {len(self.service.items)} 件物品"
+        if self.service.skipped["items"]:
+            status += f"（跳过 {self.service.skipped['items']} 条无效记录）"
+        if "items" in self.service.load_errors:
+            status += f"（数据文件读取出错: {self.service.load_errors['items']}）"
+        self.status_var.set(status)
+
+    def current_query(self):
+        """读取搜索栏中的关键字和物品类型（None 表示全部类型）"""
+        keyword = normalize_keyword(self.search_var.get())
+        selected_type = self.type_var.get()
+        type_name = None if selected_type == "全部" else selected_type
+        return keyword, type_name
+
+    def schedule_search(self):
+        """输入变化时提交后台搜索（防抖）"""
+        keyword, type_name = self.current_query()
+        self.search_worker.schedule(keyword, type_name)
 
     def search_items(self):
         """搜索物品"""
-        keyword = self.search_var.get().strip().lower()
-        selected_type = self.type_var.get()
-
-        # 清空现有列表
-        for item in self.item_tree.get_children():
-            self.item_tree.delete(item)
-
-        # 筛选物品
-        count = 0
-        for item in self.items:
-            # 类型筛选
-            if selected_type != "全部" and item["type_name"] != selected_type:
-                continue
-
-            # 关键字筛选
-            if keyword and keyword not in item["name"].lower() and keyword not in item["description"].lower():
-                continue
-
-            # 显示符合条件的物品
-            self.item_tree.insert("", tk.END, values=(
-                item["id"],
-                item["name"],
-                item["type_name"],
-                item["description"],
-                f"{item['contact_phone']}\n{item['contact_email']}",
-                item["date"]
-            ))
-            count += 1
+        self.search_worker.cancel()
+
+        # 通过索引筛选物品（类型 + 关键字）
+        keyword, type_name = self.current_query()
+        ids = self.service.match_items(keyword, type_name)
+        self.show_search_results(keyword, type_name, ids)
+
+    @metrics.timed("show_search_results")
+    def show_search_results(self, keyword, type_name, ids):
+        """显示搜索结果（ids 为匹配的物品ID集合，None 表示全部物品）；查询条件不变时保持当前页"""
+        if (keyword, type_name) != self.shown_query:
+            self.page_cursors = [None]
+        self.current_ids = ids
+        self.shown_query = (keyword, type_name)
+        self.show_page()
 
         # 更新状态栏
-        self.status_var.set(f"搜索完成 - 找到 {count} 件匹配的物品")
+        total = len(self.service.items) if ids is None else len(ids)
+        self.status_var.set(f"搜索完成 - 找到 {total} 件匹配的物品")
+
+    def poll_loaded_items(self):
+        """把后台已解析的物品并入列表；加载完成前每 50 毫秒检查一次"""
+        if self.service.load_pending_items():
+            self.search_worker.invalidate()
+            self.refresh_current_view({"items"})
+        if self.service.loading_items:
+            self.root.after(50, self.poll_loaded_items)
+        else:
+            # 加载完成：更新状态栏
+            self.refresh_current_view({"items"})
+
+    def poll_changes(self):
+        """载入其他进程（其他桌面程序或 HTTP 接口）写入的变更，有变化时刷新界面"""
+        changed = self.service.sync()
+        if changed:
+            self.search_worker.invalidate()
+            self.refresh_current_view(changed)
+        self.root.after(config.SYNC_INTERVAL_MS, self.poll_changes)
+
+    def run_migrations(self):
+        """每次升级一批旧版本属性的物品，队列中还有物品时尽快继续"""
+        try:
+            migrated = self.service.migrate_items()
+        except ServiceError:
+            migrated = 0  # 保存失败时下一轮再试
+        if migrated:
+            self.search_worker.invalidate()
+        self.root.after(10 if self.service.pending_migrations() and migrated else config.MIGRATION_INTERVAL_MS,
+                        self.run_migrations)
+
+    def refresh_current_view(self, changed):
+        """按当前显示的内容（全部物品或搜索结果）重新显示物品列表"""
+        item_tree = getattr(self, "item_tree", None)
+        if item_tree is None or not item_tree.winfo_exists():
+            return  # 不在主界面
+        if "item_types" in changed:
+            self.type_combobox['values'] = ["全部"] + [t["name"] for t in self.service.item_types]
+        if "items" not in changed and "item_types" not in changed:
+            return
 
+        keyword, type_name = self.current_query()
+        if keyword or type_name:
+            self.search_worker.schedule(keyword, type_name)
+        else:
+            self.refresh_item_list(reset_page=False)
 
-if __name__ == "__main__":
-    # 初始化管理员账号（如果不存在）
-    if not os.path.exists("users.json"):
-        with open("users.json", "w", encoding="utf-8") as f:
-            json.dump([{
-                "user_id": "admin",
-                "username": "admin",
-                "password": "admin123",
-                "address": "管理员地址",
-                "phone": "12345678901",
-                "email": "admin@example.com",
-                "role": "admin",
-                "status": "approved"
-            }], f, ensure_ascii=False, indent=2)
 
+if __name__ == "__main__":
     root = tk.Tk()
     app = ItemResurrectionApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.service.close()
\ No newline at end of file
@@ -0,0 +1,163 @@
+# 作者：谢建波
+# 文件目的：热点路径的耗时与计数统计（按需开启），用于定位慢操作耗在哪一步（序列化、写文件、筛选、刷新列表等）。
+# 设置环境变量 ITEM_METRICS=1（config.METRICS_ENABLED）后：@timed("名称") 装饰的函数和 with span("名称") 包住的代码块
+# 每次执行的耗时（毫秒）记入该操作最近 config.METRICS_WINDOW 次的滚动窗口，observe 记录其他数值（如每次保存写入的字节数），
+# count 累加计数（搜索结果缓存的命中 / 未命中、日志追加与合并、写入冲突重试、同步载入的变更和整体重新加载、升级的物品数）。未开启时 timed 直接返回原函数、span 返回空的上下文管理器，热点路径上几乎没有额外开销。
+# snapshot() 汇总各项的 p50 / p95 / p99，export() 写入 JSON 文件便于离线分析；管理员界面的性能面板读取同样的数据。
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import config
+
+ENABLED = config.METRICS_ENABLED
+
+# 未开启统计时 span 返回的上下文管理器（可重复使用）
+NULL_SPAN = nullcontext()
+
+
+def percentile(sorted_values, fraction):
+    """线性插值的分位数（sorted_values 已排序）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class Metrics:
+    """各项统计：名称 -> 最近 window 个数值，以及累计次数、总和和计数器（线程安全）"""
+
+    def __init__(self, window=None):
+        self.window = window or config.METRICS_WINDOW
+        self.samples = {}   # 名称 -> 最近的数值
+        self.totals = {}    # 名称 -> [累计次数, 累计总和]
+        self.counters = {}  # 名称 -> 累计计数
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def observe(self, name, value):
+        """记录一个数值"""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+                self.totals[name] = [0, 0]
+            samples.append(value)
+            totals = self.totals[name]
+            totals[0] += 1
+            totals[1] += value
+
+    def count(self, name, amount=1):
+        """累加计数"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        """清空全部统计"""
+        with self.lock:
+            self.samples.clear()
+            self.totals.clear()
+            self.counters.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """汇总各项统计，返回可直接序列化为 JSON 的 dict"""
+        with self.lock:
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+            totals = {name: list(values) for name, values in self.totals.items()}
+            counters = dict(self.counters)
+        stats = {}
+        for name, values in sorted(samples.items()):
+            count, total = totals[name]
+            stats[name] = {
+                "count": count,
+                "total": round(total, 3),
+                "window": len(values),
+                "mean": round(sum(values) / len(values), 3),
+                "p50": round(percentile(values, 0.50), 3),
+                "p95": round(percentile(values, 0.95), 3),
+                "p99": round(percentile(values, 0.99), 3),
+                "max": round(values[-1], 3)
+            }
+        return {"started": self.started, "window": self.window, "stats": stats, "counters": counters}
+
+
+# 进程内共用的统计
+registry = Metrics()
+
+
+class Span:
+    """记录代码块耗时（毫秒）的上下文管理器"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def span(name):
+    """with span("名称"): 记录代码块的耗时"""
+    return Span(name) if ENABLED else NULL_SPAN
+
+
+def timed(name):
+    """装饰器：记录函数每次执行的耗时；未开启统计时原样返回函数"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+
+def observe(name, value):
+    """记录一个数值（如写入的字节数）"""
+    if ENABLED:
+        registry.observe(name, value)
+
+
+def count(name, amount=1):
+    """累加计数"""
+    if ENABLED:
+        registry.count(name, amount)
+
+
+def snapshot(**extra):
+    """当前统计，extra 中的内容（如内存中各类数据的数量）一并放入结果"""
+    result = registry.snapshot()
+    result["enabled"] = ENABLED
+    result["exported"] = time.time()
+    result.update(extra)
+    return result
+
+
+def export(path=None, **extra):
+    """把当前统计写入 JSON 文件（默认 config.METRICS_FILE），返回文件路径"""
+    path = path or config.METRICS_FILE
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(**extra), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,92 @@
+# 作者：谢建波
+# 文件目的：搜索结果按相关度排序。对名称、描述、类型属性值三个字段按 BM25F 打分（名称的权重最高），
+# 再按发布日期做时间衰减（越新的物品得分越高），用堆只取出得分最高的前 k 件，不对全部结果排序。
+# 打分所需的统计量由 SearchIndex 预先维护：词的文档频率即倒排索引中该词的物品数，
+# 各字段的平均长度由增删物品时累计的字段总长度求得；查询时只需对匹配的物品逐个计数，不再扫描全部物品。
+# 物品的可搜索文本中名称、描述、各属性值之间以换行分隔（见 text_normalize.searchable_text），据此划分字段。
+
+import heapq
+import math
+from datetime import date
+
+import config
+
+# 各字段（名称、描述、类型属性值）的权重
+FIELD_WEIGHTS = (3.0, 1.0, 0.7)
+
+# BM25 参数：词频饱和速度和字段长度归一化的程度
+K1 = 1.2
+B = 0.75
+
+
+def field_bounds(text):
+    """可搜索文本中名称、描述的结束位置（属性值从描述之后开始）"""
+    name_end = text.find("\n")
+    if name_end < 0:
+        return len(text), len(text)
+    desc_end = text.find("\n", name_end + 1)
+    return name_end, len(text) if desc_end < 0 else desc_end
+
+
+def field_lengths(text):
+    """名称、描述、类型属性值三个字段的长度（字符数）"""
+    name_end, desc_end = field_bounds(text)
+    return name_end, max(0, desc_end - name_end - 1), max(0, len(text) - desc_end - 1)
+
+
+def idf(doc_freq, total):
+    """逆文档频率（BM25 的平滑形式，恒为正）"""
+    return math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+class Ranker:
+    """一次查询的打分器：terms 为 [(查询词, 文档频率)]，field_totals 为各字段的总长度，total 为物品总数"""
+
+    def __init__(self, terms, field_totals, total, today=None):
+        self.terms = [(term, idf(doc_freq, total)) for term, doc_freq in terms]
+        self.averages = [max(length / total, 1.0) if total else 1.0 for length in field_totals]
+        self.today = (today or date.today()).toordinal()
+        self.half_life = config.RANK_RECENCY_HALF_LIFE_DAYS
+        self.recency_weight = config.RANK_RECENCY_WEIGHT
+        self.decays = {}  # 日期 -> 时间衰减系数（日期的取值很少，逐个缓存）
+
+    def decay(self, date_text):
+        """时间衰减系数：当天为 1，每过 half_life 天减半，日期无效时为 0"""
+        factor = self.decays.get(date_text)
+        if factor is None:
+            try:
+                age = max(0, self.today - date.fromisoformat(str(date_text)).toordinal())
+                factor = 0.5 ** (age / self.half_life) if self.half_life > 0 else 1.0
+            except ValueError:
+                factor = 0.0
+            self.decays[date_text] = factor
+        return factor
+
+    def score(self, text, date_text):
+        """物品的相关度：各查询词的 BM25F 得分之和，再乘以 (1 - w) + w * 时间衰减系数"""
+        name_end, desc_end = field_bounds(text)
+        end = len(text)
+        norms = (
+            1 - B + B * name_end / self.averages[0],
+            1 - B + B * max(0, desc_end - name_end - 1) / self.averages[1],
+            1 - B + B * max(0, end - desc_end - 1) / self.averages[2]
+        )
+        name_weight, desc_weight, attr_weight = FIELD_WEIGHTS
+        total = 0.0
+        for term, term_idf in self.terms:
+            count = text.count(term)
+            if not count:
+                continue
+            in_name = text.count(term, 0, name_end)
+            in_desc = text.count(term, name_end, desc_end) if count > in_name else 0
+            tf = (name_weight * in_name / norms[0] + desc_weight * in_desc / norms[1]
+                  + attr_weight * (count - in_name - in_desc) / norms[2])
+            total += term_idf * tf * (K1 + 1) / (tf + K1)
+        return total * (1 - self.recency_weight + self.recency_weight * self.decay(date_text))
+
+
+def top_k(ids, key, k):
+    """按 key 从大到小取前 k 个（k 为 None 时全部排序），得分相同时ID大（较新）的在前"""
+    if k is None:
+        return sorted(ids, key=lambda item_id: (key(item_id), item_id), reverse=True)
+    return heapq.nlargest(k, ids, key=lambda item_id: (key(item_id), item_id))
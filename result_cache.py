@@ -0,0 +1,93 @@
+# 作者：谢建波
+# 文件目的：搜索结果缓存（最近最少使用淘汰，按估算内存占用限额）。
+# 键为 (规范化后的关键字, 类型名称)，值为匹配的物品ID集合（frozenset，None 表示全部物品），
+# 每项同时记下写入时的数据代数（SearchIndex.generation()：物品和类型各自的修改计数）。
+# 读取时代数不一致即视为过期并丢弃，因此添加、删除、修改物品或类型（包括其他进程同步来的变更）后不会返回旧结果，
+# 也不需要按时间失效。命中、未命中、过期和淘汰次数由 stats() 提供。
+
+import sys
+import threading
+from collections import OrderedDict
+
+# 缓存中没有该键（与缓存的 None 结果区分）
+MISSING = object()
+
+# 每项除结果集合外的固定开销估算（键、元组、OrderedDict 节点），单位字节
+ENTRY_OVERHEAD = 200
+
+
+def result_size(key, ids):
+    """估算一项缓存占用的内存（字节）；物品ID本身由物品数据共用，不计入"""
+    size = ENTRY_OVERHEAD + sys.getsizeof(key[0])
+    if ids is not None:
+        size += sys.getsizeof(ids)
+    return size
+
+
+class ResultCache:
+    """搜索结果的 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # 键 -> (代数, 结果, 估算字节数)，按最近使用的先后排列
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0       # 找到了但数据已修改、被丢弃的次数（同时计入 misses）
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, generation):
+        """返回缓存的结果；没有或已过期时返回 MISSING"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] != generation:
+                self._discard(key)
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, generation, ids):
+        """写入结果；超过限额时淘汰最久未使用的项，单项超过限额时不缓存"""
+        size = result_size(key, ids)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._discard(key)
+            self.entries[key] = (generation, ids, size)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        self.used_bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        """命中率和占用情况"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
@@ -0,0 +1,381 @@
+# 作者：谢建波
+# 文件目的：为物品搜索提供内存倒排索引。中文按单字和相邻双字（bigram）切分，英文数字按单词切分，
+# 启动时从 items.json 构建一次，添加/删除物品时增量维护，查询时先用索引求候选集再做子串校验，
+# 保证与逐条 `keyword in text` 的结果完全一致。索引内部加锁，可以在后台搜索线程中查询。
+# 每件物品的可搜索文本（名称、描述、类型属性值，见 text_normalize.searchable_text）在加入索引时
+# 规范化一次并缓存，物品修改后重新加入索引时重新计算；查询时不再对每件物品做字符串处理。
+# 关键字中的属性条件（如 数量>=3）交给 attr_filters.AttributeIndex，通过有序索引求出结果后与关键字结果取交集。
+# 列表的排序和翻页（page）使用按编号、日期、名称、类型维护的有序索引（第一次按该方式排序时建立），
+# 取“最新的 50 件书籍”时沿索引读取，不需要对全部结果排序。
+# 类型按 type_id 索引，类型名称通过类型表解析，类型改名后不需要重新索引物品。
+# 查询结果可以缓存（result_cache.ResultCache，按 (关键字, 类型) 缓存匹配的物品ID集合）：物品和类型各有一个修改计数，
+# 索引中增删物品、修改类型时加 1，缓存项的计数与当前不一致即失效，重复的搜索不再扫描候选集。
+# 按相关度排序（rank）使用 ranking.py 的 BM25F 打分：词的文档频率取自倒排索引，各字段的总长度在增删物品时累计。
+
+import itertools
+import re
+import threading
+
+import metrics
+from attr_filters import AttributeIndex
+from ranking import Ranker, field_lengths, top_k
+from result_cache import MISSING, ResultCache
+from sorted_index import SortedIndex
+from text_normalize import normalize, searchable_text
+
+# 中日韩统一表意文字（含扩展A区和兼容区）
+CJK_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+# 英文单词与数字（文本已规范化）
+WORD_RE = re.compile(r"[0-9a-z]+")
+
+# 列表的排序方式 -> 物品的排序值（名称按规范化后的文本排序，类型按类型表中的当前名称排序）
+SORT_KEYS = {
+    "id": lambda item, types: item["id"],
+    "date": lambda item, types: str(item["date"]),
+    "name": lambda item, types: normalize(str(item["name"])),
+    "type": lambda item, types: type_label(types, item)
+}
+
+# 直接对结果排序时每件物品的代价，约为沿有序索引检查一项的多少倍（用于 page 选择取页的方式）
+SORT_COST = 16
+
+
+def type_label(types, item):
+    """物品所属类型的当前名称（types 为类型ID -> 类型；类型已被删除时用物品中保存的旧名称）"""
+    type_info = types.get(item["type_id"])
+    return type_info["name"] if type_info is not None else str(item.get("type_name", ""))
+
+
+def cjk_tokens(run):
+    """中文片段切分为单字和双字"""
+    tokens = set(run)
+    for i in range(len(run) - 1):
+        tokens.add(run[i:i + 2])
+    return tokens
+
+
+def tokenize(text):
+    """将（已规范化的）文本切分为索引词集合"""
+    tokens = set()
+    for run in CJK_RE.findall(text):
+        tokens |= cjk_tokens(run)
+    tokens.update(WORD_RE.findall(text))
+    return tokens
+
+
+class SearchIndex:
+    """物品关键字倒排索引（类型 + 关键字查询）"""
+
+    def __init__(self, items=(), item_types=(), cache_bytes=0):
+        """cache_bytes 为查询结果缓存的内存限额（字节），0 表示不缓存"""
+        self.items = {}        # 物品ID -> 物品
+        self.texts = {}        # 物品ID -> 规范化后的可搜索文本
+        self.postings = {}     # 索引词 -> 物品ID集合
+        self.by_type = {}      # 类型ID -> 物品ID集合
+        self.word_grams = {}   # 英文单词的字符/双字符 -> 单词集合（用于单词内部的子串匹配）
+        self.seq = {}          # 物品ID -> 插入序号（保持原来的列表顺序）
+        self.next_seq = 0
+        self.attributes = AttributeIndex()  # 类型属性的有序索引
+        self.orders = {}       # 排序方式 -> 有序索引（SortedIndex），只包含已经建立的
+        self.type_names = {}   # 类型ID -> 建立索引时的类型名称（用于发现类型改名）
+        self.generations = {"items": 0, "item_types": 0}  # 物品、类型的修改计数
+        self.field_totals = [0, 0, 0]  # 全部物品名称、描述、属性值的总长度（相关度打分用）
+        self.cache = ResultCache(cache_bytes) if cache_bytes > 0 else None
+        self.lock = threading.RLock()
+
+        for type_info in item_types:
+            self.update_type(type_info)
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """索引一件物品"""
+        with self.lock:
+            self._add(item)
+
+    def _add(self, item):
+        item_id = item["id"]
+        if item_id in self.items:
+            self._remove(item_id)
+
+        text = searchable_text(item)
+        self.generations["items"] += 1
+        for i, length in enumerate(field_lengths(text)):
+            self.field_totals[i] += length
+        self.items[item_id] = item
+        self.texts[item_id] = text
+        self.seq[item_id] = self.next_seq
+        self.next_seq += 1
+        self.by_type.setdefault(item["type_id"], set()).add(item_id)
+        self.attributes.add(item)
+        for sort, order in self.orders.items():
+            order.add(SORT_KEYS[sort](item, self.attributes.types), item_id)
+
+        for token in tokenize(text):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                if WORD_RE.fullmatch(token):
+                    self._add_word(token)
+            posting.add(item_id)
+
+    def remove(self, item_id):
+        """从索引中移除一件物品"""
+        with self.lock:
+            self._remove(item_id)
+
+    def _remove(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        text = self.texts.pop(item_id)
+        del self.seq[item_id]
+        self.generations["items"] += 1
+        for i, length in enumerate(field_lengths(text)):
+            self.field_totals[i] -= length
+        self.attributes.remove(item)
+        for sort, order in self.orders.items():
+            order.remove(SORT_KEYS[sort](item, self.attributes.types), item_id)
+
+        type_ids = self.by_type.get(item["type_id"])
+        if type_ids is not None:
+            type_ids.discard(item_id)
+            if not type_ids:
+                del self.by_type[item["type_id"]]
+
+        for token in tokenize(text):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(item_id)
+            if not posting:
+                del self.postings[token]
+                if WORD_RE.fullmatch(token):
+                    self._remove_word(token)
+
+    def update_type(self, type_info):
+        """物品类型新增或修改（包括属性类型）后调用"""
+        with self.lock:
+            # 类型改名（type_info 可能就是被原地修改的同一个 dict，所以另外记下名称）：按类型排序的索引下次使用时重建
+            if self.type_names.get(type_info["type_id"], type_info["name"]) != type_info["name"]:
+                self.orders.pop("type", None)
+            self.type_names[type_info["type_id"]] = type_info["name"]
+            self.attributes.update_type(type_info)
+            self.generations["item_types"] += 1
+
+    def remove_type(self, type_id):
+        with self.lock:
+            self.attributes.remove_type(type_id)
+            self.type_names.pop(type_id, None)
+            self.orders.pop("type", None)
+            self.generations["item_types"] += 1
+
+    def generation(self):
+        """当前的 (物品修改计数, 类型修改计数)"""
+        return self.generations["items"], self.generations["item_types"]
+
+    def cache_stats(self):
+        """查询结果缓存的命中统计，未开启缓存时返回 None"""
+        return None if self.cache is None else self.cache.stats()
+
+    def has_filters(self, keyword):
+        """关键字中是否含有属性条件（含条件的查询不能在上一次的结果中细化）"""
+        with self.lock:
+            return bool(self.attributes.parse_query(keyword)[1])
+
+    def _word_keys(self, word):
+        return set(word) | {word[i:i + 2] for i in range(len(word) - 1)}
+
+    def _add_word(self, word):
+        for key in self._word_keys(word):
+            self.word_grams.setdefault(key, set()).add(word)
+
+    def _remove_word(self, word):
+        for key in self._word_keys(word):
+            words = self.word_grams.get(key)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.word_grams[key]
+
+    def _words_containing(self, fragment):
+        """返回包含指定片段的所有已索引英文单词"""
+        if len(fragment) == 1:
+            return self.word_grams.get(fragment, set())
+        words = None
+        for i in range(len(fragment) - 1):
+            found = self.word_grams.get(fragment[i:i + 2])
+            if not found:
+                return set()
+            words = set(found) if words is None else words & found
+        return {w for w in words if fragment in w}
+
+    def _candidates(self, keyword):
+        """根据索引求出可能包含关键字的物品ID集合，None 表示无法用索引缩小范围"""
+        constraints = []
+        for run in CJK_RE.findall(keyword):
+            if len(run) == 1:
+                constraints.append(self.postings.get(run, set()))
+            else:
+                for i in range(len(run) - 1):
+                    constraints.append(self.postings.get(run[i:i + 2], set()))
+        for fragment in WORD_RE.findall(keyword):
+            ids = set()
+            for word in self._words_containing(fragment):
+                ids |= self.postings[word]
+            constraints.append(ids)
+
+        if not constraints:
+            return None
+        constraints.sort(key=len)
+        result = set(constraints[0])
+        for ids in constraints[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+    def search(self, keyword="", type_name=None):
+        """按“类型 + 关键字”查询，返回按原列表顺序排列的物品列表
+
+        keyword 为经过 text_normalize.normalize_keyword 处理的关键字，可以包含属性条件；
+        type_name 为 None 表示全部类型。
+        """
+        with self.lock:
+            ids = self._cached_match(keyword, type_name, None, None)
+            if ids is None:
+                return list(self.items.values())
+            return [self.items[item_id] for item_id in sorted(ids, key=self.seq.__getitem__)]
+
+    def match(self, keyword="", type_name=None, within=None, cancelled=None):
+        """返回匹配的物品ID集合，None 表示全部物品（参数同 search）
+
+        within 为可选的物品ID集合，只在其中查找（如新关键字是在上一次关键字后继续输入得到的，
+        结果必然是上一次结果的子集）；cancelled 为可选的回调，返回 True 时中止查询并返回 None。
+        返回的集合可能来自缓存，调用方不能修改。
+        """
+        with self.lock:
+            return self._cached_match(keyword, type_name, within, cancelled)
+
+    def _cached_match(self, keyword, type_name, within, cancelled):
+        """先查结果缓存；未命中时查询，完整查询（未限定 within、未被中止）的结果写入缓存"""
+        if self.cache is None or (not keyword and type_name is None):
+            return self._match(keyword, type_name, within, cancelled)
+        key = (keyword, type_name)
+        generation = self.generation()
+        ids = self.cache.get(key, generation)
+        if ids is not MISSING:
+            metrics.count("result_cache.hits")
+            return ids  # within 是上一次结果时，本次结果必然是它的子集，与完整查询的结果相同
+        metrics.count("result_cache.misses")
+        ids = self._match(keyword, type_name, within, cancelled)
+        if within is None and not (cancelled is not None and cancelled()):
+            ids = None if ids is None else frozenset(ids)
+            self.cache.put(key, generation, ids)
+        return ids
+
+    def _match(self, keyword, type_name, within, cancelled):
+        keyword, filters = self.attributes.parse_query(keyword)
+        # 按范围、类型和属性条件限定的物品ID集合，None 表示不限
+        ids = within
+        if type_name is not None:
+            type_ids = set()
+            for type_id, type_info in self.attributes.types.items():
+                if type_info["name"] == type_name:
+                    type_ids |= self.by_type.get(type_id, set())
+            ids = type_ids if ids is None else ids & type_ids
+        if filters:
+            matched = self.attributes.match(filters, type_name, self.items.values())
+            ids = matched if ids is None else matched & ids
+
+        if not keyword:
+            return ids
+        candidates = self._candidates(keyword)
+        if candidates is None:
+            candidates = ids if ids is not None else self.items.keys()
+        elif ids is not None:
+            candidates = candidates & ids
+        texts = self.texts
+        results = set()
+        for i, item_id in enumerate(candidates):
+            if cancelled is not None and i % 1024 == 0 and cancelled():
+                return None
+            if keyword in texts[item_id]:
+                results.add(item_id)
+        return results
+
+    def rank(self, ids, keyword, limit=None, offset=0):
+        """把 match 的结果按与关键字的相关度从高到低排序后取出一页，返回 (物品列表, 下一页的偏移)
+
+        只计算匹配物品的得分，用堆取出前 offset + limit 件；没有下一页时偏移为 None。
+        关键字中的属性条件不参与打分；关键字只有属性条件时返回 None，由调用方按其他方式排序。
+        """
+        with self.lock:
+            keyword = self.attributes.parse_query(keyword)[0]
+            if not keyword:
+                return None
+            texts = self.texts
+            candidates = self.items.keys() if ids is None else [item_id for item_id in ids if item_id in texts]
+            ranker = Ranker(self._query_terms(keyword, len(candidates)), self.field_totals, len(self.items))
+            items = self.items
+            best = top_k(candidates, lambda item_id: ranker.score(texts[item_id], items[item_id]["date"]),
+                         None if limit is None else offset + limit + 1)
+            page = best[offset:] if limit is None else best[offset:offset + limit]
+            more = limit is not None and len(best) > offset + limit
+            return [items[item_id] for item_id in page], offset + limit if more else None
+
+    def _query_terms(self, keyword, matched):
+        """关键字中的查询词及其文档频率：中文取相邻双字（单字的片段取单字），英文数字取单词；
+        不是完整索引词的（如单词的一部分）以匹配的物品数作为文档频率"""
+        terms = []
+        for run in CJK_RE.findall(keyword):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        terms.extend(WORD_RE.findall(keyword))
+        if not terms:
+            terms = [keyword]
+        return [(term, len(self.postings.get(term, ())) or matched) for term in dict.fromkeys(terms)]
+
+    def _order(self, sort):
+        """按某种方式排序的有序索引，第一次使用时建立"""
+        order = self.orders.get(sort)
+        if order is None:
+            key = SORT_KEYS[sort]
+            types = self.attributes.types
+            order = self.orders[sort] = SortedIndex((key(item, types), item_id) for item_id, item in self.items.items())
+        return order
+
+    def page(self, ids, sort="id", descending=False, limit=None, cursor=None, offset=0):
+        """把 match 的结果按 sort（SORT_KEYS 中的键）排序后取出一页，返回 (物品列表, 下一页的游标)
+
+        cursor 为上一页返回的游标（最后一项的 (排序值, 物品ID)），从它之后开始取；offset 为再跳过的条数；
+        limit 为 None 表示取到末尾。没有下一页时游标为 None。
+        结果很少时直接对结果排序；否则沿有序索引从游标处顺序读取，只检查到凑满一页为止。
+        """
+        with self.lock:
+            # 沿索引读取时，凑满一页预计要检查的项数（结果越稀疏越多）
+            total = len(self.items)
+            if ids is not None and limit is not None:
+                scanned = min(total, (offset + limit + 1) * total // max(len(ids), 1))
+            else:
+                scanned = total
+            if ids is not None and len(ids) * SORT_COST < scanned:
+                key = SORT_KEYS[sort]
+                types = self.attributes.types
+                entries = SortedIndex((key(self.items[item_id], types), item_id) for item_id in ids if item_id in self.items)
+                entries = entries.walk(cursor, descending)
+            else:
+                entries = self._order(sort).walk(cursor, descending)
+                if ids is not None:
+                    entries = (entry for entry in entries if entry[1] in ids)
+
+            if offset:
+                entries = itertools.islice(entries, offset, None)
+            if limit is None:
+                return [self.items[item_id] for _, item_id in entries], None
+            # 多取一项，用来判断是否还有下一页
+            page = list(itertools.islice(entries, limit + 1))
+            next_cursor = page[limit - 1] if len(page) > limit and limit > 0 else None
+            return [self.items[item_id] for _, item_id in page[:limit]], next_cursor
@@ -0,0 +1,73 @@
+# 作者：谢建波
+# 文件目的：实现“边输入边搜索”。输入停顿一段时间（防抖）后才提交查询，查询在后台线程中执行，
+# 新的查询会让尚未完成的旧查询作废；结果（匹配的物品ID集合）通过 root.after 回到 Tk 主线程，由界面排序、分页显示。
+# 当新关键字是在上一次关键字后继续输入得到的，直接在上一次的结果中筛选，不再查询整个索引
+# （含属性条件的查询除外，如 数量<3 -> 数量<30 的结果不是上一次结果的子集）。
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SearchWorker:
+    """后台搜索：防抖、取消过期查询、增量细化"""
+
+    def __init__(self, root, search_index, on_results, delay=250):
+        self.root = root
+        self.search_index = search_index
+        self.on_results = on_results  # 主线程回调：on_results(keyword, type_name, ids)，ids 为 None 表示全部物品
+        self.delay = delay            # 防抖时间（毫秒）
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self.after_id = None
+        self.generation = 0           # 每提交一次查询加 1，旧查询据此判断自己是否已作废
+        self.last = None              # 上一次完成的查询：(keyword, type_name, ids)
+
+    def schedule(self, keyword, type_name):
+        """输入变化时调用：重新计时，停顿 delay 毫秒后再提交"""
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+        self.after_id = self.root.after(self.delay, self.submit, keyword, type_name)
+
+    def submit(self, keyword, type_name):
+        """立即在后台线程中执行查询"""
+        self.after_id = None
+        self.generation += 1
+        generation = self.generation
+
+        base = None
+        if self.last is not None:
+            last_keyword, last_type, last_ids = self.last
+            if last_type == type_name and last_keyword and keyword.startswith(last_keyword) and \
+                    not self.search_index.has_filters(keyword) and not self.search_index.has_filters(last_keyword):
+                base = last_ids
+
+        future = self.executor.submit(self.run, generation, keyword, type_name, base)
+        self.root.after(10, self.poll, future, generation, keyword, type_name)
+
+    def run(self, generation, keyword, type_name, base):
+        """后台线程：执行查询（作废的查询由 poll 丢弃）"""
+        cancelled = lambda: generation != self.generation
+        if cancelled():
+            return None
+        return self.search_index.match(keyword, type_name, base, cancelled)
+
+    def poll(self, future, generation, keyword, type_name):
+        """主线程：等待后台结果，只显示最新一次查询的结果"""
+        if not future.done():
+            self.root.after(10, self.poll, future, generation, keyword, type_name)
+            return
+        if generation != self.generation:
+            return
+        ids = future.result()
+        self.last = (keyword, type_name, ids)
+        self.on_results(keyword, type_name, ids)
+
+    def cancel(self):
+        """取消等待中和执行中的查询"""
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.generation += 1
+
+    def invalidate(self):
+        """物品数据变化后调用：作废执行中的查询，之后的查询不再基于旧结果细化"""
+        self.generation += 1
+        self.last = None
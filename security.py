@@ -0,0 +1,92 @@
+# 作者：谢建波
+# 文件目的：密码哈希与登录会话缓存。
+# 密码保存为 PBKDF2-SHA256 哈希，格式为 "pbkdf2_sha256$迭代次数$盐$哈希"（盐和哈希为 base64），
+# 迭代次数可通过 config.PASSWORD_ITERATIONS 调整；旧数据中的明文密码在该用户下一次登录成功时自动改为哈希。
+# 登录成功后发放随机 token，SessionCache 记录 token -> 用户ID（有效期 + 最近最少使用淘汰），
+# 之后凭 token 认证只需查一次字典，不再计算密码哈希。
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+ALGORITHM = "pbkdf2_sha256"
+SALT_BYTES = 16
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def hash_password(password, iterations=None):
+    """计算密码的加盐哈希，返回保存用的字符串"""
+    iterations = iterations or config.PASSWORD_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(ALGORITHM + "$")
+
+
+def verify_password(password, stored):
+    """校验密码，返回 (是否正确, 是否需要重新哈希)
+
+    stored 为明文（旧数据）或迭代次数与当前配置不同时，密码正确也需要重新哈希后保存。
+    """
+    if not is_hashed(stored):
+        ok = hmac.compare_digest(str(stored).encode("utf-8"), password.encode("utf-8"))
+        return ok, ok
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        iterations = int(iterations)
+        salt = base64.b64decode(salt)
+        expected = base64.b64decode(expected)
+    except ValueError:
+        return False, False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    ok = hmac.compare_digest(digest, expected)
+    return ok, ok and iterations != config.PASSWORD_ITERATIONS
+
+
+class SessionCache:
+    """已登录会话：token -> 用户ID，超过有效期或数量上限时淘汰最久未使用的会话（线程安全）"""
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = config.SESSION_TTL if ttl is None else ttl
+        self.max_size = config.SESSION_CACHE_SIZE if max_size is None else max_size
+        self.sessions = OrderedDict()   # token -> (用户ID, 过期时间)，按最近使用的先后排列
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, user_id):
+        """为用户新建会话，返回 token"""
+        token = secrets.token_urlsafe(32)
+        with self.lock:
+            self.sessions[token] = (user_id, time.monotonic() + self.ttl)
+            while len(self.sessions) > self.max_size:
+                self.sessions.popitem(last=False)
+        return token
+
+    def get(self, token):
+        """返回 token 对应的用户ID，不存在或已过期时返回 None；每次使用都会延长有效期"""
+        with self.lock:
+            entry = self.sessions.get(token)
+            if entry is None:
+                return None
+            now = time.monotonic()
+            if entry[1] < now:
+                del self.sessions[token]
+                return None
+            self.sessions[token] = (entry[0], now + self.ttl)
+            self.sessions.move_to_end(token)
+            return entry[0]
@@ -0,0 +1,897 @@
+# 作者：谢建波
+# 文件目的：物品复活系统的业务逻辑层（不依赖 Tkinter）。包括数据加载与持久化、索引维护、
+# 用户登录/注册/审核、物品添加/删除/搜索、物品类型管理。图形界面（main.py）和
+# HTTP 接口（http_api.py）都调用这里的方法，业务规则只在一处实现。
+# 业务校验失败时抛出 ServiceError，由调用方决定如何提示（弹窗或 HTTP 错误码）。
+# 多个进程共用数据目录时，sync() 把其他进程写入的变更合并进内存数据和索引。
+# 物品数据可以在后台线程中流式加载（start_loading_items），边解析边显示。
+# 物品在内存中保存为紧凑的 ItemRecord（见 item_record.py），用户和类型仍为 dict。
+# 用户密码保存为加盐哈希（见 security.py），登录会话由 sessions 缓存。
+# 物品类型的属性定义带版本（见 type_schema.py）：类型名称按 type_id 显示，属性改名、删除后
+# 旧物品由 migrate_items 分批升级。
+# 搜索结果可以按相关度排序（sort 为 RELEVANCE，BM25F 打分加时间衰减，见 ranking.py），只取出前若干件。
+# 物品可以附带图片（见 attachments.py）：按内容哈希保存、去重，发布时在后台生成缩略图。
+# 开启耗时统计（config.METRICS_ENABLED）时，加载、保存、搜索、登录等操作的耗时记入 metrics.py。
+
+from collections import deque
+from datetime import datetime
+import itertools
+import os
+import queue
+import threading
+import uuid
+
+import attachments
+import config
+import metrics
+from attr_filters import DATE, attribute_spec, canonical_text, check_attribute_types, describe_format
+from data_index import DataIndex
+from id_sequence import IdSequence
+from item_record import ItemRecord
+from search_index import SORT_KEYS, SearchIndex
+from security import SessionCache, hash_password, verify_password
+from text_normalize import normalize_keyword
+from storage import KEY_FIELDS, STORAGE_ERRORS, create_storage
+from type_schema import is_stale, item_version, record_changes, schema_version, upgrade_attrs
+
+# 各类记录必须包含的字段，缺少字段的记录在加载时跳过
+REQUIRED_FIELDS = {
+    "items": ("id", "name", "description", "contact_phone", "contact_email",
+              "type_id", "date", "user_id"),
+    "users": ("user_id", "username", "password", "role", "status"),
+    "item_types": ("type_id", "name", "attributes")
+}
+
+# 物品中必须是文本的字段（参与搜索文本、排序和显示，类型不对的记录加载时跳过）
+ITEM_TEXT_FIELDS = ("name", "description", "contact_phone", "contact_email", "date", "user_id")
+
+
+# 按相关度排序（不在 SORT_KEYS 中：得分与关键字有关，翻页游标为偏移量）
+RELEVANCE = "relevance"
+
+
+def remove_identical(records, record):
+    """按对象身份从列表中删除记录（不逐个比较内容）"""
+    for i, other in enumerate(records):
+        if other is record:
+            del records[i]
+            return
+
+
+class ServiceError(Exception):
+    """业务错误：title 与 message 对应界面上提示框的标题和内容
+
+    kind 区分错误类别：invalid（输入错误）、forbidden（权限不足）、not_found（记录不存在）、
+    pending（账号待审核）、storage（保存失败）、loading（数据仍在加载）。
+    """
+
+    def __init__(self, title, message, kind="invalid"):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+        self.kind = kind
+
+
+class ItemService:
+    """物品复活系统的业务逻辑"""
+
+    def __init__(self, storage=None, stream_items=False):
+        """stream_items 为 True 时物品列表先为空，由 start_loading_items 在后台加载"""
+        # 存储后端（见 config.STORAGE_BACKEND）
+        self.storage = storage or create_storage()
+        self.skipped = {data_type: 0 for data_type in KEY_FIELDS}  # 加载时跳过的无效记录数
+        self.load_errors = {}  # 数据类型 -> 加载失败的原因
+        self.loading_items = False
+
+        # 初始化数据
+        self.items = [] if stream_items else self.load_data("items")
+        self.item_types = self.load_data("item_types")
+        self.users = self.load_data("users")
+
+        # 构建哈希索引和搜索索引
+        self.index = DataIndex(self.items, self.users, self.item_types)
+        self.search_index = SearchIndex(self.items, self.item_types, int(config.RESULT_CACHE_MB * 1024 * 1024))
+
+        # 登录会话：token -> 用户ID
+        self.sessions = SessionCache()
+
+        # 图片附件的缩略图（后台生成，内存和磁盘缓存）
+        self.thumbnails = attachments.ThumbnailCache()
+
+        # 属性定义还是旧版本、等待后台迁移的物品ID
+        self.migration_queue = deque()
+        for item in self.items:
+            self._check_schema(item)
+
+        # 初始化管理员账号和默认物品类型（如果为空）
+        if not self.users:
+            self.init_default_admin()
+        if not self.item_types:
+            self.init_default_item_types()
+
+        # ID 序列（与现有数据的最大ID对齐）
+        self.id_sequence = IdSequence(self.storage, {
+            "items": max(self.index.item_by_id, default=0),
+            "item_types": max(self.index.type_by_id, default=0)
+        })
+
+    def close(self):
+        """关闭存储后端和缩略图线程"""
+        self.thumbnails.close()
+        self.storage.close()
+
+    def collection_sizes(self):
+        """内存中各类数据和缓存的数量（用于性能面板和统计导出）"""
+        return {
+            "items": len(self.items),
+            "item_types": len(self.item_types),
+            "users": len(self.users),
+            "pending_users": self.pending_count(),
+            "sessions": len(self.sessions),
+            "migration_queue": len(self.migration_queue),
+            "thumbnails": len(self.thumbnails.memory)
+        }
+
+    def cache_stats(self):
+        """搜索结果缓存的命中统计（未开启缓存时为 None）"""
+        return self.search_index.cache_stats()
+
+    def thumbnail_stats(self):
+        """缩略图缓存的命中、生成和失败次数"""
+        return self.thumbnails.stats()
+
+    # ---------- 数据持久化 ----------
+
+    def load_data(self, data_type):
+        """加载指定类型的数据；不符合格式的记录跳过并计入 self.skipped"""
+        records = []
+        keys = set()
+        with metrics.span(f"load_data.{data_type}"):
+            try:
+                for record in self.storage.iter_load(data_type):
+                    if self.valid_record(data_type, record, keys):
+                        keys.add(record[KEY_FIELDS[data_type]])
+                        records.append(self.make_record(data_type, record))
+                    else:
+                        self.skipped[data_type] += 1
+            except STORAGE_ERRORS as e:
+                # 读取中途出错时保留已读出的记录
+                self.load_errors[data_type] = str(e)
+        return records
+
+    def make_record(self, data_type, record):
+        """物品转为紧凑的 ItemRecord，其他数据保持 dict"""
+        return ItemRecord(record) if data_type == "items" else record
+
+    def valid_record(self, data_type, record, keys):
+        """记录是否包含必需字段、主键是否合法且未出现在 keys 中"""
+        if not isinstance(record, dict):
+            return False
+        if any(field not in record for field in REQUIRED_FIELDS[data_type]):
+            return False
+        key = record[KEY_FIELDS[data_type]]
+        if not isinstance(key, str if data_type == "users" else int):
+            return False
+        if data_type == "items" and (not isinstance(record["type_id"], int)
+                                     or not all(isinstance(record[field], str) for field in ITEM_TEXT_FIELDS)):
+            return False
+        return key not in keys
+
+    def start_loading_items(self, batch_size=2000):
+        """在后台线程中逐条解析物品数据，解析出的记录由 load_pending_items 并入"""
+        self.loading_items = True
+        self.item_batches = queue.Queue()
+        threading.Thread(target=self._read_items, args=(batch_size,), name="item-loader", daemon=True).start()
+
+    def _read_items(self, batch_size):
+        batch = []
+        with metrics.span("load_data.items"):
+            try:
+                for record in self.storage.iter_load("items"):
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        self.item_batches.put(batch)
+                        batch = []
+            except STORAGE_ERRORS as e:
+                self.load_errors["items"] = str(e)
+        self.item_batches.put(batch)
+        self.item_batches.put(None)  # 结束标记
+
+    @metrics.timed("load_pending_items")
+    def load_pending_items(self, max_batches=5):
+        """把后台已解析的物品并入数据和索引（在调用方线程中执行），返回本次是否有新物品
+
+        全部并入后 loading_items 变为 False。
+        """
+        added = False
+        for _ in range(max_batches):
+            try:
+                batch = self.item_batches.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                self.loading_items = False
+                break
+            for record in batch:
+                if self.valid_record("items", record, self.index.item_by_id):
+                    item = ItemRecord(record)
+                    self.items.append(item)
+                    self._index_record("items", item)
+                    added = True
+                else:
+                    self.skipped["items"] += 1
+        return added
+
+    def require_items_loaded(self):
+        """物品数据加载完成前，不允许修改物品"""
+        if self.loading_items:
+            raise ServiceError("请稍候", "物品数据正在加载，请稍后再试", "loading")
+
+    def save_data(self, data_type, data):
+        """整体保存指定类型的数据"""
+        try:
+            with metrics.span(f"save_data.{data_type}"):
+                self.storage.save_all(data_type, data)
+        except Exception as e:
+            raise ServiceError("保存失败", f"无法保存数据: {str(e)}", "storage")
+
+    def save_change(self, data_type, action, record):
+        """保存单条记录的变更，action 为 insert、update 或 delete"""
+        data = getattr(self, data_type)
+        try:
+            with metrics.span(f"save_change.{data_type}"):
+                if action == "delete":
+                    self.storage.delete(data_type, record[KEY_FIELDS[data_type]], data)
+                else:
+                    getattr(self.storage, action)(data_type, record, data)
+        except Exception as e:
+            raise ServiceError("保存失败", f"无法保存数据: {str(e)}", "storage")
+
+    def save_changes(self, data_type, changes):
+        """在一次写入中保存多条记录的变更，changes 为 [("upsert", 记录) 或 ("delete", 主键)]"""
+        if not changes:
+            return
+        try:
+            with metrics.span(f"save_changes.{data_type}"):
+                self.storage.write_batch(data_type, changes, getattr(self, data_type))
+        except Exception as e:
+            raise ServiceError("保存失败", f"无法保存数据: {str(e)}", "storage")
+
+    # ---------- 多进程同步 ----------
+
+    @metrics.timed("sync")
+    def sync(self):
+        """载入其他进程写入的变更，返回发生变化的数据类型集合"""
+        changed = set()
+        for data_type in KEY_FIELDS:
+            if data_type == "items" and self.loading_items:
+                continue  # 加载完成前由加载线程负责物品数据
+            try:
+                changes = self.storage.poll_changes(data_type)
+            except STORAGE_ERRORS:
+                # 读取失败（如文件正在被其他进程替换）时留到下次同步
+                continue
+            if self.apply_changes(data_type, changes):
+                changed.add(data_type)
+        return changed
+
+    def apply_changes(self, data_type, changes):
+        """把存储后端返回的变更应用到内存数据和索引上，返回是否有实际变化"""
+        key_field = KEY_FIELDS[data_type]
+        changed = False
+        for op, payload in changes:
+            if op == "reload":
+                # 整体重新加载：按主键与内存数据比较，只处理有差异的记录
+                metrics.count(f"sync_reloads.{data_type}")
+                keys = {record[key_field] for record in payload}
+                for record in list(getattr(self, data_type)):
+                    if record[key_field] not in keys:
+                        changed |= self._remove_record(data_type, record[key_field])
+                for record in payload:
+                    changed |= self._upsert_record(data_type, record)
+            elif op == "upsert":
+                metrics.count(f"sync_changes.{data_type}")
+                changed |= self._upsert_record(data_type, payload)
+            else:
+                metrics.count(f"sync_changes.{data_type}")
+                changed |= self._remove_record(data_type, payload)
+        return changed
+
+    def _lookup(self, data_type, key):
+        if data_type == "items":
+            return self.index.item_by_id.get(key)
+        if data_type == "users":
+            return self.index.user_by_id.get(key)
+        return self.index.type_by_id.get(key)
+
+    def _index_record(self, data_type, record):
+        if data_type == "items":
+            self.index.add_item(record)
+            self.search_index.add(record)
+            self.id_sequence.advance("items", record["id"])
+            self._check_schema(record)
+        elif data_type == "users":
+            self.index.add_user(record)
+        else:
+            self.index.add_type(record)
+            self.search_index.update_type(record)
+            self.id_sequence.advance("item_types", record["type_id"])
+            # 其他进程升级了类型版本：该类型下的旧物品加入迁移队列
+            for item_id in self.index.item_ids_by_type.get(record["type_id"], ()):
+                self._check_schema(self.index.item_by_id[item_id])
+
+    def _unindex_record(self, data_type, record):
+        if data_type == "items":
+            self.index.remove_item(record)
+            self.search_index.remove(record["id"])
+        elif data_type == "users":
+            self.index.remove_user(record)
+        else:
+            self.index.remove_type(record)
+            self.search_index.remove_type(record["type_id"])
+
+    def _upsert_record(self, data_type, record):
+        if not self.valid_record(data_type, record, ()):
+            return False  # 其他进程写入的不合法记录，与加载时一样跳过
+        existing = self._lookup(data_type, record[KEY_FIELDS[data_type]])
+        if existing is None:
+            record = self.make_record(data_type, record)
+            getattr(self, data_type).append(record)
+            self._index_record(data_type, record)
+            return True
+        if existing == record:
+            return False
+        # 原地更新，界面等处持有的引用仍然有效
+        self._unindex_record(data_type, existing)
+        if data_type == "items":
+            existing.assign(record)
+        else:
+            existing.clear()
+            existing.update(record)
+        self._index_record(data_type, existing)
+        return True
+
+    def _remove_record(self, data_type, key):
+        existing = self._lookup(data_type, key)
+        if existing is None:
+            return False
+        remove_identical(getattr(self, data_type), existing)
+        self._unindex_record(data_type, existing)
+        return True
+
+    def init_default_admin(self):
+        """初始化管理员账号"""
+        self.users = [{
+            "user_id": "admin",
+            "username": "admin",
+            "password": hash_password("admin123"),
+            "address": "管理员地址",
+            "phone": "12345678901",
+            "email": "admin@example.com",
+            "role": "admin",
+            "status": "approved"
+        }]
+        self.save_data("users", self.users)
+        for user in self.users:
+            self.index.add_user(user)
+
+    def init_default_item_types(self):
+        """初始化默认物品类型"""
+        self.item_types = [
+            {
+                "type_id": 1,
+                "name": "食品",
+                "attributes": ["保质期", "数量"],
+                "attribute_types": {"保质期": {"type": "date"}, "数量": {"type": "int"}}
+            },
+            {
+                "type_id": 2,
+                "name": "书籍",
+                "attributes": ["作者", "出版社", "ISBN"]
+            },
+            {
+                "type_id": 3,
+                "name": "工具",
+                "attributes": ["品牌", "使用时长"]
+            }
+        ]
+        self.save_data("item_types", self.item_types)
+        for type_info in self.item_types:
+            self.index.add_type(type_info)
+            self.search_index.update_type(type_info)
+
+    # ---------- 用户 ----------
+
+    @metrics.timed("login")
+    def login(self, username, password):
+        """校验用户名和密码，返回用户"""
+        user, password = self.login_user(username, password)
+        stored = user["password"] if user is not None else None
+        ok, needs_rehash = verify_password(password, stored) if user is not None else (False, False)
+        return self.finish_login(user, stored, ok, hash_password(password) if ok and needs_rehash else None)
+
+    # login 分为三步，接口服务在两步之间到线程池中计算密码哈希（每次约 0.1 秒），不阻塞事件循环
+
+    def login_user(self, username, password):
+        """检查输入并找到要登录的用户（不计算密码哈希），返回 (用户, 去掉首尾空白的密码)，用户不存在时用户为 None"""
+        self.sync()
+        username = username.strip()
+        password = password.strip()
+        if not username or not password:
+            raise ServiceError("输入错误", "用户名和密码不能为空")
+        return self.index.user_by_name.get(username), password
+
+    def finish_login(self, user, stored, ok, new_hash=None):
+        """按密码校验的结果完成登录，返回用户
+
+        stored 为校验时用的密码哈希：校验期间用户被删除或改了密码时按登录失败处理；
+        new_hash 为需要改存的新哈希（明文密码的旧数据或迭代次数已调整）。
+        """
+        if user is not None:
+            # 校验期间可能同步过其他进程的变更：取当前的用户记录
+            user = self.index.user_by_id.get(user["user_id"])
+            if user is None or user["password"] != stored:
+                ok = False
+        if not ok:
+            raise ServiceError("登录失败", "用户名或密码错误")
+        if user["status"] != "approved" and user["role"] != "admin":
+            raise ServiceError("登录失败", "您的账号正在审核中，请等待管理员批准", "pending")
+        if new_hash is not None:
+            # 改存新的哈希，保存失败时下次登录再试
+            user["password"] = new_hash
+            try:
+                self.save_change("users", "update", user)
+            except ServiceError:
+                pass
+        return user
+
+    def create_session(self, user):
+        """为登录成功的用户发放会话 token"""
+        return self.sessions.create(user["user_id"])
+
+    def session_user(self, token):
+        """按 token 找到已登录的用户，会话不存在、已过期或用户已被删除时返回 None"""
+        user_id = self.sessions.get(token)
+        return None if user_id is None else self.index.user_by_id.get(user_id)
+
+    def register(self, username, password, address, phone, email, password_hash=None):
+        """注册新用户（待审核），返回新用户
+
+        password_hash 为预先算好的密码哈希（接口服务在线程池中计算），为 None 时在这里计算。
+        """
+        self.sync()
+        username = username.strip()
+        password = password.strip()
+        address = address.strip()
+        phone = phone.strip()
+        email = email.strip()
+
+        # 验证
+        if not all([username, password, address, phone, email]):
+            raise ServiceError("输入错误", "所有字段不能为空")
+
+        # 检查用户名是否已存在
+        if username in self.index.user_by_name:
+            raise ServiceError("注册失败", "用户名已存在")
+
+        new_user = {
+            "user_id": str(uuid.uuid4()),
+            "username": username,
+            "password": password_hash or hash_password(password),
+            "address": address,
+            "phone": phone,
+            "email": email,
+            "role": "user",
+            "status": "pending"  # 待审核
+        }
+        self.users.append(new_user)
+        self.index.add_user(new_user)
+        self.save_change("users", "insert", new_user)
+        return new_user
+
+    def require_admin(self, user):
+        """检查是否为管理员"""
+        if user is None or user["role"] != "admin":
+            raise ServiceError("权限不足", "只有管理员可以执行此操作", "forbidden")
+
+    def pending_users(self, offset=0, limit=None):
+        """待审核用户列表（按注册先后），offset / limit 用于分页"""
+        users = self.index.users_by_status.get("pending", {}).values()
+        return list(itertools.islice(users, offset, None if limit is None else offset + limit))
+
+    def pending_count(self):
+        """待审核用户数"""
+        return len(self.index.users_by_status.get("pending", ()))
+
+    def approve_user(self, user_id):
+        """批准用户"""
+        self.sync()
+        user = self.index.user_by_id.get(user_id)
+        if user is None:
+            raise ServiceError("批准失败", "用户不存在", "not_found")
+        self.index.set_user_status(user, "approved")
+        self.save_change("users", "update", user)
+        return user
+
+    def _selected_pending(self, user_ids):
+        """按ID取出待审核用户，重复、不存在或已处理的ID忽略（可能已被其他管理员处理）"""
+        pending = self.index.users_by_status.get("pending", {})
+        return [pending[user_id] for user_id in dict.fromkeys(user_ids) if user_id in pending]
+
+    def approve_users(self, user_ids):
+        """批量批准待审核用户，一次写入存储，返回被批准的用户列表"""
+        self.sync()
+        users = self._selected_pending(user_ids)
+        for user in users:
+            self.index.set_user_status(user, "approved")
+        self.save_changes("users", [("upsert", user) for user in users])
+        return users
+
+    def reject_users(self, user_ids):
+        """批量拒绝（删除）待审核用户，一次写入存储，用户名可以重新注册；返回被拒绝的用户列表"""
+        self.sync()
+        users = self._selected_pending(user_ids)
+        rejected = {id(user) for user in users}
+        self.users[:] = [user for user in self.users if id(user) not in rejected]
+        for user in users:
+            self.index.remove_user(user)
+        self.save_changes("users", [("delete", user["user_id"]) for user in users])
+        return users
+
+    # ---------- 物品类型 ----------
+
+    def get_type(self, type_id):
+        """按ID获取物品类型"""
+        type_info = self.index.type_by_id.get(type_id)
+        if type_info is None:
+            raise ServiceError("错误", "物品类型不存在", "not_found")
+        return type_info
+
+    def create_type(self):
+        """创建新类型，返回新类型"""
+        self.sync()
+        new_type = {
+            "type_id": self.id_sequence.next_id("item_types"),
+            "name": "新类型",
+            "attributes": []
+        }
+        self.item_types.append(new_type)
+        self.index.add_type(new_type)
+        self.search_index.update_type(new_type)
+        self.save_change("item_types", "insert", new_type)
+        return new_type
+
+    def update_type(self, type_id, name, attributes, attribute_types=None, renames=None):
+        """修改类型名称、属性列表和属性类型（见 attr_filters.py）
+
+        attribute_types 为 None 时保留仍存在的属性原有的类型（改名的属性沿用旧名的类型）；
+        renames 为属性改名 {旧名: 新名}，旧物品中的属性值随之改名，而不是当作删除旧属性、新增属性。
+        """
+        self.sync()
+        name = name.strip()
+        if not name:
+            raise ServiceError("输入错误", "类型名称不能为空")
+
+        type_info = self.get_type(type_id)
+        attributes = self.check_attributes(attributes)
+        renames = self.check_renames(type_info, attributes, renames)
+        if attribute_types is None:
+            attribute_types = {renames.get(attr, attr): spec
+                               for attr, spec in type_info.get("attribute_types", {}).items()}
+        try:
+            attribute_types = check_attribute_types(attributes, attribute_types)
+        except ValueError as e:
+            raise ServiceError("输入错误", str(e))
+
+        old_name = type_info["name"]
+        old_attributes = type_info["attributes"]
+        type_info["name"] = name
+        type_info["attributes"] = attributes
+        if attribute_types:
+            type_info["attribute_types"] = attribute_types
+        else:
+            type_info.pop("attribute_types", None)
+        # 属性改名或删除时升级版本，已有物品由 migrate_items 在后台升级，不在这里改写
+        if record_changes(type_info, old_attributes, attributes, renames):
+            for item_id in self.index.item_ids_by_type.get(type_id, ()):
+                self.migration_queue.append(item_id)
+        self.index.rename_type(type_info, old_name)
+        self.search_index.update_type(type_info)
+        self.save_change("item_types", "update", type_info)
+        return type_info
+
+    def check_attributes(self, attributes):
+        """校验属性列表：每个属性名都是非空字符串且不重复（在修改类型之前校验，不合法时类型保持不变）"""
+        attributes = list(attributes)
+        for attr in attributes:
+            if not isinstance(attr, str) or not attr.strip():
+                raise ServiceError("输入错误", f"属性名称必须是非空文本: {attr!r}")
+        if len(set(attributes)) != len(attributes):
+            raise ServiceError("输入错误", "属性名称不能重复")
+        return attributes
+
+    def check_renames(self, type_info, attributes, renames):
+        """校验属性改名 {旧名: 新名}：旧名是类型现有的属性，新名在修改后的属性列表中且不重复"""
+        renames = dict(renames or {})
+        for old, new in renames.items():
+            if old not in type_info["attributes"] or new not in attributes:
+                raise ServiceError("输入错误", f"属性改名无效: {old} -> {new}")
+            if new in type_info["attributes"] and new not in renames:
+                raise ServiceError("输入错误", f"属性“{new}”已存在，不能把“{old}”改为这个名称")
+        if len(set(renames.values())) != len(renames):
+            raise ServiceError("输入错误", "多个属性不能改为同一个名称")
+        return renames
+
+    def _check_schema(self, item):
+        """物品的属性还是类型的旧版本时加入迁移队列"""
+        type_info = self.index.type_by_id.get(item["type_id"])
+        if type_info is not None and is_stale(type_info, item):
+            self.migration_queue.append(item["id"])
+
+    @metrics.timed("migrate_items")
+    def migrate_items(self, limit=None):
+        """把至多 limit 件旧版本的物品升级为类型的当前版本，一次写入存储，返回处理的物品数
+
+        由界面定时器或接口服务在后台反复调用，直到返回 0；其他进程已经升级的物品会跳过。
+        """
+        if self.loading_items:
+            return 0
+        limit = limit or config.MIGRATION_BATCH_SIZE
+        changes = []
+        while self.migration_queue and len(changes) < limit:
+            item = self.index.item_by_id.get(self.migration_queue.popleft())
+            if item is None:
+                continue
+            type_info = self.index.type_by_id.get(item["type_id"])
+            if type_info is None or not is_stale(type_info, item):
+                continue
+            record = item.to_dict()
+            record["type_attrs"] = upgrade_attrs(type_info, item.get("type_attrs") or {}, item_version(item))
+            record["schema_version"] = schema_version(type_info)
+            record.pop("type_name", None)
+            # 原地更新，先移出索引再修改
+            self.index.remove_item(item)
+            self.search_index.remove(item["id"])
+            item.assign(record)
+            self.index.add_item(item)
+            self.search_index.add(item)
+            changes.append(("upsert", item))
+        self.save_changes("items", changes)
+        metrics.count("items_migrated", len(changes))
+        return len(changes)
+
+    def pending_migrations(self):
+        """等待升级的物品数（包括已被其他进程升级、处理时会跳过的）"""
+        return len(self.migration_queue)
+
+    def type_name(self, item):
+        """物品所属类型的当前名称（类型已被删除时用物品中保存的旧名称）"""
+        type_info = self.index.type_by_id.get(item["type_id"])
+        return type_info["name"] if type_info is not None else item.get("type_name", "")
+
+    def item_view(self, item):
+        """返回给界面外部（HTTP 接口、导出文件）的物品 dict：类型名称取自类型表，属性换算为当前版本"""
+        record = item.to_dict() if isinstance(item, ItemRecord) else dict(item)
+        record["type_name"] = self.type_name(record)
+        type_info = self.index.type_by_id.get(record["type_id"])
+        if type_info is not None and is_stale(type_info, record):
+            record["type_attrs"] = upgrade_attrs(type_info, record.get("type_attrs") or {}, item_version(record))
+            record["schema_version"] = schema_version(type_info)
+        return record
+
+    def check_type_deletable(self, type_id):
+        """检查类型下是否有关联物品"""
+        self.require_items_loaded()
+        if self.index.has_items_of_type(type_id):
+            raise ServiceError("删除失败", "该类型下有关联物品，无法删除")
+
+    def delete_type(self, type_id):
+        """删除没有关联物品的类型"""
+        self.sync()
+        type_info = self.get_type(type_id)
+        self.check_type_deletable(type_id)
+        self.item_types.remove(type_info)
+        self.index.remove_type(type_info)
+        self.search_index.remove_type(type_id)
+        self.save_change("item_types", "delete", type_info)
+
+    # ---------- 物品 ----------
+
+    def get_item(self, item_id):
+        """按ID获取物品"""
+        item = self.index.item_by_id.get(item_id)
+        if item is None:
+            raise ServiceError("错误", "物品不存在", "not_found")
+        return item
+
+    def add_item(self, user, type_name, name, description, address, phone, email, type_attrs, images=()):
+        """发布新物品，返回新物品；images 为 store_image 返回的附件名列表"""
+        self.require_items_loaded()
+        self.sync()
+        type_info = self.index.type_by_name.get(type_name)
+        if type_info is None:
+            raise ServiceError("错误", "物品类型不存在", "not_found")
+
+        new_item = self.validate_item(type_info, user, name, description, address, phone, email, type_attrs)
+        images = self.check_images(images)
+        if images:
+            new_item["images"] = images
+        new_item["id"] = self.id_sequence.next_id("items")
+        new_item = ItemRecord(new_item)
+        self.items.append(new_item)
+        self.index.add_item(new_item)
+        self.search_index.add(new_item)
+        self.save_change("items", "insert", new_item)
+        # 在后台预先生成列表和预览用的缩略图
+        self.thumbnails.prefetch(images, (config.LIST_THUMBNAIL_SIZE, config.PREVIEW_THUMBNAIL_SIZE))
+        return new_item
+
+    # ---------- 图片附件 ----------
+
+    def store_image(self, file_path):
+        """保存本地图片文件为附件（相同内容只保存一份），返回附件名"""
+        try:
+            return attachments.store_file(file_path)
+        except ValueError as e:
+            raise ServiceError("图片错误", str(e))
+        except OSError as e:
+            raise ServiceError("图片错误", f"无法读取或保存图片: {e}", "storage")
+
+    def store_image_data(self, data, filename):
+        """保存上传的图片内容为附件，返回附件名"""
+        try:
+            return attachments.store_bytes(data, filename)
+        except ValueError as e:
+            raise ServiceError("图片错误", str(e))
+        except OSError as e:
+            raise ServiceError("图片错误", f"无法保存图片: {e}", "storage")
+
+    def check_images(self, images):
+        """检查物品的附件名列表（格式正确、附件已保存、数量不超过上限），返回去重后的列表"""
+        if not isinstance(images, (list, tuple)):
+            raise ServiceError("图片错误", "图片列表格式错误")
+        images = list(dict.fromkeys(images))
+        if len(images) > config.MAX_ITEM_IMAGES:
+            raise ServiceError("图片错误", f"每件物品最多 {config.MAX_ITEM_IMAGES} 张图片")
+        for name in images:
+            if not attachments.is_attachment_name(name) or not os.path.exists(attachments.attachment_path(name)):
+                raise ServiceError("图片错误", f"图片不存在: {name}", "not_found")
+        return images
+
+    def item_images(self, item):
+        """物品的附件名列表"""
+        images = item.get("images")
+        return images if isinstance(images, list) else []
+
+    def validate_item(self, type_info, user, name, description, address, phone, email, type_attrs, date=None):
+        """校验物品的公共信息和类型属性，返回新物品的 dict（ID 由调用方分配）
+
+        date 为发布日期（批量导入时由文件提供），统一为 YYYY-MM-DD；为 None 时取当天。
+        """
+        name = name.strip()
+        description = description.strip()
+        address = address.strip()
+        phone = phone.strip()
+        email = email.strip()
+
+        # 验证公共信息
+        if not all([name, description, address, phone, email]):
+            raise ServiceError("输入错误", "公共信息不能为空")
+
+        # 验证类型属性（整数、日期、枚举属性还要检查格式）
+        attrs = {}
+        for attr in type_info["attributes"]:
+            val = type_attrs.get(attr)
+            val = "" if val is None else str(val).strip()  # JSON 中的 null 视为未填写
+            if not val:
+                raise ServiceError("输入错误", f"{attr}不能为空")
+            spec = attribute_spec(type_info, attr)
+            try:
+                val = canonical_text(spec, val)
+            except ValueError:
+                raise ServiceError("输入错误", describe_format(attr, spec))
+            attrs[attr] = val
+
+        # 发布日期参与日期排序和相关度的时间衰减，格式必须正确
+        if date is not None:
+            try:
+                date = canonical_text({"type": DATE}, date)
+            except ValueError:
+                raise ServiceError("输入错误", describe_format("发布日期", {"type": DATE}))
+
+        return {
+            "id": None,
+            "name": name,
+            "description": description,
+            "address": address,
+            "contact_phone": phone,
+            "contact_email": email,
+            "type_id": type_info["type_id"],
+            "schema_version": schema_version(type_info),
+            "type_attrs": attrs,
+            "date": date if date is not None else datetime.now().strftime("%Y-%m-%d"),
+            "user_id": user["user_id"]
+        }
+
+    def check_delete_permission(self, user, item):
+        """普通用户只能删除自己发布的物品"""
+        if user["role"] != "admin" and item["user_id"] != user["user_id"]:
+            raise ServiceError("权限不足", "您只能删除自己发布的物品", "forbidden")
+
+    def delete_item(self, user, item_id):
+        """删除物品"""
+        self.require_items_loaded()
+        self.sync()
+        item = self.get_item(item_id)
+        self.check_delete_permission(user, item)
+        remove_identical(self.items, item)
+        self.index.remove_item(item)
+        self.search_index.remove(item_id)
+        self.save_change("items", "delete", item)
+
+    @metrics.timed("search_items")
+    def search_items(self, keyword="", type_name=None, ranked=False, limit=None):
+        """按“类型 + 关键字”搜索物品；type_name 为 None 表示全部类型
+
+        ranked 为 True 时按相关度从高到低排列，只返回前 limit 件（limit 为 None 时返回全部）。
+        """
+        if ranked:
+            return self.rank_items(self.match_items(keyword, type_name), keyword, limit)[0]
+        return self.search_index.search(normalize_keyword(keyword), type_name)
+
+    @metrics.timed("match_items")
+    def match_items(self, keyword="", type_name=None):
+        """按“类型 + 关键字”搜索，返回匹配的物品ID集合（None 表示全部物品），交给 page_items 排序分页"""
+        return self.search_index.match(normalize_keyword(keyword), type_name)
+
+    @metrics.timed("page_items")
+    def page_items(self, ids, sort="id", descending=False, limit=None, cursor=None, offset=0):
+        """把匹配的物品按 sort（id / date / name / type）排序后取出一页，返回 (物品列表, 下一页的游标)
+
+        cursor 为上一页返回的游标，没有下一页时返回的游标为 None。
+        """
+        if sort not in SORT_KEYS:
+            raise ServiceError("输入错误", f"不支持的排序方式: {sort}")
+        if cursor is not None:
+            cursor = self.check_cursor(sort, cursor)
+        return self.search_index.page(ids, sort, descending, limit, cursor, offset)
+
+    @metrics.timed("rank_items")
+    def rank_items(self, ids, keyword, limit=None, offset=0):
+        """把匹配的物品按与关键字的相关度从高到低排序后取出一页，返回 (物品列表, 下一页的偏移)
+
+        关键字为空（或只有属性条件）时没有相关度可言，按发布顺序（ID）排列。
+        """
+        ranked = self.search_index.rank(ids, normalize_keyword(keyword), limit, offset)
+        if ranked is not None:
+            return ranked
+        items, next_cursor = self.search_index.page(ids, "id", False, limit, None, offset)
+        return items, None if next_cursor is None else offset + len(items)
+
+    @metrics.timed("query_items")
+    def query_items(self, keyword="", type_name=None, sort="id", descending=False, limit=None, cursor=None, offset=0):
+        """搜索并排序分页，返回 (物品列表, 下一页的游标, 匹配总数)
+
+        sort 为 RELEVANCE 时按相关度排序（忽略 descending），游标为下一页的偏移量。
+        """
+        ids = self.match_items(keyword, type_name)
+        if sort == RELEVANCE:
+            if cursor is not None:
+                offset += self.check_cursor(sort, cursor)
+            items, next_cursor = self.rank_items(ids, keyword, limit, offset)
+        else:
+            items, next_cursor = self.page_items(ids, sort, descending, limit, cursor, offset)
+        return items, next_cursor, len(self.items) if ids is None else len(ids)
+
+    def check_cursor(self, sort, cursor):
+        """检查游标（可能来自 HTTP 客户端）的格式，返回 (排序值, 物品ID)；按相关度排序时游标为偏移量"""
+        if sort == RELEVANCE:
+            if type(cursor) is int and cursor >= 0:
+                return cursor
+            raise ServiceError("输入错误", "翻页游标无效")
+        if isinstance(cursor, (list, tuple)) and len(cursor) == 2:
+            value, item_id = cursor
+            value_type = int if sort == "id" else str
+            if type(value) is value_type and type(item_id) is int:
+                return value, item_id
+        raise ServiceError("输入错误", "翻页游标无效")
@@ -0,0 +1,84 @@
+# 作者：谢建波
+# 文件目的：按 (值, 物品ID) 排序的有序索引，供属性筛选（attr_filters.py）和列表排序翻页（search_index.py）使用。
+# 按值比较的条件用二分查找求出区间，代价为 O(log N + k)；按顺序翻页时从游标（上一页最后一项的 (值, 物品ID)）
+# 处二分定位后顺序读取，不需要对结果整体排序。
+# 新增的项先放入待插入集合，下次查询时再并入：数量少时逐个插入，数量多时（如后台加载期间）整体归并一次。
+
+import bisect
+
+# 比任何物品ID都大，用于确定“值等于 v 的最后一项”的位置
+AFTER_ALL = float("inf")
+
+# 待插入的项不超过这个数量时逐个插入有序列表
+INSERT_LIMIT = 16
+
+
+class SortedIndex:
+    """按 (值, 物品ID) 排序的列表，支持增删、按值筛选和从游标处顺序读取"""
+
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+        self.pending = set()   # 已新增、尚未并入有序列表的 (值, 物品ID)
+
+    def __len__(self):
+        return len(self.entries) + len(self.pending)
+
+    def add(self, value, item_id):
+        self.pending.add((value, item_id))
+
+    def remove(self, value, item_id):
+        """删除一项（value 必须与新增时相同）；不存在时忽略"""
+        entry = (value, item_id)
+        if entry in self.pending:
+            self.pending.discard(entry)
+            return
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def _sorted(self):
+        if self.pending:
+            if len(self.pending) <= INSERT_LIMIT:
+                for entry in self.pending:
+                    bisect.insort(self.entries, entry)
+            else:
+                # 有序列表后接排好序的新项，归并排序只需线性时间
+                self.entries.extend(sorted(self.pending))
+                self.entries.sort()
+            self.pending.clear()
+        return self.entries
+
+    def select(self, op, value):
+        """返回满足“值 op value”的物品ID列表，op 为 = == != > >= < <="""
+        entries = self._sorted()
+        low, high = 0, len(entries)
+        if op in ("=", "==", "!="):
+            start = bisect.bisect_left(entries, (value,))
+            end = bisect.bisect_right(entries, (value, AFTER_ALL))
+            if op == "!=":
+                return [item_id for _, item_id in entries[:start]] + [item_id for _, item_id in entries[end:]]
+            low, high = start, end
+        elif op == ">":
+            low = bisect.bisect_right(entries, (value, AFTER_ALL))
+        elif op == ">=":
+            low = bisect.bisect_left(entries, (value,))
+        elif op == "<":
+            high = bisect.bisect_left(entries, (value,))
+        else:
+            high = bisect.bisect_right(entries, (value, AFTER_ALL))
+        return [item_id for _, item_id in entries[low:high]]
+
+    def walk(self, cursor=None, descending=False):
+        """从游标之后（不含游标本身）按顺序逐个产出 (值, 物品ID)；cursor 为 None 时从头开始
+
+        产出过程中不能修改索引。
+        """
+        entries = self._sorted()
+        if descending:
+            start = len(entries) if cursor is None else bisect.bisect_left(entries, cursor)
+            for i in range(start - 1, -1, -1):
+                yield entries[i]
+        else:
+            start = 0 if cursor is None else bisect.bisect_right(entries, cursor)
+            for i in range(start, len(entries)):
+                yield entries[i]
@@ -0,0 +1,974 @@
+# 作者：谢建波
+# 文件目的：封装物品、用户、物品类型三类数据的持久化。提供统一的存储接口，
+# 包括原有的 JSON 文件存储（改为原子写入，避免进程中途退出导致文件被截断）、
+# JSON 快照加追加日志的存储（每次操作只追加一行，后台定期合并为新快照）和
+# SQLite 存储（WAL 模式，单条记录的增删改只产生 O(1) 的 I/O），
+# 以及把现有 JSON 数据一次性迁移到 SQLite 的工具。
+# 多个进程可以共用同一个数据目录：写入时加文件锁并做乐观版本检查，
+# poll_changes 用于把其他进程写入的变更载入内存。
+# iter_load 逐条产出记录（JSON 文件按数组元素增量解析），大数据量时可以边解析边使用。
+# json / journal 后端的快照也可以保存为可 mmap 的二进制格式（config.SNAPSHOT_FORMAT），两种格式可以互相转换。
+# 开启耗时统计时，json / journal 后端记录快照序列化的耗时和每次写入的字节数（bytes_written.数据类型）。
+
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import config
+import metrics
+from binary_snapshot import BinarySnapshot, write_snapshot
+from file_lock import FileLock
+
+# 各类数据的主键字段
+KEY_FIELDS = {
+    "items": "id",
+    "item_types": "type_id",
+    "users": "user_id"
+}
+
+# 读取存储时可能出现的错误（文件读写失败、JSON 格式错误、数据库错误）
+STORAGE_ERRORS = (OSError, ValueError, sqlite3.Error)
+
+# JSON 中的空白字符
+JSON_WHITESPACE = " \t\r\n"
+
+
+def json_default(obj):
+    """让带 to_dict 方法的记录对象（如 item_record.ItemRecord）可以直接写入 JSON"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"无法序列化为 JSON: {type(obj).__name__}")
+
+
+def write_json_atomic(file_path, data):
+    """先写临时文件再原子替换，保证文件要么是旧内容要么是新内容"""
+    os.replace(dump_json_tmp(file_path, data), file_path)
+
+
+def temp_path(file_path):
+    """与 file_path 同目录的临时文件路径（每个进程、线程各用一个）"""
+    return f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def dump_json_tmp(file_path, data):
+    """把数据写入临时文件，返回临时文件路径"""
+    tmp_path = temp_path(file_path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def dump_binary_tmp(file_path, data_type, data):
+    """把数据写成二进制快照的临时文件，返回临时文件路径"""
+    tmp_path = temp_path(file_path)
+    with open(tmp_path, "wb") as f:
+        write_snapshot(f, data_type, data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def iter_json_array(f, chunk_size=65536):
+    """逐个解析文件中 JSON 数组的元素，每次只读入 chunk_size 个字符，不把整个文件读入内存"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect = "["  # 下一个应出现的内容："["、"first"（第一个元素或 "]"）、"value"、","（"," 或 "]"）
+    while True:
+        while pos < len(buffer) and buffer[pos] in JSON_WHITESPACE:
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("JSON 数组不完整")
+            buffer, pos = f.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        char = buffer[pos]
+        if expect == "[":
+            if char != "[":
+                raise ValueError("数据文件不是 JSON 数组")
+            pos += 1
+            expect = "first"
+        elif expect in ("first", ",") and char == "]":
+            return
+        elif expect == ",":
+            if char != ",":
+                raise ValueError(f"JSON 数组元素之间缺少逗号: {buffer[pos:pos + 20]!r}")
+            pos += 1
+            expect = "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            # 解析失败或恰好解析到缓冲区末尾（元素可能被截断）时，读入更多内容再试
+            if end is None or (end == len(buffer) and not eof):
+                more = f.read(chunk_size)
+                if not more:
+                    if end is None:
+                        raise ValueError(f"JSON 格式错误: {buffer[pos:pos + 20]!r}")
+                    eof = True
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield value
+            pos = end
+            expect = ","
+
+
+def json_array_content_end(f):
+    """JSON 数组文件中最后一个元素结束的位置；数组为空时返回 None，不是 JSON 数组时抛出 ValueError"""
+    head = f.read(64).lstrip()
+    if not head.startswith(b"["):
+        raise ValueError("数据文件不是 JSON 数组")
+    if head[1:].lstrip().startswith(b"]"):
+        return None
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - 64))
+    tail = f.read()
+    stripped = tail.rstrip()
+    if not stripped.endswith(b"]"):
+        raise ValueError("JSON 数组不完整")
+    return size - len(tail) + len(stripped[:-1].rstrip())
+
+
+def chunked(records, size):
+    """把可迭代的记录按 size 条一组切分"""
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def file_version(path):
+    """文件版本：(inode, 修改时间, 大小)；每次原子替换都会得到新的版本，文件不存在时为 None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def apply_changes(data_type, records, changes):
+    """把变更列表（("upsert", 记录) 或 ("delete", 主键)）应用到记录列表上，返回新的列表
+
+    已有记录保持原来的顺序，新记录追加在末尾；只建立一次主键字典，批量变更不逐条扫描列表。
+    """
+    key_field = KEY_FIELDS[data_type]
+    by_key = {}
+    for record in records:
+        by_key.setdefault(record[key_field], record)
+    for op, payload in changes:
+        if op == "upsert":
+            by_key[payload[key_field]] = payload
+        else:
+            by_key.pop(payload, None)
+    return list(by_key.values())
+
+
+class Storage:
+    """存储后端基类
+
+    insert/update/delete 的 data 参数为变更后的完整内存数据，
+    只能整体写入的后端（如 JSON 文件）据此重写文件，支持单条读写的后端忽略它。
+    """
+
+    def load(self, data_type):
+        """加载指定类型的全部数据"""
+        raise NotImplementedError
+
+    def iter_load(self, data_type):
+        """逐条产出指定类型的数据；默认一次性加载后逐条返回"""
+        return iter(self.load(data_type))
+
+    def save_all(self, data_type, data):
+        """整体保存指定类型的数据"""
+        raise NotImplementedError
+
+    def insert(self, data_type, record, data):
+        """新增一条记录"""
+        self.save_all(data_type, data)
+
+    def update(self, data_type, record, data):
+        """更新一条记录"""
+        self.save_all(data_type, data)
+
+    def delete(self, data_type, key, data):
+        """按主键删除一条记录"""
+        self.save_all(data_type, data)
+
+    def write_batch(self, data_type, changes, data):
+        """在一次写入中保存多条变更（("upsert", 记录) 或 ("delete", 主键)），如批量审核用户"""
+        self.save_all(data_type, data)
+
+    def insert_many(self, data_type, records, chunk_size=10000):
+        """批量新增记录（records 可以是生成器，不必全部放在内存中），返回新增条数
+
+        记录的主键必须是新分配的。支持单条写入的后端每 chunk_size 条提交一次。调用方的内存数据不会更新，
+        其他进程（包括调用方自己）通过 poll_changes 看到新记录。
+        """
+        raise NotImplementedError
+
+    def poll_changes(self, data_type):
+        """返回上次加载或轮询之后存储中发生的变更列表
+
+        每条变更为 ("upsert", 记录)、("delete", 主键) 或 ("reload", 全部记录)。
+        也可能包含本进程自己的写入，调用方应按主键幂等地应用。
+        """
+        return []
+
+    def load_meta(self, key):
+        """读取一项元数据（如 ID 序列），不存在时返回 None"""
+        raise NotImplementedError
+
+    def save_meta(self, key, value):
+        """保存一项元数据"""
+        raise NotImplementedError
+
+    def update_meta(self, key, update):
+        """原子地读取-修改-写入一项元数据：new = update(old)，返回 new"""
+        value = update(self.load_meta(key))
+        self.save_meta(key, value)
+        return value
+
+    def close(self):
+        """释放存储占用的资源"""
+
+
+class JsonStorage(Storage):
+    """JSON 文件存储：每类数据一个文件，每次写入都重写整个文件
+
+    写入采用乐观并发控制：先在锁外序列化到临时文件，持文件锁时确认数据文件的版本
+    仍是本进程最后一次读写时的版本，再原子替换；若已被其他进程修改，
+    则重新读取文件、合并本次变更后重试，不会覆盖其他进程的数据。
+    snapshot_format 为 binary 时数据文件改用二进制快照格式。
+    """
+
+    def __init__(self, data_files, meta_file=None, snapshot_format="json"):
+        self.data_files = data_files
+        self.meta_file = meta_file or config.META_FILE
+        self.snapshot_format = snapshot_format
+        self.file_locks = {data_type: FileLock(path) for data_type, path in data_files.items()}
+        self.meta_lock = FileLock(self.meta_file)
+        self.versions = {}  # 本进程最后一次读写时的文件版本（写入时据此检查冲突）
+        self.synced = {}    # 内存数据对应的文件版本（轮询时据此判断是否需要重新加载）
+
+    def _open(self, data_type):
+        """打开数据文件，返回 (文件对象或 BinarySnapshot, 版本)；文件不存在时返回 (None, None)
+
+        版本取自打开的文件本身，与读出的内容严格对应。
+        """
+        path = self.data_files[data_type]
+        try:
+            if self.snapshot_format == "binary":
+                source = BinarySnapshot(path)
+                fileno = source.file.fileno()
+            else:
+                source = open(path, "r", encoding="utf-8")
+                fileno = source.fileno()
+        except FileNotFoundError:
+            return None, None
+        st = os.fstat(fileno)
+        return source, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read(self, data_type):
+        """读取文件内容及其版本"""
+        source, version = self._open(data_type)
+        if source is None:
+            return [], None
+        with source:
+            return (list(source) if self.snapshot_format == "binary" else json.load(source)), version
+
+    def _dump_tmp(self, data_type, data):
+        """按快照格式把数据写入临时文件，返回临时文件路径"""
+        with metrics.span(f"serialize.{data_type}"):
+            if self.snapshot_format == "binary":
+                tmp_path = dump_binary_tmp(self.data_files[data_type], data_type, data)
+            else:
+                tmp_path = dump_json_tmp(self.data_files[data_type], data)
+        if metrics.ENABLED:
+            metrics.observe(f"bytes_written.{data_type}", os.path.getsize(tmp_path))
+        return tmp_path
+
+    def _write(self, data_type, data):
+        """原子地重写数据文件"""
+        os.replace(self._dump_tmp(data_type, data), self.data_files[data_type])
+
+    def load(self, data_type):
+        records, version = self._read(data_type)
+        self.versions[data_type] = self.synced[data_type] = version
+        return records
+
+    def iter_load(self, data_type):
+        source, version = self._open(data_type)
+        self.versions[data_type] = self.synced[data_type] = version
+        if source is None:
+            return
+        with source:
+            # 二进制快照逐行解码，JSON 文件按数组元素增量解析
+            yield from (source if self.snapshot_format == "binary" else iter_json_array(source))
+
+    def save_all(self, data_type, data):
+        file_path = self.data_files[data_type]
+        with self.file_locks[data_type]:
+            self._write(data_type, data)
+            self.versions[data_type] = self.synced[data_type] = file_version(file_path)
+
+    def insert(self, data_type, record, data):
+        self._commit(data_type, [("upsert", record)], data)
+
+    def insert_many(self, data_type, records, chunk_size=10000):
+        # 文件只能整体替换：边读旧记录边写入临时文件、再写入新记录，最后一次性替换
+        file_path = self.data_files[data_type]
+        with self.file_locks[data_type]:
+            if self.snapshot_format == "binary":
+                # 二进制快照需要全部记录才能建立主键索引
+                data = self._read(data_type)[0]
+                count = len(data)
+                data.extend(records)
+                count = len(data) - count
+                tmp_path = self._dump_tmp(data_type, data)
+            else:
+                tmp_path, count = self._dump_json_appended(data_type, records)
+            os.replace(tmp_path, file_path)
+            # 文件已包含内存中没有的记录：只更新写入用的版本，轮询时会重新加载
+            self.versions[data_type] = file_version(file_path)
+        return count
+
+    def _dump_json_appended(self, data_type, records):
+        """把新记录追加到现有 JSON 数组末尾，写入临时文件，返回 (路径, 新增条数)
+
+        现有内容按字节原样复制，不重新解析；新记录每条占一行（使用 C 实现的紧凑编码，
+        比 indent=2 快得多），下次整体保存时会恢复为统一的缩进格式。
+        """
+        file_path = self.data_files[data_type]
+        tmp_path = temp_path(file_path)
+        count = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                separator = b"[\n  "
+                if os.path.exists(file_path):
+                    with open(file_path, "rb") as f:
+                        end = json_array_content_end(f)
+                        if end is not None:
+                            # 复制到最后一个元素为止（不含末尾的 "]"）
+                            f.seek(0)
+                            remaining = end
+                            while remaining:
+                                chunk = f.read(min(remaining, 1 << 20))
+                                out.write(chunk)
+                                remaining -= len(chunk)
+                            separator = b",\n  "
+                for record in records:
+                    out.write(separator + json.dumps(record, ensure_ascii=False, default=json_default).encode("utf-8"))
+                    separator = b",\n  "
+                    count += 1
+                out.write(b"[]" if separator == b"[\n  " else b"\n]")
+                out.flush()
+                os.fsync(out.fileno())
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return tmp_path, count
+
+    def update(self, data_type, record, data):
+        self._commit(data_type, [("upsert", record)], data)
+
+    def delete(self, data_type, key, data):
+        self._commit(data_type, [("delete", key)], data)
+
+    def write_batch(self, data_type, changes, data):
+        self._commit(data_type, changes, data)
+
+    def _merged(self, data_type, changes):
+        """重新读取文件并应用本次的变更"""
+        records, version = self._read(data_type)
+        self.versions[data_type] = version
+        return apply_changes(data_type, records, changes)
+
+    def _commit(self, data_type, changes, data):
+        file_path = self.data_files[data_type]
+        in_sync = self.synced.get(data_type) == self.versions.get(data_type)
+        # 内存与文件一致时直接写内存数据，否则以文件的最新内容为基础合并
+        base = data if in_sync else self._merged(data_type, changes)
+
+        for attempt in range(config.WRITE_RETRIES):
+            tmp_path = self._dump_tmp(data_type, base)
+            with self.file_locks[data_type]:
+                if file_version(file_path) == self.versions.get(data_type):
+                    os.replace(tmp_path, file_path)
+                    version = file_version(file_path)
+                    self.versions[data_type] = version
+                    if base is data:
+                        self.synced[data_type] = version
+                    return
+            os.remove(tmp_path)
+            metrics.count(f"write_conflicts.{data_type}")
+            base = self._merged(data_type, changes)
+
+        # 多次冲突后改为全程持锁完成合并和写入
+        with self.file_locks[data_type]:
+            base = self._merged(data_type, changes)
+            self._write(data_type, base)
+            self.versions[data_type] = file_version(file_path)
+
+    def poll_changes(self, data_type):
+        # 整个文件只能整体读取：版本未变时只需一次 stat，变化时重新加载
+        if file_version(self.data_files[data_type]) == self.synced.get(data_type):
+            return []
+        return [("reload", self.load(data_type))]
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_file):
+            return {}
+        with open(self.meta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_meta(self, key):
+        with self.meta_lock:
+            return self._read_meta().get(key)
+
+    def save_meta(self, key, value):
+        self.update_meta(key, lambda old: value)
+
+    def update_meta(self, key, update):
+        with self.meta_lock:
+            meta = self._read_meta()
+            meta[key] = update(meta.get(key))
+            write_json_atomic(self.meta_file, meta)
+            return meta[key]
+
+
+class JournalStorage(JsonStorage):
+    """JSON 快照 + 追加日志存储
+
+    每次增删改只向 <文件名>.journal 追加一行 JSON 记录；加载时在快照上重放日志。
+    后台线程定期把日志合并进新的快照：先把当前日志改名为 .journal.old，
+    新的写入继续追加到新日志，再把快照和旧日志合并后原子替换快照，最后删除旧日志。
+    日志操作按主键覆盖或删除，重放多次结果相同，所以任意时刻崩溃都能确定地恢复。
+    日志追加和合并都持有跨进程的文件锁；轮询时只读取日志中新增的部分。
+    """
+
+    def __init__(self, data_files, meta_file=None, compact_interval=None, compact_threshold=None,
+                 snapshot_format="json"):
+        super().__init__(data_files, meta_file, snapshot_format)
+        self.compact_interval = compact_interval or config.JOURNAL_COMPACT_INTERVAL
+        self.compact_threshold = compact_threshold or config.JOURNAL_COMPACT_THRESHOLD
+        # 追加、轮询日志时持有
+        self.locks = {data_type: FileLock(self._journal_path(data_type)) for data_type in data_files}
+        # 合并期间持有，避免与加载、整体保存交错
+        self.compact_locks = {data_type: FileLock(path + ".compact") for data_type, path in data_files.items()}
+        self.pending = {data_type: 0 for data_type in data_files}  # 未合并的日志条数
+        self.tails = {}       # 已读到的日志位置：(日志文件 inode, 偏移)
+        self.snapshots = {}   # 内存数据对应的快照版本
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.compactor = threading.Thread(target=self._compact_loop, name="journal-compactor", daemon=True)
+        self.compactor.start()
+
+    def _journal_path(self, data_type):
+        return self.data_files[data_type] + ".journal"
+
+    def _read_entries(self, journal_path, offset=0):
+        """从 offset 开始读取日志中完整的行，返回 (变更列表, 读到的位置, inode)"""
+        try:
+            f = open(journal_path, "rb")
+        except FileNotFoundError:
+            return [], offset, None
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            content = f.read()
+        end = content.rfind(b"\n") + 1  # 末尾不完整的一行（进程中途退出）留待截断或下次读取
+        changes = []
+        for line in content[:end].split(b"\n"):
+            if not line:
+                continue
+            entry = json.loads(line.decode("utf-8"))
+            if entry["op"] == "delete":
+                changes.append(("delete", entry["key"]))
+            else:
+                changes.append(("upsert", entry["record"]))
+        return changes, offset + end, inode
+
+    def _replay(self, data_type, records, changes):
+        """把日志中的变更应用到按主键排列的记录上"""
+        key_field = KEY_FIELDS[data_type]
+        for op, payload in changes:
+            if op == "delete":
+                records.pop(payload, None)
+            else:
+                records[payload[key_field]] = payload
+
+    def _repair(self, journal_path):
+        """截掉日志末尾不完整的一行，保证之后的追加从新的一行开始"""
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                f.truncate(content.rfind(b"\n") + 1)
+
+    def load(self, data_type):
+        journal_path = self._journal_path(data_type)
+        key_field = KEY_FIELDS[data_type]
+        with self.compact_locks[data_type], self.locks[data_type]:
+            self._repair(journal_path)
+            snapshot, version = self._read(data_type)
+            records = {record[key_field]: record for record in snapshot}
+            old_changes, _, _ = self._read_entries(journal_path + ".old")
+            changes, offset, inode = self._read_entries(journal_path)
+            self._replay(data_type, records, old_changes)
+            self._replay(data_type, records, changes)
+            self.pending[data_type] = len(old_changes) + len(changes)
+            self.snapshots[data_type] = version
+            self.tails[data_type] = (inode, offset)
+        return list(records.values())
+
+    def iter_load(self, data_type):
+        # 日志要在完整的快照上重放，只能整体加载
+        return iter(self.load(data_type))
+
+    def poll_changes(self, data_type):
+        journal_path = self._journal_path(data_type)
+        # 快照被替换（其他进程完成了合并或整体保存）时，日志位置已失效，重新加载
+        if file_version(self.data_files[data_type]) != self.snapshots.get(data_type):
+            return [("reload", self.load(data_type))]
+
+        with self.locks[data_type]:
+            inode, offset = self.tails.get(data_type, (None, 0))
+            current = file_version(journal_path)
+            if current is not None and current[0] == inode:
+                # 同一个日志文件：只读新增的部分
+                changes, offset, inode = self._read_entries(journal_path, offset)
+            elif inode is None:
+                # 加载时还没有日志：读取新建的整个日志；若它已被改名为 .old 等待合并，先读 .old
+                # （加载时已存在的 .old 会再应用一次，日志按主键覆盖，结果不变）
+                changes, _, _ = self._read_entries(journal_path + ".old")
+                new_changes, offset, inode = self._read_entries(journal_path)
+                changes += new_changes
+            else:
+                # 日志已被改名为 .old 等待合并：读完 .old 的剩余部分，再读新日志
+                old_version = file_version(journal_path + ".old")
+                if old_version is None or old_version[0] != inode:
+                    changes = None
+                else:
+                    changes, _, _ = self._read_entries(journal_path + ".old", offset)
+                    new_changes, offset, inode = self._read_entries(journal_path)
+                    changes += new_changes
+            if changes is not None:
+                self.tails[data_type] = (inode, offset)
+                return changes
+        return [("reload", self.load(data_type))]
+
+    def _append(self, data_type, *entries):
+        """向日志追加一条或多条操作，只写入和 fsync 一次"""
+        line = "".join(json.dumps(entry, ensure_ascii=False, default=json_default) + "\n"
+                       for entry in entries).encode("utf-8")
+        metrics.observe(f"bytes_written.{data_type}", len(line))
+        metrics.count(f"journal_appends.{data_type}")
+        metrics.count(f"journal_entries.{data_type}", len(entries))
+        journal_path = self._journal_path(data_type)
+        with self.locks[data_type]:
+            with open(journal_path, "ab") as f:
+                start = f.tell()
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                inode = os.fstat(f.fileno()).st_ino
+            # 若此前日志已全部读过（包括加载时日志还不存在、本次新建的情况），自己追加的这一行也无需再轮询
+            tail = self.tails.get(data_type)
+            if tail == (inode, start) or (tail == (None, 0) and start == 0):
+                self.tails[data_type] = (inode, start + len(line))
+            self.pending[data_type] += len(entries)
+            if self.pending[data_type] >= self.compact_threshold:
+                self.wake_event.set()
+
+    def insert(self, data_type, record, data):
+        self._append(data_type, {"op": "insert", "record": record})
+
+    def update(self, data_type, record, data):
+        self._append(data_type, {"op": "update", "record": record})
+
+    def delete(self, data_type, key, data):
+        self._append(data_type, {"op": "delete", "key": key})
+
+    def write_batch(self, data_type, changes, data):
+        if changes:
+            self._append(data_type, *({"op": "update", "record": payload} if op == "upsert"
+                                      else {"op": "delete", "key": payload} for op, payload in changes))
+
+    def insert_many(self, data_type, records, chunk_size=10000):
+        # 批量新增的记录主键都是新的，与日志中的变更互不影响，直接追加到快照而不经过日志
+        # （逐条写日志会反复触发合并）；持有合并锁，避免与合并、整体保存同时改写快照
+        with self.compact_locks[data_type]:
+            return super().insert_many(data_type, records, chunk_size)
+
+    def save_all(self, data_type, data):
+        journal_path = self._journal_path(data_type)
+        with self.compact_locks[data_type], self.locks[data_type]:
+            self._write(data_type, data)
+            for path in (journal_path + ".old", journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.pending[data_type] = 0
+            self.snapshots[data_type] = file_version(self.data_files[data_type])
+            self.tails[data_type] = (None, 0)
+
+    def compact(self, data_type):
+        """把日志合并进新的快照"""
+        with self.compact_locks[data_type]:
+            self._compact(data_type)
+
+    def _compact(self, data_type):
+        journal_path = self._journal_path(data_type)
+        old_path = journal_path + ".old"
+        with self.locks[data_type]:
+            # 上次合并中途退出时旧日志仍在，此时先合并旧日志，当前日志留到下一轮
+            if not os.path.exists(old_path):
+                if not os.path.exists(journal_path):
+                    return
+                os.replace(journal_path, old_path)
+                self.pending[data_type] = 0
+
+        key_field = KEY_FIELDS[data_type]
+        snapshot, _ = self._read(data_type)
+        records = {record[key_field]: record for record in snapshot}
+        old_changes, old_end, old_inode = self._read_entries(old_path)
+        self._replay(data_type, records, old_changes)
+
+        with self.locks[data_type]:
+            self._write(data_type, list(records.values()))
+            os.remove(old_path)
+            metrics.count(f"journal_compactions.{data_type}")
+            # 内存已包含旧日志的全部内容时，新快照与内存一致，改为从新日志开头继续轮询
+            if self.tails.get(data_type) == (old_inode, old_end) and \
+                    self.snapshots.get(data_type) is not None:
+                self.snapshots[data_type] = file_version(self.data_files[data_type])
+                current = file_version(journal_path)
+                self.tails[data_type] = (current[0] if current else None, 0)
+
+    def _compact_loop(self):
+        while not self.stop_event.is_set():
+            self.wake_event.wait(self.compact_interval)
+            self.wake_event.clear()
+            for data_type in self.data_files:
+                try:
+                    self.compact(data_type)
+                except OSError:
+                    # 合并失败不影响日志中的数据，下一轮再试
+                    pass
+
+    def close(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.compactor.join()
+        for data_type in self.data_files:
+            self.compact(data_type)
+
+
+class SqliteStorage(Storage):
+    """SQLite 存储：完整记录以 JSON 保存在 data 列，常用查询字段单独建列并建立索引
+
+    每次增删改由触发器记入 changes 表，其他进程轮询时只读取序号更大的变更。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY,
+            type_id INTEGER,
+            user_id TEXT,
+            date TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_items_type_id ON items(type_id);
+        CREATE INDEX IF NOT EXISTS idx_items_user_id ON items(user_id);
+        CREATE INDEX IF NOT EXISTS idx_items_date ON items(date);
+
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            username TEXT UNIQUE,
+            status TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_status ON users(status);
+
+        CREATE TABLE IF NOT EXISTS item_types (
+            type_id INTEGER PRIMARY KEY,
+            name TEXT,
+            data TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_type TEXT NOT NULL,
+            key NOT NULL,
+            op TEXT NOT NULL
+        );
+    """
+
+    # 每类数据单独建列的字段（除 data 列外）
+    COLUMNS = {
+        "items": ("id", "type_id", "user_id", "date"),
+        "users": ("user_id", "username", "status"),
+        "item_types": ("type_id", "name")
+    }
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        for data_type, columns in self.COLUMNS.items():
+            key = columns[0]
+            for event, row, op in (("INSERT", "NEW", "upsert"), ("UPDATE", "NEW", "upsert"),
+                                   ("DELETE", "OLD", "delete")):
+                self.conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {data_type}_{event.lower()}_log AFTER {event} ON {data_type} "
+                    f"BEGIN INSERT INTO changes (data_type, key, op) VALUES ('{data_type}', {row}.{key}, '{op}'); END")
+        self.conn.commit()
+        self.last_seq = {}  # 每类数据已处理到的变更序号
+
+    def _row(self, data_type, record):
+        values = [record.get(col) for col in self.COLUMNS[data_type]]
+        values.append(json.dumps(record, ensure_ascii=False, default=json_default))
+        return values
+
+    def _max_seq(self):
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def load(self, data_type):
+        with self.lock:
+            # 先记下变更序号再读数据：期间的变更会在下次轮询时重复应用一次，结果不变
+            self.last_seq[data_type] = self._max_seq()
+            rows = self.conn.execute(f"SELECT data FROM {data_type} ORDER BY rowid").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_load(self, data_type, page_size=1000):
+        # 按 rowid 分页读取，每页只在持锁期间查询，不长期占用连接
+        with self.lock:
+            self.last_seq[data_type] = self._max_seq()
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT rowid, data FROM {data_type} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, page_size)).fetchall()
+            if not rows:
+                return
+            for _, data in rows:
+                yield json.loads(data)
+            last_rowid = rows[-1][0]
+
+    def save_all(self, data_type, data):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {data_type}")
+            self._insert_rows(data_type, data)
+
+    def _insert_rows(self, data_type, records):
+        columns = self.COLUMNS[data_type] + ("data",)
+        placeholders = ", ".join("?" * len(columns))
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {data_type} ({', '.join(columns)}) VALUES ({placeholders})",
+            (self._row(data_type, record) for record in records))
+
+    def insert(self, data_type, record, data):
+        with self.lock, self.conn:
+            self._insert_rows(data_type, [record])
+
+    def insert_many(self, data_type, records, chunk_size=10000):
+        count = 0
+        for chunk in chunked(records, chunk_size):
+            with self.lock, self.conn:
+                self._insert_rows(data_type, chunk)
+            count += len(chunk)
+        return count
+
+    def update(self, data_type, record, data):
+        columns = self.COLUMNS[data_type]
+        assignments = ", ".join(f"{col} = ?" for col in columns[1:] + ("data",))
+        values = self._row(data_type, record)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"UPDATE {data_type} SET {assignments} WHERE {columns[0]} = ?",
+                values[1:] + values[:1])
+
+    def delete(self, data_type, key, data):
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {data_type} WHERE {KEY_FIELDS[data_type]} = ?", (key,))
+
+    def write_batch(self, data_type, changes, data):
+        # 同一个事务中完成；已有记录原地更新（保持 rowid，即加载时的顺序）
+        columns = self.COLUMNS[data_type] + ("data",)
+        assignments = ", ".join(f"{col} = excluded.{col}" for col in columns[1:])
+        with self.lock, self.conn:
+            for op, payload in changes:
+                if op == "upsert":
+                    self.conn.execute(
+                        f"INSERT INTO {data_type} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                        f"ON CONFLICT({columns[0]}) DO UPDATE SET {assignments}",
+                        self._row(data_type, payload))
+                else:
+                    self.conn.execute(f"DELETE FROM {data_type} WHERE {columns[0]} = ?", (payload,))
+
+    def poll_changes(self, data_type):
+        key_field = KEY_FIELDS[data_type]
+        with self.lock:
+            last_seq = self.last_seq.get(data_type, 0)
+            min_seq = self.conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            if min_seq is not None and last_seq + 1 < min_seq:
+                # 需要的变更已被清理，只能重新加载
+                return [("reload", self.load(data_type))]
+
+            rows = self.conn.execute(
+                "SELECT seq, key FROM changes WHERE seq > ? AND data_type = ? ORDER BY seq",
+                (last_seq, data_type)).fetchall()
+            if not rows:
+                return []
+            self.last_seq[data_type] = rows[-1][0]
+
+            # 同一条记录多次变更时只取最终状态
+            keys = list(dict.fromkeys(key for _, key in rows))
+            changes = []
+            for key in keys:
+                row = self.conn.execute(
+                    f"SELECT data FROM {data_type} WHERE {key_field} = ?", (key,)).fetchone()
+                changes.append(("upsert", json.loads(row[0])) if row else ("delete", key))
+
+            # 变更记录过多时清理很久以前的部分（落后太多的进程会改为重新加载）
+            max_seq = rows[-1][0]
+            if min_seq is not None and max_seq - min_seq >= 2 * config.CHANGE_LOG_KEEP:
+                with self.conn:
+                    self.conn.execute("DELETE FROM changes WHERE seq <= ?", (max_seq - config.CHANGE_LOG_KEEP,))
+        return changes
+
+    def load_meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              (key, json.dumps(value, ensure_ascii=False)))
+
+    def update_meta(self, key, update):
+        with self.lock:
+            # BEGIN IMMEDIATE 立即取得写锁，其他进程的读取-修改-写入只能排在其后
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+                value = update(json.loads(row[0]) if row else None)
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  (key, json.dumps(value, ensure_ascii=False)))
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        return value
+
+    def close(self):
+        self.conn.close()
+
+
+def snapshot_files(snapshot_format):
+    """快照格式对应的数据文件路径"""
+    return config.BINARY_FILES if snapshot_format == "binary" else config.DATA_FILES
+
+
+def create_storage(backend=None, snapshot_format=None):
+    """根据配置创建存储后端"""
+    backend = backend or config.STORAGE_BACKEND
+    snapshot_format = snapshot_format or config.SNAPSHOT_FORMAT
+    if snapshot_format not in ("json", "binary"):
+        raise ValueError(f"未知的快照格式: {snapshot_format}")
+    if backend in ("json", "journal") and snapshot_format == "binary":
+        # 首次切换到二进制格式时，自动从现有的 JSON 数据转换
+        missing = [data_type for data_type, path in config.BINARY_FILES.items()
+                   if not os.path.exists(path) and os.path.exists(config.DATA_FILES[data_type])]
+        if missing:
+            convert_snapshots("json", "binary", missing)
+    if backend == "json":
+        return JsonStorage(snapshot_files(snapshot_format), snapshot_format=snapshot_format)
+    if backend == "journal":
+        return JournalStorage(snapshot_files(snapshot_format), snapshot_format=snapshot_format)
+    if backend == "sqlite":
+        return SqliteStorage(config.SQLITE_PATH)
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+def convert_snapshots(source_format, target_format, data_types=None):
+    """在 JSON 与二进制快照格式之间转换数据文件（包括尚未合并的追加日志），返回各类数据的记录数"""
+    data_types = data_types or list(KEY_FIELDS)
+    source = JournalStorage({data_type: snapshot_files(source_format)[data_type] for data_type in data_types},
+                            snapshot_format=source_format)
+    target = JsonStorage({data_type: snapshot_files(target_format)[data_type] for data_type in data_types},
+                         snapshot_format=target_format)
+    counts = {}
+    try:
+        for data_type in data_types:
+            records = source.load(data_type)
+            target.save_all(data_type, records)
+            counts[data_type] = len(records)
+    finally:
+        source.close()
+    return counts
+
+
+def migrate_json_to_sqlite(data_files, db_path, meta_file=None):
+    """把现有的 JSON 数据文件（及元数据）一次性导入 SQLite 数据库，返回各类数据的记录数"""
+    source = JsonStorage(data_files, meta_file)
+    target = SqliteStorage(db_path)
+    counts = {}
+    try:
+        with target.conn:
+            for data_type in KEY_FIELDS:
+                records = source.load(data_type)
+                target.conn.execute(f"DELETE FROM {data_type}")
+                target._insert_rows(data_type, records)
+                counts[data_type] = len(records)
+            for key, value in source._read_meta().items():
+                target.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                    (key, json.dumps(value, ensure_ascii=False)))
+    finally:
+        target.close()
+    return counts
+
+
+USAGE = """用法:
+  python storage.py migrate [数据库路径]   把 JSON 数据迁移到 SQLite
+  python storage.py to-binary              把 JSON 数据文件转换为二进制快照
+  python storage.py to-json                把二进制快照转换回 JSON 数据文件"""
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "to-binary", "to-json"):
+        print(USAGE)
+        sys.exit(1)
+    if sys.argv[1] in ("to-binary", "to-json"):
+        source_format, target_format = ("json", "binary") if sys.argv[1] == "to-binary" else ("binary", "json")
+        counts = convert_snapshots(source_format, target_format)
+        for data_type, count in counts.items():
+            print(f"{data_type}: 已转换 {count} 条记录 -> {snapshot_files(target_format)[data_type]}")
+        print(f"转换完成，请设置环境变量 ITEM_SNAPSHOT_FORMAT={target_format}")
+        sys.exit(0)
+    db_path = sys.argv[2] if len(sys.argv) > 2 else config.SQLITE_PATH
+    counts = migrate_json_to_sqlite(config.DATA_FILES, db_path)
+    for data_type, count in counts.items():
+        print(f"{data_type}: 已迁移 {count} 条记录")
+    print(f"迁移完成，请设置环境变量 ITEM_STORAGE=sqlite 并使用数据库 {db_path}")
@@ -0,0 +1,27 @@
+# 作者：谢建波
+# 文件目的：pytest 公共配置。把仓库根目录加入导入路径；data_dir 夹具切换到临时目录，
+# 数据文件（config.DATA_FILES 等均为相对路径）都写在其中，测试之间互不影响，也不会改动仓库中的数据。
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """空的数据目录（当前目录）"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sample_dir(data_dir):
+    """带仓库自带示例数据（物品类型、用户）的数据目录"""
+    for name in ("item_types.json", "users.json"):
+        shutil.copy(os.path.join(ROOT, name), data_dir / name)
+    return data_dir
@@ -0,0 +1,45 @@
+# 作者：谢建波
+# 文件目的：二进制快照的读写测试：记录原样还原、按主键查找、迭代中途结束后可以关闭文件。
+
+import pytest
+
+from binary_snapshot import BinarySnapshot, write_snapshot
+
+RECORDS = [
+    {"id": 3, "name": "台灯", "description": "九成新", "type_id": 1, "type_attrs": {"数量": "2"}, "date": "2026-01-02"},
+    {"id": 1, "name": "书桌", "description": "", "type_id": "1", "date": "2026-01-02", "images": ["a.png"]},
+    {"id": 2, "name": "椅子", "address": None}
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = tmp_path / "items.bin"
+    with open(path, "wb") as f:
+        write_snapshot(f, "items", RECORDS)
+    return path
+
+
+def test_round_trip(snapshot_path):
+    with BinarySnapshot(snapshot_path) as snapshot:
+        assert list(snapshot) == RECORDS
+        assert [snapshot.record(row) for row in range(len(snapshot))] == RECORDS
+        assert snapshot.find(1) == RECORDS[1]
+        assert snapshot.find(4) is None
+        assert list(snapshot.column("name")) == ["台灯", "书桌", "椅子"]
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "users.bin"
+    with open(path, "wb") as f:
+        write_snapshot(f, "users", [])
+    with BinarySnapshot(path) as snapshot:
+        assert list(snapshot) == []
+
+
+def test_close_after_partial_iteration(snapshot_path):
+    snapshot = BinarySnapshot(snapshot_path)
+    records = iter(snapshot)
+    assert next(records) == RECORDS[0]
+    records.close()
+    snapshot.close()
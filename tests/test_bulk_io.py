@@ -0,0 +1,94 @@
+# 作者：谢建波
+# 文件目的：批量导入导出的测试：发布日期格式不对、类型属性为 null 的行被拒绝（合法的日期统一为 YYYY-MM-DD），
+# 与公共列同名的类型属性导出为带前缀的列，导出的 CSV 可以原样导入。
+
+import argparse
+import csv
+import json
+
+import pytest
+
+import storage
+from bulk_io import export_items, import_items
+from service import ItemService
+
+
+@pytest.fixture
+def named_type(sample_dir):
+    """属性名与公共列 name 相同的类型"""
+    service = ItemService(storage.create_storage("json"))
+    try:
+        new_type = service.create_type()
+        service.update_type(new_type["type_id"], "乐器", ["name", "品牌"])
+    finally:
+        service.close()
+    return sample_dir
+
+
+def run_import(path):
+    import_items(argparse.Namespace(file=str(path), format=None, user="dianyuanxiejb", batch_size=2))
+
+
+def run_export(path):
+    export_items(argparse.Namespace(file=str(path), format=None, keyword=None, type="乐器"))
+
+
+def load_items():
+    service = ItemService(storage.create_storage("json"))
+    try:
+        return sorted((service.item_view(item) for item in service.items), key=lambda item: item["id"])
+    finally:
+        service.close()
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, ["type_name", "name", "description", "address", "contact_phone",
+                                    "contact_email", "date", "属性:name", "品牌"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def row(name, date, model):
+    return {"type_name": "乐器", "name": name, "description": "九成新", "address": "宿舍", "contact_phone": "1",
+            "contact_email": "e", "date": date, "属性:name": model, "品牌": "雅马哈"}
+
+
+def test_import_validates_dates(named_type, capsys):
+    write_csv(named_type / "in.csv", [row("吉他", "2025-03-04", "F310"), row("口琴", "明天", "C调"),
+                                      row("尤克里里", "2025-13-01", "U1"), row("电子琴", "2025/3/5", "PSR"),
+                                      row("鼓", "", "J1")])
+    run_import(named_type / "in.csv")
+    assert "发布日期" in capsys.readouterr().err
+    items = load_items()
+    assert [item["name"] for item in items] == ["吉他", "电子琴", "鼓"]
+    assert items[0]["date"] == "2025-03-04"
+    assert items[1]["date"] == "2025-03-05"
+    assert items[0]["type_attrs"] == {"name": "F310", "品牌": "雅马哈"}
+
+
+def test_import_rejects_null_attribute(named_type, capsys):
+    rows = [dict(row("吉他", "2025-03-04", None), type_attrs={"name": None, "品牌": "雅马哈"}),
+            dict(row("口琴", "2025-03-05", None), type_attrs={"name": "C调", "品牌": "铃木"})]
+    with open(named_type / "in.jsonl", "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+    run_import(named_type / "in.jsonl")
+    assert "name不能为空" in capsys.readouterr().err
+    items = load_items()
+    assert [item["name"] for item in items] == ["口琴"]
+    assert items[0]["type_attrs"] == {"name": "C调", "品牌": "铃木"}
+
+
+def test_export_keeps_colliding_attribute_column(named_type):
+    write_csv(named_type / "in.csv", [row("吉他", "2025-03-04", "F310")])
+    run_import(named_type / "in.csv")
+    run_export(named_type / "out.csv")
+    with open(named_type / "out.csv", encoding="utf-8-sig", newline="") as f:
+        exported = list(csv.DictReader(f))
+    assert exported[0]["name"] == "吉他"
+    assert exported[0]["属性:name"] == "F310"
+
+    # 导出的文件再导入，得到相同的物品
+    run_import(named_type / "out.csv")
+    first, second = load_items()
+    assert (second["name"], second["date"], second["type_attrs"]) == (first["name"], first["date"], first["type_attrs"])
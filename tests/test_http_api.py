@@ -0,0 +1,134 @@
+# 作者：谢建波
+# 文件目的：HTTP 接口的请求处理测试：直接调用 ApiServer.dispatch，不启动服务器。
+
+import asyncio
+import json
+
+import pytest
+
+import storage
+from http_api import ApiServer
+from service import ItemService
+
+
+@pytest.fixture
+def api(sample_dir):
+    api = ApiServer(ItemService(storage.create_storage("json")))
+    yield api
+    api.service.close()
+
+
+def call(api, method, path, body=None, token=None):
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    body = json.dumps(body).encode("utf-8") if body is not None else b""
+    return asyncio.run(api.dispatch(method, path, headers, body))
+
+
+def login(api):
+    status, payload = call(api, "POST", "/api/login", {"username": "dianyuanxiejb", "password": "ww266266"})
+    assert status == 200
+    return payload["token"]
+
+
+@pytest.mark.parametrize("body", [{"username": 1}, {"username": "dianyuanxiejb", "password": ["x"]}])
+def test_login_rejects_non_string_fields(api, body):
+    assert call(api, "POST", "/api/login", body)[0] == 400
+
+
+def test_login_does_not_block_event_loop(api):
+    """计算密码哈希期间其他协程照常运行"""
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.002)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        for _ in range(2):  # 第一次登录把明文密码改存为哈希，第二次校验哈希
+            status, _ = await api.dispatch("POST", "/api/login", {},
+                                           json.dumps({"username": "dianyuanxiejb", "password": "ww266266"}).encode())
+            assert status == 200
+        task.cancel()
+        return ticks
+    assert asyncio.run(run()) >= 10
+
+
+class FakeWriter:
+    """收集写出的数据的 StreamWriter 替身"""
+
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def raw_request(api, request):
+    """把原始请求交给 handle_connection，返回连接上写出的全部数据"""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(request)
+        reader.feed_eof()
+        writer = FakeWriter()
+        await api.handle_connection(reader, writer)
+        assert writer.closed
+        return writer.data
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3", "²"])
+def test_malformed_content_length_returns_400(api, length):
+    request = (f"POST /api/login HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}"
+               f"GET /api/types HTTP/1.1\r\n\r\n").encode("latin-1")
+    response = raw_request(api, request)
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in head
+    assert json.loads(body.decode("utf-8")) == {"error": "Content-Length 无效"}
+    # 回复后关闭连接，不再处理后面的请求
+    assert response.count(b"HTTP/1.1 ") == 1
+
+
+def test_oversized_content_length_returns_413(api):
+    response = raw_request(api, b"POST /api/login HTTP/1.1\r\nContent-Length: 99999999999\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 413 ")
+
+
+def test_keep_alive_requests_on_one_connection(api):
+    body = json.dumps({"username": 1}).encode("utf-8")
+    request = (b"POST /api/login HTTP/1.1\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+               + b"GET /api/items HTTP/1.1\r\nConnection: close\r\n\r\n")
+    response = raw_request(api, request)
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert b"HTTP/1.1 401 " in response
+
+
+@pytest.mark.parametrize("body", [{"name": 5}, {"type_name": "书籍", "type_attrs": []}, {"images": [{}]}])
+def test_add_item_rejects_malformed_fields(api, body):
+    assert call(api, "POST", "/api/items", body, login(api))[0] == 400
+
+
+def test_update_type_rejects_non_string_attributes(api):
+    token = login(api)
+    type_id = api.service.item_types[0]["type_id"]
+    assert call(api, "PUT", f"/api/types/{type_id}", {"name": "工具", "attributes": [1]}, token)[0] == 400
+    assert call(api, "POST", "/api/types", None, token)[0] == 201
+
+
+def test_unexpected_error_returns_500(api, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(api.service, "query_items", fail)
+    status, payload = call(api, "GET", "/api/items", token=login(api))
+    assert status == 500 and "error" in payload
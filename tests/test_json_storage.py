@@ -0,0 +1,44 @@
+# 作者：谢建波
+# 文件目的：JSON 文件存储（JsonStorage）多进程写入的测试：两个进程各自持有过期的内存数据，
+# 同时对同一文件做冲突的 write_batch，乐观合并与重试后不丢失任何一方的变更。
+
+import multiprocessing
+
+from storage import JsonStorage, apply_changes
+
+ROUNDS = 60
+
+
+def write_rounds(worker, barrier):
+    storage = JsonStorage({"items": "items.json"}, "meta.json")
+    data = storage.load("items")
+    barrier.wait()
+    for i in range(ROUNDS):
+        item_id = worker * 1000 + i
+        changes = [("upsert", {"id": item_id, "name": f"{worker}-{i}"}),
+                   ("upsert", {"id": 0, "name": f"{worker}-{i}"})]  # 两个进程都改写的记录
+        if i % 4 == 3:
+            changes.append(("delete", item_id - 1))
+        data = apply_changes("items", data, changes)
+        storage.write_batch("items", changes, data)
+    storage.close()
+
+
+def test_concurrent_write_batch_keeps_both_sides(data_dir):
+    JsonStorage({"items": "items.json"}, "meta.json").save_all("items", [])
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(2)
+    workers = [context.Process(target=write_rounds, args=(worker, barrier)) for worker in (1, 2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    records = JsonStorage({"items": "items.json"}, "meta.json").load("items")
+    ids = [record["id"] for record in records]
+    expected = {worker * 1000 + i for worker in (1, 2) for i in range(ROUNDS) if i % 4 != 2}
+    assert len(ids) == len(set(ids))
+    assert set(ids) == expected | {0}
+    # 共同改写的记录是某一方最后一次写入的值
+    assert next(record for record in records if record["id"] == 0)["name"] in (f"1-{ROUNDS - 1}", f"2-{ROUNDS - 1}")
@@ -0,0 +1,98 @@
+# 作者：谢建波
+# 文件目的：物品列表刷新方式的测试。不启动图形界面，用只记录调用的假 Treeview 代替。
+
+from concurrent.futures import Future
+
+from list_view import RowThumbnails, VirtualTreeview
+
+
+class FakeTree:
+    """只实现 VirtualTreeview / RowThumbnails 用到的 Treeview 方法"""
+
+    def __init__(self):
+        self.rows = {}
+        self.images = {}
+        self.selected = []
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def cget(self, option):
+        return ""
+
+    def insert(self, parent, index, iid, values):
+        self.rows[iid] = values
+
+    def item(self, iid, values=None, image=None):
+        if values is not None:
+            self.rows[iid] = values
+        if image is not None:
+            self.images[iid] = image
+
+    def delete(self, *iids):
+        for iid in iids:
+            self.rows.pop(iid)
+
+    def selection_set(self, iids):
+        self.selected = list(iids)
+
+    def selection(self):
+        return self.selected
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def winfo_exists(self):
+        return True
+
+    def after(self, delay, callback):
+        return "after"
+
+
+class FakeScrollbar:
+    def configure(self, **kwargs):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+class FakeThumbnails:
+    """缩略图都还在后台生成中"""
+
+    def __init__(self):
+        self.requested = []
+
+    def get(self, name, size):
+        return None
+
+    def request(self, name, size):
+        self.requested.append(name)
+        return Future()
+
+
+def make_view(count, visible):
+    view = VirtualTreeview(FakeTree(), FakeScrollbar(), lambda row: (row["id"], row["name"]), overscan=2)
+    view.visible_count = visible
+    view.set_rows([{"id": i, "name": f"物品{i}", "images": [f"{i:064x}.png"]} for i in range(count)])
+    return view
+
+
+def test_virtual_visible_rows_follow_scrolling():
+    view = make_view(100, 5)
+    assert [row["id"] for _, row in view.visible_rows()] == [0, 1, 2, 3, 4]
+    view.scroll_to(50)
+    rows = view.visible_rows()
+    assert [row["id"] for _, row in rows] == [50, 51, 52, 53, 54]
+    # iid 是已渲染窗口中的行号
+    assert all(view.tree.rows[iid][0] == row["id"] for iid, row in rows)
+
+
+def test_row_thumbnails_load_visible_on_virtual_view():
+    view = make_view(100, 5)
+    view.scroll_to(20)
+    thumbnails = FakeThumbnails()
+    loader = RowThumbnails(view.tree, view, thumbnails, lambda row: row["images"], 40)
+    loader.load_visible()
+    assert thumbnails.requested == [f"{i:064x}.png" for i in range(20, 25)]
+    assert set(loader.waiting) == set(thumbnails.requested)
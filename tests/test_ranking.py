@@ -0,0 +1,93 @@
+# 作者：谢建波
+# 文件目的：相关度排序的测试：BM25F 各字段的权重、词频饱和、字段长度归一化、逆文档频率和时间衰减的方向，
+# 堆取前 k 件与整体排序一致（得分相同时ID大的在前），以及 ItemService 按相关度分页的结果。
+
+from datetime import date
+
+import pytest
+
+import storage
+from ranking import Ranker, field_lengths, top_k
+from service import RELEVANCE, ItemService
+
+TODAY = date(2026, 1, 1)
+
+
+def make_ranker(terms, texts):
+    totals = [sum(lengths) for lengths in zip(*(field_lengths(text) for text in texts))]
+    return Ranker(terms, totals, len(texts), today=TODAY)
+
+
+def test_field_weights_and_bm25_shape():
+    texts = ["台灯\n很新\n白色", "书桌\n附送台灯\n木", "椅子\n无\n黑色", "台灯台灯台灯台灯\n无\n无"]
+    ranker = make_ranker([("台灯", 3)], texts)
+    score = {text: ranker.score(text, "2026-01-01") for text in texts}
+    # 名称命中高于描述命中，不含查询词为 0
+    assert score[texts[0]] > score[texts[1]] > score[texts[2]] == 0
+    # 词频越高得分越高，但增长饱和（不超过 idf * (K1 + 1)）
+    assert score[texts[3]] > score[texts[0]]
+    assert score[texts[3]] < ranker.terms[0][1] * 2.2
+
+    # 同样命中一次，字段越短得分越高
+    short, long = "台灯\n无\n无", "台灯白色护眼可调光\n无\n无"
+    assert ranker.score(short, "2026-01-01") > ranker.score(long, "2026-01-01")
+
+
+def test_rare_terms_weigh_more():
+    texts = ["台灯 白色\n\n"] + ["白色\n\n"] * 9
+    ranker = make_ranker([("台灯", 1), ("白色", 10)], texts)
+    rare, common = ranker.terms
+    assert rare[1] > common[1] > 0
+
+
+def test_recency_decay():
+    ranker = make_ranker([("台灯", 1)], ["台灯\n\n"])
+    text = "台灯\n\n"
+    new, half, invalid = (ranker.score(text, d) for d in ("2026-01-01", "2025-07-05", "未知"))
+    assert new > half > invalid > 0
+    # 半衰期 180 天、权重 0.3：180 天前的得分为当天的 0.85，日期无效时为 0.7
+    assert half / new == pytest.approx(0.85)
+    assert invalid / new == pytest.approx(0.7)
+
+
+def test_top_k_ties_prefer_newer_ids():
+    scores = {1: 2.0, 2: 5.0, 3: 2.0, 4: 5.0, 5: 1.0, 6: 2.0}
+    full = top_k(scores, scores.__getitem__, None)
+    assert full == [4, 2, 6, 3, 1, 5]
+    for k in range(0, 8):
+        assert top_k(scores, scores.__getitem__, k) == full[:k]
+
+
+@pytest.fixture
+def service(sample_dir):
+    service = ItemService(storage.create_storage("json"))
+    user = service.index.user_by_name["dianyuanxiejb"]
+    for name, description in [("旧台灯", "一盏台灯"), ("书桌", "配台灯 台灯"), ("台灯", "护眼"),
+                              ("椅子", "无"), ("台灯台灯", "台灯"), ("书架", "可放台灯")] * 5:
+        service.add_item(user, "工具", name, description, "地址", "电话", "邮箱", {"品牌": "某牌", "使用时长": "1年"})
+    yield service
+    service.close()
+
+
+def test_ranked_pages_match_full_ranking(service):
+    ids = service.match_items("台灯")
+    full, next_offset = service.rank_items(ids, "台灯", None)
+    assert next_offset is None
+    assert {item["id"] for item in full} == ids
+    assert full[0]["name"] == "台灯台灯"
+    assert {item["name"] for item in full[:15]} == {"台灯台灯", "台灯", "旧台灯"}
+
+    paged = []
+    cursor = None
+    while True:
+        items, cursor, total = service.query_items("台灯", None, RELEVANCE, limit=4, cursor=cursor)
+        paged += items
+        if cursor is None:
+            break
+    assert total == len(ids)
+    assert [item["id"] for item in paged] == [item["id"] for item in full]
+
+
+def test_attribute_only_query_falls_back_to_id_order(service):
+    items, _, _ = service.query_items("使用时长=1年", None, RELEVANCE, limit=5)
+    assert [item["id"] for item in items] == sorted(item["id"] for item in service.items)[:5]
@@ -0,0 +1,49 @@
+# 作者：谢建波
+# 文件目的：ItemService 加载数据的测试：字段类型不对的物品记录（如名称为数字）被跳过并计数，
+# 不影响其他物品的加载，后台流式加载结束后可以正常发布物品。
+
+import json
+
+import pytest
+
+import storage
+from service import ItemService
+
+
+def item(item_id, **fields):
+    record = {"id": item_id, "name": f"物品{item_id}", "description": "描述", "address": "地址",
+              "contact_phone": "1", "contact_email": "e", "type_id": 3, "type_attrs": {"品牌": "某牌", "使用时长": "1年"},
+              "date": "2026-01-01", "user_id": "admin"}
+    record.update(fields)
+    return record
+
+
+@pytest.fixture
+def bad_items(sample_dir):
+    records = [item(1), item(2, name=123), item(3, description=None), item(4, date=20260101), item(5)]
+    (sample_dir / "items.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    return sample_dir
+
+
+def test_load_skips_items_with_non_text_fields(bad_items):
+    service = ItemService(storage.create_storage("json"))
+    try:
+        assert [item["id"] for item in service.items] == [1, 5]
+        assert service.skipped["items"] == 3
+        assert [item["id"] for item in service.search_items("物品")] == [1, 5]
+    finally:
+        service.close()
+
+
+def test_streaming_load_skips_items_with_non_text_fields(bad_items):
+    service = ItemService(storage.create_storage("json"), stream_items=True)
+    try:
+        service.start_loading_items(batch_size=2)
+        while service.loading_items:
+            service.load_pending_items()
+        assert [item["id"] for item in service.items] == [1, 5]
+        assert service.skipped["items"] == 3
+        user = service.index.user_by_name["dianyuanxiejb"]
+        service.add_item(user, "工具", "扳手", "描述", "地址", "电话", "邮箱", {"品牌": "某牌", "使用时长": "1年"})
+    finally:
+        service.close()
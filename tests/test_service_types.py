@@ -0,0 +1,28 @@
+# 作者：谢建波
+# 文件目的：ItemService 修改物品类型的输入校验测试：不合法的属性列表被拒绝，且不改动类型和索引。
+
+import pytest
+
+import storage
+from service import ItemService, ServiceError
+
+
+@pytest.fixture
+def service(sample_dir):
+    service = ItemService(storage.create_storage("json"))
+    yield service
+    service.close()
+
+
+@pytest.mark.parametrize("attributes", [[1], ["颜色", None], ["颜色", " "], ["颜色", "颜色"]])
+def test_update_type_rejects_bad_attributes(service, attributes):
+    type_info = service.item_types[0]
+    before = dict(type_info, attributes=list(type_info["attributes"]))
+    with pytest.raises(ServiceError):
+        service.update_type(type_info["type_id"], "工具", attributes)
+    assert type_info == before
+
+    # 之后的类型操作不受影响
+    new_type = service.create_type()
+    service.update_type(new_type["type_id"], "工具", ["颜色", "数量"])
+    assert service.get_type(new_type["type_id"])["attributes"] == ["颜色", "数量"]
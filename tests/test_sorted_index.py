@@ -0,0 +1,88 @@
+# 作者：谢建波
+# 文件目的：有序索引（SortedIndex）和按游标翻页的测试：值重复的项按物品ID区分，增删后顺序读取和按值筛选正确；
+# 翻页期间不断发布新物品，已有的物品既不遗漏也不重复。
+
+import random
+
+import pytest
+
+import storage
+from search_index import SORT_KEYS
+from service import ItemService
+from sorted_index import INSERT_LIMIT, SortedIndex
+
+
+def test_duplicate_values_insert_remove_walk():
+    index = SortedIndex([("b", 2), ("a", 5)])
+    for item_id in (7, 1, 3):
+        index.add("b", item_id)
+    index.add("a", 4)
+    assert list(index.walk()) == [("a", 4), ("a", 5), ("b", 1), ("b", 2), ("b", 3), ("b", 7)]
+
+    index.remove("b", 3)
+    index.remove("b", 99)  # 不存在时忽略
+    index.add("b", 3)      # 删除后再加入
+    index.remove("a", 4)
+    assert list(index.walk()) == [("a", 5), ("b", 1), ("b", 2), ("b", 3), ("b", 7)]
+    assert len(index) == 5
+
+    # 游标是上一页最后一项，值相同时按物品ID继续
+    assert list(index.walk(("b", 2))) == [("b", 3), ("b", 7)]
+    assert list(index.walk(("b", 2), descending=True)) == [("b", 1), ("a", 5)]
+    assert list(index.walk(("a", 0))) == list(index.walk())
+
+    assert index.select("=", "b") == [1, 2, 3, 7]
+    assert index.select("!=", "b") == [5]
+    assert index.select(">", "a") == [1, 2, 3, 7]
+    assert index.select("<=", "a") == [5]
+
+
+def test_bulk_pending_merge_matches_sorted():
+    """待插入的项较多时整体归并，结果与直接排序相同"""
+    rng = random.Random(7)
+    entries = [(rng.randrange(20), item_id) for item_id in range(500)]
+    index = SortedIndex(entries[:100])
+    for value, item_id in entries[100:]:
+        index.add(value, item_id)
+    assert len(index.pending) > INSERT_LIMIT
+    removed = entries[::7]
+    for value, item_id in removed:
+        index.remove(value, item_id)
+    assert list(index.walk()) == sorted(set(entries) - set(removed))
+    assert index.select(">=", 10) == [item_id for value, item_id in sorted(set(entries) - set(removed)) if value >= 10]
+
+
+@pytest.fixture
+def service(sample_dir):
+    service = ItemService(storage.create_storage("json"))
+    yield service
+    service.close()
+
+
+def publish(service, user, name, count):
+    for i in range(count):
+        service.add_item(user, "书籍", f"{name}{i % 5}", "描述", "地址", "电话", "邮箱",
+                         {"作者": "某人", "出版社": "某社", "ISBN": str(i)})
+
+
+@pytest.mark.parametrize("sort, descending", [("id", False), ("name", False), ("name", True), ("date", True)])
+def test_cursor_pages_have_no_gaps_or_duplicates(service, sort, descending):
+    user = service.index.user_by_name["dianyuanxiejb"]
+    publish(service, user, "教材", 60)
+    existing = {item["id"] for item in service.items}
+
+    seen = []
+    cursor = None
+    while True:
+        items, cursor, _ = service.query_items("", None, sort, descending, limit=7, cursor=cursor)
+        seen += items
+        if cursor is None:
+            break
+        # 翻页期间有新物品发布，名称和日期与已有物品重复
+        publish(service, user, "教材", 3)
+
+    ids = [item["id"] for item in seen]
+    assert len(ids) == len(set(ids))
+    assert existing <= set(ids)
+    keys = [(SORT_KEYS[sort](item, service.search_index.attributes.types), item["id"]) for item in seen]
+    assert keys == sorted(keys, reverse=descending)
@@ -0,0 +1,74 @@
+# 作者：谢建波
+# 文件目的：类型属性版本化的测试：连续改名、互换名称、删除后重新添加同名属性时，旧版本物品的属性能正确换算，
+# 筛选、显示和后台迁移的结果一致。
+
+import pytest
+
+import storage
+from service import ItemService
+from type_schema import is_stale, record_changes, schema_version, stored_name, upgrade_attrs
+
+
+def test_chained_renames_and_readded_attribute():
+    type_info = {"attributes": ["a", "b", "c"]}
+    assert record_changes(type_info, ["a", "b", "c"], ["b2", "c"], {"b": "b2"})
+    assert record_changes(type_info, ["b2", "c"], ["b3", "c", "a"], {"b2": "b3"})
+    assert not record_changes(type_info, ["b3", "c", "a"], ["b3", "c", "a", "d"], {})  # 只新增属性不升级
+    assert schema_version(type_info) == 3
+
+    assert upgrade_attrs(type_info, {"a": 1, "b": 2, "c": 3}, 1) == {"b3": 2, "c": 3}
+    assert upgrade_attrs(type_info, {"b2": 2, "c": 3}, 2) == {"b3": 2, "c": 3}
+    assert stored_name(type_info, "b3", 1) == "b"
+    assert stored_name(type_info, "b3", 2) == "b2"
+    assert stored_name(type_info, "c", 1) == "c"
+    # v1 的 a 在 v2 被删除，当前的 a 是 v3 新增的
+    assert stored_name(type_info, "a", 1) is None
+    assert stored_name(type_info, "a", 3) == "a"
+
+
+def test_swapped_names():
+    type_info = {"attributes": ["x", "y"]}
+    assert record_changes(type_info, ["x", "y"], ["x", "y"], {"x": "y", "y": "x"})
+    assert upgrade_attrs(type_info, {"x": 1, "y": 2}, 1) == {"y": 1, "x": 2}
+    assert stored_name(type_info, "x", 1) == "y"
+    assert stored_name(type_info, "y", 1) == "x"
+    # 再换回来：v1 的物品又与当前版本同名
+    assert record_changes(type_info, ["x", "y"], ["x", "y"], {"x": "y", "y": "x"})
+    assert upgrade_attrs(type_info, {"x": 1, "y": 2}, 1) == {"x": 1, "y": 2}
+    assert stored_name(type_info, "x", 1) == "x"
+    assert stored_name(type_info, "x", 2) == "y"
+
+
+@pytest.fixture
+def service(sample_dir):
+    service = ItemService(storage.create_storage("json"))
+    yield service
+    service.close()
+
+
+def test_service_renames_across_versions(service):
+    user = service.index.user_by_name["dianyuanxiejb"]
+    item = service.add_item(user, "书籍", "高等数学", "描述", "地址", "电话", "邮箱",
+                            {"作者": "张三", "出版社": "某社", "ISBN": "978"})
+    type_id = item["type_id"]
+    service.update_type(type_id, "书籍", ["著者", "出版社", "ISBN"], renames={"作者": "著者"})
+    service.update_type(type_id, "书籍", ["出版社", "著者", "ISBN"], renames={"著者": "出版社", "出版社": "著者"})
+
+    expected = {"出版社": "张三", "著者": "某社", "ISBN": "978"}
+    assert service.item_view(item)["type_attrs"] == expected
+    assert [found["id"] for found in service.search_items("出版社=张三")] == [item["id"]]
+    assert service.search_items("著者=张三") == []
+
+    # 后台迁移改写为当前版本，显示和筛选结果不变
+    assert service.pending_migrations() > 0
+    while service.migrate_items():
+        pass
+    assert not is_stale(service.get_type(type_id), item)
+    assert item["type_attrs"] == expected
+    assert [found["id"] for found in service.search_items("出版社=张三")] == [item["id"]]
+
+    reloaded = ItemService(storage.create_storage("json"))
+    try:
+        assert reloaded.item_view(reloaded.index.item_by_id[item["id"]])["type_attrs"] == expected
+    finally:
+        reloaded.close()
@@ -0,0 +1,81 @@
+# 作者：谢建波
+# 文件目的：搜索用的文本规范化。物品文本和搜索关键字经过同样的处理后再做子串匹配：
+# 全角字符转半角（“ＩＳＢＮ９７８” 与 “isbn978” 相同）、繁体转简体、大小写折叠（casefold）。
+# 繁简转换默认使用内置的常用字对照表；安装了 opencc 时改用它做完整转换。
+# 物品的可搜索文本（名称、描述、类型属性值）只在加入搜索索引时规范化一次，查询时不再处理每件物品。
+
+# 常用繁体字 -> 简体字（每项为“繁简”两个字）
+TRADITIONAL_PAIRS = """
+萬万 與与 醜丑 專专 業业 叢丛 東东 絲丝 兩两 嚴严 喪丧 個个 豐丰 臨临 為为 麗丽 舉举 義义 烏乌 樂乐
+喬乔 習习 鄉乡 書书 買买 亂乱 爭争 於于 虧亏 雲云 亞亚 產产 畝亩 親亲 億亿 僅仅 從从 侖仑 倉仓 儀仪
+們们 價价 眾众 優优 夥伙 會会 傘伞 偉伟 傳传 傷伤 倫伦 偽伪 體体 餘余 傭佣 俠侠 侶侣 偵侦 側侧 僑侨
+係系 倆俩 儉俭 債债 傾倾 償偿 儲储 兒儿 兌兑 黨党 蘭兰 關关 興兴 養养 獸兽 內内 岡冈 冊册 寫写 軍军
+農农 馮冯 衝冲 決决 況况 凍冻 淨净 涼凉 減减 湊凑 幾几 鳳凤 憑凭 凱凯 擊击 劃划 劉刘 則则 剛刚 創创
+刪删 別别 劑剂 劍剑 剝剥 劇剧 勸劝 辦办 務务 動动 勵励 勁劲 勞劳 勢势 勻匀 匯汇 區区 醫医 華华 協协
+單单 賣卖 盧卢 衛卫 卻却 廠厂 廳厅 曆历 厲厉 壓压 厭厌 廁厕 縣县 參参 雙双 發发 變变 敘叙 臺台 颱台
+檯台 葉叶 號号 嘆叹 嚇吓 嗎吗 啟启 吳吴 員员 嗚呜 響响 啞哑 嘩哗 喚唤 噴喷 團团 園园 圍围 圖图 圓圆
+聖圣 場场 壞坏 塊块 堅坚 壇坛 墳坟 墜坠 壘垒 墊垫 聲声 殼壳 壺壶 處处 備备 復复 夠够 頭头 誇夸 夾夹
+奪夺 奮奋 獎奖 奧奥 妝妆 婦妇 媽妈 嬌娇 娛娱 嬰婴 孫孙 學学 寧宁 寶宝 實实 寵宠 審审 憲宪 宮宫 寬宽
+賓宾 寢寝 對对 尋寻 導导 將将 爾尔 塵尘 盡尽 層层 屬属 歲岁 豈岂 島岛 嶺岭 巖岩 帥帅 師师 帳帐 帶带
+幫帮 幣币 幹干 乾干 廣广 莊庄 慶庆 庫库 應应 廟庙 龐庞 廢废 開开 異异 棄弃 張张 彎弯 彈弹 歸归 當当
+錄录 徹彻 徑径 憶忆 憂忧 懷怀 態态 憐怜 總总 戀恋 惡恶 惱恼 悅悦 懸悬 驚惊 懼惧 慘惨 懲惩 慣惯 憤愤
+願愿 懶懒 戲戏 戰战 戶户 撲扑 執执 擴扩 掃扫 揚扬 擾扰 撫抚 拋抛 搶抢 護护 報报 擔担 擬拟 擁拥 攔拦
+撥拨 擇择 掛挂 擋挡 掙挣 擠挤 揮挥 撈捞 損损 撿捡 換换 據据 擲掷 攬揽 攜携 攝摄 擺摆 搖摇 攤摊 撐撑
+敵敌 數数 齋斋 鬥斗 斬斩 斷断 無无 舊旧 時时 曬晒 曉晓 暈晕 暫暂 術术 機机 殺杀 雜杂 權权 條条 來来
+楊杨 傑杰 極极 構构 槍枪 櫃柜 標标 棟栋 欄栏 樹树 樣样 檔档 橋桥 夢梦 檢检 樓楼 橫横 櫻樱 櫥橱 歡欢
+歐欧 殘残 毀毁 畢毕 氣气 漢汉 湯汤 溝沟 沒没 淚泪 潑泼 澤泽 潔洁 灑洒 淺浅 漿浆 澆浇 濁浊 測测 濟济
+渾浑 濃浓 濤涛 潤润 漲涨 澀涩 澱淀 漬渍 漸渐 漁渔 滲渗 溫温 灣湾 濕湿 潰溃 滅灭 滯滞 滾滚 滿满 濾滤
+濫滥 濱滨 灘滩 燈灯 靈灵 災灾 燦灿 爐炉 點点 煉炼 爛烂 燭烛 煙烟 煩烦 燒烧 燙烫 熱热 愛爱 爺爷 牽牵
+狀状 猶犹 獨独 狹狭 獅狮 獄狱 獵猎 豬猪 貓猫 獻献 瑪玛 環环 現现 瓊琼 電电 畫画 暢畅 療疗 瘋疯 癢痒
+癡痴 皺皱 鹽盐 監监 蓋盖 盤盘 睜睁 瞞瞒 矯矫 礦矿 碼码 磚砖 硯砚 礎础 碩硕 確确 礙碍 禮礼 禍祸 禦御
+禪禅 離离 禿秃 種种 積积 稱称 穩稳 穀谷 窮穷 竊窃 窯窑 窩窝 豎竖 競竞 筆笔 箋笺 節节 範范 築筑 籠笼
+篩筛 簽签 簡简 籃篮 籌筹 類类 糧粮 糾纠 紅红 紀纪 級级 約约 紋纹 紙纸 紡纺 紐纽 純纯 紗纱 納纳 紛纷
+紹绍 終终 組组 細细 織织 結结 經经 絕绝 給给 統统 絡络 繪绘 繼继 續续 綠绿 維维 綜综 網网 綱纲 線线
+緊紧 緒绪 編编 練练 緣缘 縮缩 績绩 纖纤 繫系 羅罗 罰罚 罷罢 翹翘 聞闻 聯联 聰聪 聽听 職职 肅肃 腸肠
+膚肤 腫肿 脈脉 腦脑 臟脏 腳脚 臉脸 膠胶 膽胆 艙舱 艦舰 藝艺 蘇苏 蘋苹 莖茎 薦荐 藥药 萊莱 蓮莲 獲获
+蕩荡 營营 蕭萧 薩萨 藍蓝 蘆芦 蘿萝 蔔卜 虜虏 蟲虫 蝦虾 螞蚂 蠶蚕 蟻蚁 螢萤 補补 裝装 裡里 裏里 製制
+複复 褲裤 襪袜 襯衬 見见 規规 視视 覺觉 覽览 觀观 計计 訂订 認认 討讨 讓让 訓训 議议 記记 講讲 許许
+論论 設设 訪访 證证 評评 識识 詞词 試试 詩诗 話话 該该 詳详 語语 誤误 說说 請请 讀读 課课 誰谁 調调
+談谈 謝谢 譯译 讚赞 贊赞 貝贝 負负 貢贡 財财 責责 賢贤 敗败 貨货 質质 販贩 貪贪 貧贫 購购 貫贯 貴贵
+貸贷 費费 賀贺 資资 賊贼 賞赏 賠赔 賦赋 賬账 賭赌 賴赖 贈赠 貼贴 趕赶 趙赵 趨趋 躍跃 踐践 蹤踪 車车
+軌轨 軟软 轉转 輪轮 較较 載载 輕轻 輸输 轟轰 辭辞 邊边 遼辽 達达 遷迁 過过 邁迈 運运 還还 這这 進进
+遠远 違违 連连 遲迟 選选 遺遗 遊游 郵邮 鄰邻 鄭郑 醬酱 釋释 釣钓 針针 鈣钙 鈴铃 鉛铅 銀银 銅铜 鋁铝
+銷销 銳锐 鋒锋 鋼钢 鋪铺 錢钱 錯错 錦锦 鍋锅 鍵键 鍾钟 鐘钟 鍊链 鏈链 鎖锁 鏡镜 鐵铁 鑰钥 鑽钻 錶表
+長长 門门 閃闪 閉闭 問问 閒闲 間间 閱阅 闊阔 鬧闹 隊队 陽阳 陰阴 陳陈 陸陆 隨随 險险 隱隐 隸隶 難难
+雞鸡 霧雾 靜静 韓韩 頁页 頂顶 項项 順顺 須须 預预 領领 頻频 題题 額额 顏颜 顧顾 顯显 風风 飛飞 飯饭
+飲饮 飽饱 館馆 餅饼 饑饥 麵面 馬马 駕驾 騎骑 驗验 驅驱 髮发 鬆松 魚鱼 鮮鲜 鳥鸟 鴨鸭 鵝鹅 麥麦 黃黄
+齊齐 齒齿 龍龙 龜龟 後后 麼么 隻只 週周 準准 盃杯
+""".split()
+
+# 全角 ASCII（！～）-> 半角，全角空格 -> 半角空格
+FOLD_TABLE = {0xFF01 + i: 0x21 + i for i in range(94)}
+FOLD_TABLE[0x3000] = 0x20
+FOLD_TABLE.update((ord(pair[0]), ord(pair[1])) for pair in TRADITIONAL_PAIRS)
+
+try:
+    import opencc
+    _converter = opencc.OpenCC("t2s")
+except ImportError:
+    _converter = None
+
+
+def normalize(text):
+    """规范化文本：全角转半角、繁体转简体、大小写折叠"""
+    text = text.translate(FOLD_TABLE)
+    if _converter is not None:
+        text = _converter.convert(text)
+    return text.casefold()
+
+
+def normalize_keyword(keyword):
+    """规范化搜索关键字（去除首尾空白，包括全角空格）"""
+    return normalize(keyword).strip()
+
+
+def searchable_text(item):
+    """物品的可搜索文本：名称、描述和各类型属性值，各部分之间用换行分隔（关键字不会跨越两部分）"""
+    parts = [item["name"], item["description"]]
+    attrs = item.get("type_attrs")
+    if isinstance(attrs, dict):
+        parts.extend(str(value) for value in attrs.values())
+    return normalize("\n".join(parts))
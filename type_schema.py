@@ -0,0 +1,71 @@
+# 作者：谢建波
+# 文件目的：物品类型的版本化属性定义。类型记录中的 version 为当前版本（缺省为 1），history 记录每次
+# 改名或删除属性时的变化：[{"version": 2, "renames": {"旧名": "新名"}, "removed": ["属性"]}]。
+# 物品记录保存发布时类型的版本（schema_version，缺省为 1），类型名称不再写入物品，显示时按 type_id 查类型表。
+# 类型改名、属性改名或删除属性时只修改类型记录：读取旧版本的物品时按 history 换算属性名（upgrade_attrs、
+# stored_name），由后台迁移（ItemService.migrate_items）分批把旧物品改写为新版本，不会同步重写全部物品。
+# 只新增属性不需要升级版本，旧物品缺少该属性即可。
+
+
+def schema_version(type_info):
+    """类型的当前版本"""
+    return type_info.get("version", 1)
+
+
+def item_version(item):
+    """物品发布时类型的版本"""
+    return item.get("schema_version", 1)
+
+
+def is_stale(type_info, item):
+    """物品的属性是否还是旧版本的写法"""
+    return item_version(item) < schema_version(type_info)
+
+
+def upgrade_attrs(type_info, attrs, version):
+    """把 version 版本的属性值 dict 换算为当前版本（改名的属性换成新名，删除的属性去掉），返回新 dict"""
+    for step in type_info.get("history", ()):
+        if step["version"] <= version:
+            continue
+        renames = step.get("renames", {})
+        removed = step.get("removed", ())
+        attrs = {renames.get(attr, attr): value for attr, value in attrs.items() if attr not in removed}
+    return attrs
+
+
+def stored_name(type_info, attr, version):
+    """当前版本的属性 attr 在 version 版本的物品中的属性名；该属性是之后新增的时返回 None"""
+    for step in reversed(type_info.get("history", ())):
+        if step["version"] <= version:
+            break
+        renames = step.get("renames", {})
+        for old, new in renames.items():
+            if new == attr:
+                attr = old
+                break
+        else:
+            # 同名的旧属性在这一版被删除，当前的属性是之后新增的
+            if attr in step.get("removed", ()) or attr in renames:
+                return None
+    return attr
+
+
+def record_changes(type_info, old_attributes, new_attributes, renames):
+    """类型的属性列表修改后调用：有属性改名或删除时升级版本并记入 history，返回是否升级了版本
+
+    renames 为 {旧名: 新名}，旧名必须是修改前的属性、新名必须是修改后的属性。
+    """
+    renames = {old: new for old, new in renames.items() if old != new}
+    kept = set(new_attributes)
+    removed = [attr for attr in old_attributes if attr not in renames and attr not in kept]
+    if not renames and not removed:
+        return False
+    version = schema_version(type_info) + 1
+    step = {"version": version}
+    if renames:
+        step["renames"] = renames
+    if removed:
+        step["removed"] = removed
+    type_info["version"] = version
+    type_info.setdefault("history", []).append(step)
+    return True